@@ -1,3 +1,5 @@
+import os
+
 from flask import Flask, render_template_string, request, redirect, url_for, session
 
 app = Flask(__name__)
@@ -105,28 +107,136 @@ INDEX_HTML = """
       overlay.innerHTML = "";
     });
 
+    // Model cache in IndexedDB, keyed by a hash of the selected files.
+    // Each record keeps the parsed artifacts plus whether they loaded as a
+    // graph or layers model, so a later load skips the failed first attempt.
+    const MODEL_DB_NAME = 'localModelCache';
+    const MODEL_DB_MAX_BYTES = 200 * 1024 * 1024; // Least recently used models are evicted above this
+
+    function idbRequest(request) {
+      return new Promise((resolve, reject) => {
+        request.onsuccess = () => resolve(request.result);
+        request.onerror = () => reject(request.error);
+      });
+    }
+
+    let modelDB = null;
+    function openModelDB() {
+      if (!modelDB) {
+        const request = indexedDB.open(MODEL_DB_NAME, 1);
+        request.onupgradeneeded = () => {
+          request.result.createObjectStore('models', { keyPath: 'key' });
+          request.result.createObjectStore('entries', { keyPath: 'key' });
+        };
+        modelDB = idbRequest(request);
+      }
+      return modelDB;
+    }
+
+    async function getCachedModel(key) {
+      const db = await openModelDB();
+      const record = await idbRequest(db.transaction('models').objectStore('models').get(key));
+      if (record) {
+        db.transaction('entries', 'readwrite').objectStore('entries')
+          .put({ key, bytes: record.bytes, lastUsed: Date.now() });
+      }
+      return record;
+    }
+
+    async function putCachedModel(record) {
+      const db = await openModelDB();
+      const tx = db.transaction(['models', 'entries'], 'readwrite');
+      tx.objectStore('models').put(record);
+      tx.objectStore('entries').put({ key: record.key, bytes: record.bytes, lastUsed: Date.now() });
+      await new Promise((resolve, reject) => {
+        tx.oncomplete = resolve;
+        tx.onerror = () => reject(tx.error);
+      });
+
+      // Evict least recently used models until the total fits
+      const entries = await idbRequest(db.transaction('entries').objectStore('entries').getAll());
+      entries.sort((a, b) => a.lastUsed - b.lastUsed);
+      let total = entries.reduce((sum, entry) => sum + entry.bytes, 0);
+      const evictTx = db.transaction(['models', 'entries'], 'readwrite');
+      for (const entry of entries) {
+        if (total <= MODEL_DB_MAX_BYTES) break;
+        if (entry.key === record.key) continue;
+        evictTx.objectStore('models').delete(entry.key);
+        evictTx.objectStore('entries').delete(entry.key);
+        total -= entry.bytes;
+      }
+    }
+
+    // Content hash of the selected files (falls back to name/size/date
+    // outside secure contexts, where crypto.subtle is missing)
+    async function filesKey(files) {
+      if (!(window.crypto && crypto.subtle)) {
+        return 'files:' + files.map(f => `${f.name}:${f.size}:${f.lastModified}`).join('|');
+      }
+      const parts = [];
+      for (const file of files) {
+        parts.push(new TextEncoder().encode(file.name));
+        parts.push(new Uint8Array(await file.arrayBuffer()));
+      }
+      const joined = new Uint8Array(parts.reduce((sum, part) => sum + part.length, 0));
+      let offset = 0;
+      for (const part of parts) {
+        joined.set(part, offset);
+        offset += part.length;
+      }
+      const digest = new Uint8Array(await crypto.subtle.digest('SHA-256', joined));
+      return 'sha256:' + Array.from(digest, b => b.toString(16).padStart(2, '0')).join('');
+    }
+
+    function loadByKind(kind, artifacts) {
+      const handler = tf.io.fromMemory(artifacts);
+      return kind === 'graph' ? tf.loadGraphModel(handler) : tf.loadLayersModel(handler);
+    }
+
     // Utility: Load the local model with tf.io.browserFiles
     async function loadLocalModel(files) {
+      // browserFiles expects model.json first, then the weight files
+      files = [...files].sort((a, b) => (b.name.endsWith('.json') ? 1 : 0) - (a.name.endsWith('.json') ? 1 : 0));
+
+      let key = null;
+      try {
+        key = await filesKey(files);
+        const cached = await getCachedModel(key);
+        if (cached) {
+          console.log(`Loading cached ${cached.kind} model.`);
+          return await loadByKind(cached.kind, cached.artifacts);
+        }
+      } catch (e) {
+        console.warn("Model cache unavailable, loading from files...", e);
+      }
+
+      const artifacts = await tf.io.browserFiles(files).load();
+
       // You can detect if it's a graph model or layers model
       // For Teachable Machine, it might be a layers model
       // But let's try both. We'll assume it's a graph model first
       // If that fails, we can fallback to a layers model, etc.
-
-      // Try a graph model
+      let model, kind;
       try {
-        const model = await tf.loadGraphModel(tf.io.browserFiles(files));
-        return model;
+        model = await loadByKind('graph', artifacts);
+        kind = 'graph';
       } catch (e1) {
         console.warn("Graph model load failed, trying layers model...", e1);
         // Try layers model
         try {
-          const model = await tf.loadLayersModel(tf.io.browserFiles(files));
-          return model;
+          model = await loadByKind('layers', artifacts);
+          kind = 'layers';
         } catch (e2) {
           console.error("Both graph model & layers model load failed:", e2);
           throw e2;
         }
       }
+
+      if (key) {
+        const bytes = artifacts.weightData ? artifacts.weightData.byteLength : 0;
+        putCachedModel({ key, kind, artifacts, bytes }).catch(e => console.warn("Could not cache the model:", e));
+      }
+      return model;
     }
 
     // Mock or Real Inference
@@ -150,10 +260,8 @@ def index():
     # Renders a single-page app with file inputs, camera, etc.
     return render_template_string(INDEX_HTML)
 
-# (Optional) A summary route if you want a separate page:
-@app.route("/summary")
-def summary():
-    return "<h1>Summary Page</h1><p>Not implemented yet.</p>"
-
 if __name__ == "__main__":
-    app.run(host="0.0.0.0", port=5000, debug=True)
+    # Development server only; production runs under gunicorn (see ../gunicorn.conf.py).
+    # The debugger allows running code from the browser, so it is opt-in.
+    port = int(os.environ.get("PORT", 5000))
+    app.run(host="0.0.0.0", port=port, debug=os.environ.get("FLASK_DEBUG") == "1")
@@ -1,8 +1,25 @@
+import functools
+import hashlib
+import hmac
+import json
 import os 
-from flask import Flask, render_template_string
-
-app = Flask(__name__)
+import click
+from flask import Flask, Response, abort, jsonify, render_template_string, request, send_file, url_for
+
+import reports
+from assets import StaticAsset, load_directory, send_asset
+from live import HubFull, LiveHub, parse_heartbeat, simulate
+from model_proxy import FILENAME_RE, MODEL_ID_RE, ModelCache, UpstreamError
+from sessions import (BINARY_MIMETYPE, SESSION_ID_RE, QueueFull, SessionWriter,
+                      connect as connect_sessions, decode_binary_session, parse_session,
+                      parse_sessions, rebuild_summaries)
+from timeline import TimelineError, TimelineReader, TimelineStore
+from vendor import LIBRARIES, VendorBundle, fetch_all
+
+# Static files are served by the static() view below from precompressed copies
+app = Flask(__name__, static_folder=None)
 app.config['SECRET_KEY'] = 'your_secret_key_here'
+app.config['MAX_CONTENT_LENGTH'] = 4 * 1024 * 1024
 
 HTML_PAGE = """
 <!DOCTYPE html>
@@ -43,6 +60,9 @@ HTML_PAGE = """
             margin: 5px;
             cursor: pointer;
         }
+        #model-section input.student-field {
+            width: 39%;
+        }
         #feedback {
             margin-top: 10px;
             font-weight: bold;
@@ -56,12 +76,27 @@ HTML_PAGE = """
             gap: 20px; /* Adds space between webcam and chart */
         }
         /* Adjusted canvas size for better user experience */
-        #webcam-canvas {
+        #webcam-view {
+            position: relative;
+            flex: none;
             border: 2px solid #ccc;
             border-radius: 8px;
+            overflow: hidden;
             width: 320px;
             height: 240px;
         }
+        /* The video shows the camera; the canvas on top holds the skeleton */
+        #webcam-video, #webcam-canvas {
+            position: absolute;
+            top: 0;
+            left: 0;
+            width: 100%;
+            height: 100%;
+        }
+        #webcam-video {
+            object-fit: fill; /* Same full-frame scaling as the capture canvas */
+            transform: scaleX(-1); /* Mirrored */
+        }
         #overlay {
             position: absolute;
             top: 10px;
@@ -79,6 +114,12 @@ HTML_PAGE = """
             font-size: 1.5em;
             font-weight: bold;
         }
+        #replay-status {
+            margin-top: 10px;
+            font-family: monospace;
+            text-align: left;
+            white-space: pre-line;
+        }
         #countdown {
             position: absolute;
             top: 50%;
@@ -99,6 +140,15 @@ HTML_PAGE = """
         #summary-section {
             display: none;
         }
+        #diagnostics {
+            margin: 20px auto;
+            max-width: 800px;
+            font-family: monospace;
+            font-size: 0.85em;
+            color: #555;
+            text-align: left;
+            white-space: pre-line;
+        }
         #summary-section h2 {
             color: #444;
         }
@@ -142,15 +192,18 @@ HTML_PAGE = """
             #canvas-container {
                 flex-direction: column;
             }
-            #webcam-canvas, #bar-chart-container, #summary-graph-container {
+            #webcam-view, #bar-chart-container, #summary-graph-container {
                 width: 100%;
                 height: auto;
             }
+            #webcam-view {
+                aspect-ratio: 4 / 3;
+            }
             #overlay {
                 width: 150px;
                 font-size: 1em;
             }
-            #model-section input {
+            #model-section input, #model-section input.student-field {
                 width: 100%;
                 margin-bottom: 10px;
             }
@@ -160,8 +213,8 @@ HTML_PAGE = """
             }
         }
     </style>
-    <!-- Include Chart.js from CDN -->
-    <script src="https://cdn.jsdelivr.net/npm/chart.js"></script>
+    <!-- Include Chart.js (pinned, served from /vendor when fetched) -->
+    {{ vendor_script('chartjs') }}
 </head>
 <body>
     <h1>Pose Duration Tracker with Mr. Lee</h1>
@@ -171,7 +224,11 @@ HTML_PAGE = """
         <h2>Load Your Teachable Machine Pose Model</h2>
         <input type="text" id="model-url" placeholder="Enter model URL e.g., https://teachablemachine.withgoogle.com/models/j3EtRGf_g/">
         <br>
+        <input type="text" id="student-name" class="student-field" placeholder="Your name or student ID (optional)" maxlength="100">
+        <input type="text" id="class-code" class="student-field" placeholder="Class code (optional)" maxlength="100">
+        <br>
         <button type="button" id="check-model-button">Check Model URL</button>
+        <select id="model-select" class="hidden" title="Switch between loaded models"></select>
         <button type="button" id="test-webcam-button">Test Webcam</button>
         <button type="button" id="stop-test-webcam-button" class="hidden">Stop Test</button>
         <div id="feedback"></div>
@@ -181,7 +238,10 @@ HTML_PAGE = """
     <div id="task-section" class="hidden">
         <h2>Pose Matching Task</h2>
         <div id="canvas-container">
-            <canvas id="webcam-canvas"></canvas>
+            <div id="webcam-view">
+                <video id="webcam-video" autoplay muted playsinline></video>
+                <canvas id="webcam-canvas"></canvas>
+            </div>
             <div id="bar-chart-container" class="hidden">
                 <canvas id="bar-chart"></canvas>
             </div>
@@ -189,6 +249,8 @@ HTML_PAGE = """
                 <div id="task-timer">Time: 0.00s</div>
                 <div id="current-class">Class: N/A</div>
                 <div id="current-probability">Probability: 0%</div>
+                <div id="inference-rate">Inference: -- Hz</div>
+                <div id="quality-setting">Capture: --</div>
             </div>
             <div id="countdown">5</div>
         </div>
@@ -196,8 +258,18 @@ HTML_PAGE = """
         <br>
         <button type="button" id="start-task-button" disabled>Start Task</button>
         <button type="button" id="end-task-button" class="hidden">End Task</button>
+        <div id="replay-section" class="hidden">
+            <label>Use a recording instead of the webcam (a video, or images in name order):
+                <input type="file" id="replay-input" accept="video/*,image/*" multiple>
+            </label>
+            <button type="button" id="replay-benchmark-button" disabled>Run Benchmark</button>
+            <div id="replay-status"></div>
+        </div>
     </div>
 
+    <!-- Diagnostics Panel (shown with ?debug=1 or ?soak=N) -->
+    <div id="diagnostics" class="hidden"></div>
+
     <!-- Summary Section -->
     <div id="summary-section">
         <h2>Task Summary</h2>
@@ -207,40 +279,360 @@ HTML_PAGE = """
         <div id="summary-graph-container">
             <canvas id="summary-graph"></canvas>
         </div>
+        <div id="session-status"></div>
         <button type="button" id="restart-button">Restart</button>
     </div>
 
     <!-- TensorFlow.js and Teachable Machine Pose libraries (Using Version 0.8) -->
-    <script src="https://cdn.jsdelivr.net/npm/@tensorflow/tfjs@1.3.1/dist/tf.min.js"></script>
-    <script src="https://cdn.jsdelivr.net/npm/@teachablemachine/pose@0.8/dist/teachablemachine-pose.min.js"></script>
+    {{ vendor_script('tfjs') }}
+    {{ vendor_script('tfjs-wasm') }}
+    {{ vendor_script('tmpose') }}
 
     <script type="text/javascript">
         // Initial Variables
-        let model, webcam, ctx, maxPredictions;
+        let model, ctx, maxPredictions;
         let taskTimerInterval;
         let taskStartTime = null;
         let classDurations = {}; // Object to track durations per class
         let barChart; // Real-time Chart.js instance
         let barChartInitialized = false; // Flag to initialize chart once
+        let liveChartData = []; // Probabilities (%) shown in the real-time chart, updated in place
         let summaryChart; // Summary Chart.js instance
         let summaryChartInitialized = false; // Flag for summary chart
         let isTaskMode = false; // Flag to track if we're in test mode or task mode
+        let warmupTimeMs = null; // How long the last model warm-up took
+        let classFrames = {}; // Frames counted towards each class
+        let lastFrameTime = null; // performance.now() of the previous task frame
+        let framesProcessed = 0; // Task frames processed this session
+        let trackedTimeMs = 0; // Sum of frame deltas this session
+        let lastPose = null; // Most recent pose, redrawn on every display frame
+        let lastPoseScale = 1; // Display canvas size / capture size of lastPose
+
+        const WEBCAM_WIDTH = 320; // Standard webcam width for task
+        const WEBCAM_HEIGHT = 240; // Standard webcam height for task
+        const WARMUP_RUNS = 3; // Dummy inferences run right after loading a model
+        const MIN_FRAME_DELTA_CAP_MS = 1000; // Per-frame time is capped so tab throttling does not count as holding a pose
+
+        // Page options, e.g. ?hz=10 to lower the inference rate on slow devices
+        const pageParams = new URLSearchParams(window.location.search);
+        const TARGET_INFERENCE_HZ = Math.min(Math.max(Number(pageParams.get('hz')) || 15, 1), 60); // Upper bound on inferences per second
+        const LATENCY_HEADROOM = 1.25; // Leave the main thread this much idle time per inference
+        const LATENCY_SMOOTHING = 0.2; // Weight of the newest sample in the latency average
+        const UI_RENDER_HZ = Math.min(Math.max(Number(pageParams.get('uihz')) || 10, 1), 60); // Max live overlay/chart refreshes per second
+        // By default a <video> element shows the camera and the canvas over it only
+        // changes when a new pose arrives; ?render=canvas copies every camera frame
+        // into the canvas and draws the skeleton on top
+        const RENDER_MODE = pageParams.get('render') === 'canvas' ? 'canvas' : 'video';
+        const MIN_PART_CONFIDENCE = 0.5; // Keypoints drawn from this score up
+
+        // ?replay=1 shows controls to run the tracker on a recorded video or image
+        // sequence instead of the webcam; recordings are stepped at REPLAY_FPS
+        const REPLAY_ENABLED = pageParams.has('replay') && pageParams.get('replay') !== '0';
+        const REPLAY_FPS = Math.min(Math.max(Math.floor(Number(pageParams.get('replayfps'))) || 15, 1), 60);
+
+        // Adaptive capture size: frames start at the original 320x240 webcam size
+        // and step down when inference cannot keep TARGET_INFERENCE_HZ. PoseNet
+        // resizes every frame to its own input size, so a smaller capture often
+        // saves little; it is only kept when it measurably helps, and otherwise
+        // the scheduler lowers the rate instead (?quality=N pins a level)
+        const QUALITY_LEVELS = [[160, 120], [240, 180], [320, 240]];
+        const DEFAULT_QUALITY_LEVEL = QUALITY_LEVELS.length - 1;
+        const QUALITY_WINDOW = 20; // Inferences measured before each adjustment
+        const QUALITY_MIN_GAIN = 0.15; // A smaller size must cut the median latency by this share
+        const QUALITY_STEP_UP_RATIO = 0.6; // Step back up when the median is under this share of the budget
+        const QUALITY_STEP_UP_WINDOWS = 3; // ... for this many windows in a row
+        const PINNED_QUALITY_LEVEL = pageParams.has('quality')
+            ? Math.min(Math.max(Math.floor(Number(pageParams.get('quality'))) || 0, 0), QUALITY_LEVELS.length - 1)
+            : null;
+
+        // Motion gating: while the keypoints stay within MOTION_THRESHOLD (a share of
+        // the body size) of the pose last classified, the classifier is skipped and
+        // its result reused, re-checked at least every MOTION_VERIFY_MS (?motion=0
+        // turns it off). ?still=N also skips PoseNet while a thumbnail of the frame
+        // differs from the last one PoseNet saw by less than N (mean 0-255 luma).
+        const MOTION_THRESHOLD = pageParams.has('motion') ? Math.max(Number(pageParams.get('motion')) || 0, 0) : 0.02;
+        const MOTION_VERIFY_MS = 1000;
+        const STILL_PIXEL_THRESHOLD = Math.max(Number(pageParams.get('still')) || 0, 0);
+        const STILL_THUMB_SIZE = [16, 12];
+
+        // Diagnostics: ?debug=1 turns on per-frame logging, the prediction trace
+        // and timing stats; ?log=warn|info|debug sets the console level on its own
+        const DEBUG = pageParams.has('debug') && pageParams.get('debug') !== '0';
+        const TRACE_SIZE = Math.min(Math.max(Math.floor(Number(pageParams.get('trace'))) || 300, 1), 10000); // Predictions kept in the debug trace
+        const LOG_LEVELS = { debug: 10, info: 20, warn: 30, error: 40 };
+        const LOG_LEVEL = LOG_LEVELS[pageParams.get('log')] || (DEBUG ? LOG_LEVELS.debug : LOG_LEVELS.info);
+
+        const log = {
+            debug: (...args) => { if (LOG_LEVEL <= LOG_LEVELS.debug) console.debug(...args); },
+            info: (...args) => { if (LOG_LEVEL <= LOG_LEVELS.info) console.log(...args); },
+            warn: (...args) => { if (LOG_LEVEL <= LOG_LEVELS.warn) console.warn(...args); },
+            error: (...args) => { if (LOG_LEVEL <= LOG_LEVELS.error) console.error(...args); }
+        };
+        const LOG_FRAMES = LOG_LEVEL <= LOG_LEVELS.debug; // Checked before building per-frame messages
+
+        // Tensor leak watchdog
+        const TENSOR_WATCH_MS = 5000; // How often tf.memory() is sampled
+        const TENSOR_LEAK_LIMIT = 200; // Tensors above baseline that count as a leak
+        const TENSOR_LEAK_SAMPLES = 3; // Consecutive samples over the limit before recovering
+        const SOAK_ITERATIONS = Number(pageParams.get('soak')) || 0; // ?soak=N runs the soak test after loading
+
+        // Backend selection (?backend=webgl|wasm|cpu forces one)
+        const BENCHMARK_RUNS = 5; // Timed inferences per backend when choosing
+        const BACKEND_STORAGE_KEY = 'poseTracker.backend'; // localStorage key for this device's choice
+        let soakResult = null; // Last soak test status line
+
+        // Fixed-size ring buffer of recent predictions (debug mode only).
+        // Probabilities go into one preallocated Float32Array, so a long
+        // session keeps the same memory instead of piling up console objects.
+        const predictionTrace = {
+            classNames: [],
+            times: new Float64Array(TRACE_SIZE),
+            probabilities: new Float32Array(0),
+            next: 0,
+            size: 0,
+
+            record(time, prediction) {
+                if (prediction.length !== this.classNames.length) {
+                    this.classNames = prediction.map(pred => pred.className);
+                    this.probabilities = new Float32Array(TRACE_SIZE * prediction.length);
+                    this.next = 0;
+                    this.size = 0;
+                }
+                const offset = this.next * prediction.length;
+                for (let i = 0; i < prediction.length; i++) {
+                    this.probabilities[offset + i] = prediction[i].probability;
+                }
+                this.times[this.next] = time;
+                this.next = (this.next + 1) % TRACE_SIZE;
+                this.size = Math.min(this.size + 1, TRACE_SIZE);
+            },
+
+            // Oldest first, as plain objects for inspection in the console
+            dump() {
+                const rows = [];
+                const classCount = this.classNames.length;
+                for (let n = 0; n < this.size; n++) {
+                    const index = (this.next - this.size + n + TRACE_SIZE) % TRACE_SIZE;
+                    const row = { time: this.times[index] };
+                    this.classNames.forEach((className, i) => {
+                        row[className] = this.probabilities[index * classCount + i];
+                    });
+                    rows.push(row);
+                }
+                return rows;
+            }
+        };
+
+        // Running timing stats per named stage (debug mode only)
+        const perfStats = {
+            stages: {},
+
+            record(name, ms) {
+                if (!DEBUG) return;
+                const stage = this.stages[name] || (this.stages[name] = { count: 0, totalMs: 0, maxMs: 0 });
+                stage.count++;
+                stage.totalMs += ms;
+                stage.maxMs = Math.max(stage.maxMs, ms);
+            },
+
+            report() {
+                const rows = {};
+                for (const [name, stage] of Object.entries(this.stages)) {
+                    rows[name] = {
+                        count: stage.count,
+                        avgMs: stage.count ? stage.totalMs / stage.count : 0,
+                        maxMs: stage.maxMs
+                    };
+                }
+                return rows;
+            },
+
+            reset() {
+                this.stages = {};
+            }
+        };
+
+        // Pose timeline of a task, uploaded when it ends. Runs of frames with the
+        // same top class and confidence band become one segment, so a held pose
+        // costs 12 bytes however long it is held. ?keypoints=HZ also samples the
+        // pose at that rate (quantized to 5 bytes per keypoint).
+        const TIMELINE_CONFIDENCE_STEPS = 10; // Confidence bands; crossing one starts a segment
+        const TIMELINE_KEYPOINT_HZ = Math.min(Math.max(Number(pageParams.get('keypoints')) || 0, 0), 30);
+
+        // Copy a typed array into a new one twice the size
+        function grown(array) {
+            const bigger = new array.constructor(array.length * 2);
+            bigger.set(array);
+            return bigger;
+        }
+
+        const timelineRecorder = {
+            classNames: [],
+            segmentCount: 0,
+            segmentStart: new Uint32Array(256), // ms since task start
+            segmentEnd: new Uint32Array(256),
+            segmentFrames: new Uint16Array(256),
+            segmentClass: new Uint8Array(256),
+            segmentConfidence: new Float32Array(256), // Sum, divided by frames when encoding
+            lastBand: -1,
+            keypointCount: 0,
+            sampleCount: 0,
+            sampleTimes: new Uint32Array(64),
+            samplePositions: new Uint16Array(0), // x, y per keypoint
+            sampleScores: new Uint8Array(0),
+            nextSampleMs: 0,
+
+            start() {
+                this.classNames = [];
+                this.segmentCount = 0;
+                this.lastBand = -1;
+                this.keypointCount = 0;
+                this.sampleCount = 0;
+                this.nextSampleMs = 0;
+            },
+
+            record(timeMs, prediction, pose, frameWidth, frameHeight) {
+                if (!this.classNames.length) {
+                    this.classNames = prediction.slice(0, 255).map(pred => pred.className);
+                }
+                let top = 0;
+                for (let i = 1; i < this.classNames.length; i++) {
+                    if (prediction[i].probability > prediction[top].probability) top = i;
+                }
+                const confidence = prediction[top].probability;
+                const band = Math.min(Math.floor(confidence * TIMELINE_CONFIDENCE_STEPS), TIMELINE_CONFIDENCE_STEPS - 1);
+                const t = Math.max(0, Math.round(timeMs));
+
+                const last = this.segmentCount - 1;
+                if (last >= 0 && this.segmentClass[last] === top && this.lastBand === band && this.segmentFrames[last] < 0xffff) {
+                    this.segmentEnd[last] = t;
+                    this.segmentFrames[last]++;
+                    this.segmentConfidence[last] += confidence;
+                } else {
+                    if (this.segmentCount === this.segmentStart.length) {
+                        this.segmentStart = grown(this.segmentStart);
+                        this.segmentEnd = grown(this.segmentEnd);
+                        this.segmentFrames = grown(this.segmentFrames);
+                        this.segmentClass = grown(this.segmentClass);
+                        this.segmentConfidence = grown(this.segmentConfidence);
+                    }
+                    const n = this.segmentCount++;
+                    this.segmentStart[n] = this.segmentEnd[n] = t;
+                    this.segmentFrames[n] = 1;
+                    this.segmentClass[n] = top;
+                    this.segmentConfidence[n] = confidence;
+                    this.lastBand = band;
+                }
+
+                if (TIMELINE_KEYPOINT_HZ && pose && t >= this.nextSampleMs) {
+                    this.recordKeypoints(t, pose.keypoints, frameWidth, frameHeight);
+                    this.nextSampleMs = t + 1000 / TIMELINE_KEYPOINT_HZ;
+                }
+            },
+
+            recordKeypoints(t, keypoints, frameWidth, frameHeight) {
+                if (!this.keypointCount) {
+                    this.keypointCount = keypoints.length;
+                    this.samplePositions = new Uint16Array(this.sampleTimes.length * keypoints.length * 2);
+                    this.sampleScores = new Uint8Array(this.sampleTimes.length * keypoints.length);
+                }
+                if (this.sampleCount === this.sampleTimes.length) {
+                    this.sampleTimes = grown(this.sampleTimes);
+                    this.samplePositions = grown(this.samplePositions);
+                    this.sampleScores = grown(this.sampleScores);
+                }
+                const n = this.sampleCount++;
+                this.sampleTimes[n] = t;
+                const clamp = value => Math.min(Math.max(value, 0), 1);
+                for (let k = 0; k < this.keypointCount; k++) {
+                    const keypoint = keypoints[k];
+                    const i = n * this.keypointCount + k;
+                    // Typed arrays round and wrap, so clamp to the frame first
+                    this.samplePositions[i * 2] = Math.round(clamp(keypoint.position.x / frameWidth) * 0xffff);
+                    this.samplePositions[i * 2 + 1] = Math.round(clamp(keypoint.position.y / frameHeight) * 0xffff);
+                    this.sampleScores[i] = Math.round(clamp(keypoint.score) * 0xff);
+                }
+            },
+
+            // Binary layout is documented in timeline.py
+            encode() {
+                const encoder = new TextEncoder();
+                const names = this.classNames.map(name => encoder.encode(name));
+                const kp = this.keypointCount;
+                const size = 4 + 2 + names.reduce((total, name) => total + 2 + name.length, 0)
+                    + 4 + 2 + 4 + this.segmentCount * 12 + this.sampleCount * (4 + kp * 5);
+                const buffer = new ArrayBuffer(size);
+                const view = new DataView(buffer);
+                const bytes = new Uint8Array(buffer);
+                let offset = 0;
+
+                bytes.set(encoder.encode('PTL1'), offset);
+                offset += 4;
+                view.setUint16(offset, names.length, true);
+                offset += 2;
+                for (const name of names) {
+                    view.setUint16(offset, name.length, true);
+                    bytes.set(name, offset + 2);
+                    offset += 2 + name.length;
+                }
+                view.setUint32(offset, this.segmentCount, true);
+                view.setUint16(offset + 4, kp, true);
+                view.setUint32(offset + 6, this.sampleCount, true);
+                offset += 10;
+
+                for (let n = 0; n < this.segmentCount; n++) {
+                    view.setUint32(offset, this.segmentStart[n], true);
+                    view.setUint32(offset + 4, this.segmentEnd[n], true);
+                    view.setUint16(offset + 8, this.segmentFrames[n], true);
+                    view.setUint8(offset + 10, this.segmentClass[n]);
+                    view.setUint8(offset + 11, Math.round(this.segmentConfidence[n] / this.segmentFrames[n] * 0xff));
+                    offset += 12;
+                }
+                for (let n = 0; n < this.sampleCount; n++) {
+                    view.setUint32(offset, this.sampleTimes[n], true);
+                    offset += 4;
+                    for (let k = 0; k < kp; k++) {
+                        const i = n * kp + k;
+                        view.setUint16(offset, this.samplePositions[i * 2], true);
+                        view.setUint16(offset + 2, this.samplePositions[i * 2 + 1], true);
+                        view.setUint8(offset + 4, this.sampleScores[i]);
+                        offset += 5;
+                    }
+                }
+                return buffer;
+            }
+        };
+
+        // Console access, e.g. console.table(poseDebug.trace())
+        window.poseDebug = {
+            trace: () => predictionTrace.dump(),
+            stats: () => perfStats.report(),
+            motion: () => ({ ...motionGate.counts }),
+            replay: () => replayResult,
+            resetStats: () => perfStats.reset(),
+            timeline: () => timelineRecorder.encode()
+        };
 
         // DOM Elements
         const modelUrlInput = document.getElementById('model-url');
         const checkModelButton = document.getElementById('check-model-button');
+        const modelSelect = document.getElementById('model-select');
         const testWebcamButton = document.getElementById('test-webcam-button');
         const stopTestWebcamButton = document.getElementById('stop-test-webcam-button');
         const feedback = document.getElementById('feedback');
         const taskSection = document.getElementById('task-section');
+        const webcamVideo = document.getElementById('webcam-video');
         const webcamCanvas = document.getElementById('webcam-canvas');
         const ctxWebcamCanvas = webcamCanvas.getContext('2d');
+        webcamVideo.classList.toggle('hidden', RENDER_MODE !== 'video');
         const barChartContainer = document.getElementById('bar-chart-container');
         const barChartCanvas = document.getElementById('bar-chart').getContext('2d');
         const overlay = document.getElementById('overlay');
         const taskTimer = document.getElementById('task-timer');
         const currentClass = document.getElementById('current-class');
         const currentProbability = document.getElementById('current-probability');
+        const inferenceRate = document.getElementById('inference-rate');
+        const qualitySetting = document.getElementById('quality-setting');
         const countdownElement = document.getElementById('countdown');
         const feedbackMessage = document.getElementById('feedback-message');
         const startTaskButton = document.getElementById('start-task-button');
@@ -249,6 +641,452 @@ HTML_PAGE = """
         const summaryContent = document.getElementById('summary-content');
         const summaryGraphCanvas = document.getElementById('summary-graph').getContext('2d');
         const restartButton = document.getElementById('restart-button');
+        const studentNameInput = document.getElementById('student-name');
+        const classCodeInput = document.getElementById('class-code');
+        const sessionStatus = document.getElementById('session-status');
+        const diagnosticsPanel = document.getElementById('diagnostics');
+        const replaySection = document.getElementById('replay-section');
+        const replayInput = document.getElementById('replay-input');
+        const replayBenchmarkButton = document.getElementById('replay-benchmark-button');
+        const replayStatus = document.getElementById('replay-status');
+
+        let loadedModelURL = null; // URL of the currently loaded model
+        let engine = null; // Inference engine: Web Worker, or main thread as the fallback
+        let backendInfo = null; // { backend, latencyMs, source } chosen for the current engine
+        let modelLoadInfo = null; // { ms, fromCache, inMemory } for the last model load
+
+        // Models held by the engine, least recently used first. Switching back to
+        // one skips the download and tmPose.load(); past MODEL_SLOTS (?models=N)
+        // the oldest is disposed to free its weights.
+        const MODEL_SLOTS = Math.max(Number(pageParams.get('models')) || 3, 1);
+        const loadedModels = new Map(); // proxied URL -> { url, labels }
+
+        // IndexedDB model cache
+        const MODEL_DB_NAME = 'poseTrackerModels';
+        const MODEL_DB_MAX_BYTES = 200 * 1024 * 1024; // Least recently used models are evicted above this
+        const MODEL_DB_MAX_AGE_MS = 24 * 60 * 60 * 1000; // Re-download after this long when online
+
+        // Script URLs the inference worker imports (same pinned copies as this page)
+        const VENDOR_SCRIPTS = [
+            {{ vendor_url('tfjs')|tojson }},
+            {{ vendor_url('tfjs-wasm')|tojson }},
+            {{ vendor_url('tmpose')|tojson }}
+        ];
+        const WASM_BINARY_URL = new URL({{ vendor_url('tfjs-wasm-binary')|tojson }}, window.location.href).href;
+        const POSE_WORKER_URL = {{ url_for('static', filename='pose-worker.js')|tojson }};
+
+        function median(values) {
+            const sorted = [...values].sort((a, b) => a - b);
+            return sorted[Math.floor(sorted.length / 2)];
+        }
+
+        // Backends tfjs can use here, most preferred first
+        function registeredBackends() {
+            const order = ['webgl', 'wasm', 'cpu'];
+            return Object.keys(tf.engine().registryFactory)
+                .sort((a, b) => (order.indexOf(a) + 1 || 99) - (order.indexOf(b) + 1 || 99));
+        }
+
+        // The WASM backend fetches its binary from the same pinned copy the scripts come from
+        if (tf.wasm && tf.wasm.setWasmPath) {
+            tf.wasm.setWasmPath(WASM_BINARY_URL);
+        }
+
+        // In-memory IOHandler for tmPose.load(), which hands it to tf.loadLayersModel()
+        function modelArtifacts(modelFiles) {
+            return tf.io.fromMemory({
+                modelTopology: modelFiles.modelTopology,
+                weightSpecs: modelFiles.weightSpecs,
+                weightData: modelFiles.weightData
+            });
+        }
+
+        // Small promise wrapper around an IndexedDB request
+        function idbRequest(request) {
+            return new Promise((resolve, reject) => {
+                request.onsuccess = () => resolve(request.result);
+                request.onerror = () => reject(request.error);
+            });
+        }
+
+        // Model files cached in IndexedDB, keyed by absolute model URL. The
+        // 'models' store holds topology, weights and metadata; 'entries' holds
+        // only size and last use, so eviction never has to read any weights.
+        const modelStore = {
+            dbPromise: null,
+
+            open() {
+                if (!this.dbPromise) {
+                    const request = indexedDB.open(MODEL_DB_NAME, 1);
+                    request.onupgradeneeded = () => {
+                        request.result.createObjectStore('models', { keyPath: 'key' });
+                        request.result.createObjectStore('entries', { keyPath: 'key' });
+                    };
+                    this.dbPromise = idbRequest(request);
+                }
+                return this.dbPromise;
+            },
+
+            async get(key) {
+                const db = await this.open();
+                const record = await idbRequest(db.transaction('models').objectStore('models').get(key));
+                if (record) {
+                    db.transaction('entries', 'readwrite').objectStore('entries')
+                        .put({ key, bytes: record.bytes, lastUsed: Date.now() });
+                }
+                return record;
+            },
+
+            async put(record) {
+                const db = await this.open();
+                const transaction = db.transaction(['models', 'entries'], 'readwrite');
+                transaction.objectStore('models').put(record);
+                transaction.objectStore('entries').put({ key: record.key, bytes: record.bytes, lastUsed: Date.now() });
+                await new Promise((resolve, reject) => {
+                    transaction.oncomplete = resolve;
+                    transaction.onerror = () => reject(transaction.error);
+                });
+                await this.evict(record.key);
+            },
+
+            // Delete least recently used models until the total fits MODEL_DB_MAX_BYTES
+            async evict(keepKey) {
+                const db = await this.open();
+                const entries = await idbRequest(db.transaction('entries').objectStore('entries').getAll());
+                entries.sort((a, b) => a.lastUsed - b.lastUsed);
+                let total = entries.reduce((sum, entry) => sum + entry.bytes, 0);
+                const transaction = db.transaction(['models', 'entries'], 'readwrite');
+                for (const entry of entries) {
+                    if (total <= MODEL_DB_MAX_BYTES) break;
+                    if (entry.key === keepKey) continue;
+                    transaction.objectStore('models').delete(entry.key);
+                    transaction.objectStore('entries').delete(entry.key);
+                    total -= entry.bytes;
+                    log.info(`Evicted cached model ${entry.key}.`);
+                }
+            }
+        };
+
+        // Download model.json, its weight shards and metadata.json into one record
+        async function fetchModelFiles(modelURL) {
+            async function fetchOk(url) {
+                const response = await fetch(url);
+                if (!response.ok) {
+                    throw new Error(`${url} returned ${response.status}`);
+                }
+                return response;
+            }
+
+            const modelJSONURL = new URL('model.json', modelURL);
+            const modelJSON = await (await fetchOk(modelJSONURL)).json();
+            const metadata = await (await fetchOk(new URL('metadata.json', modelURL))).json();
+
+            const weightSpecs = [];
+            const shards = [];
+            for (const group of modelJSON.weightsManifest) {
+                weightSpecs.push(...group.weights);
+                for (const path of group.paths) {
+                    shards.push(await (await fetchOk(new URL(path, modelJSONURL))).arrayBuffer());
+                }
+            }
+            const weightData = new Uint8Array(shards.reduce((sum, shard) => sum + shard.byteLength, 0));
+            let offset = 0;
+            for (const shard of shards) {
+                weightData.set(new Uint8Array(shard), offset);
+                offset += shard.byteLength;
+            }
+
+            return {
+                kind: 'layers', // Teachable Machine pose classifiers are always layers models
+                modelTopology: modelJSON.modelTopology,
+                weightSpecs,
+                weightData: weightData.buffer,
+                metadata,
+                bytes: weightData.byteLength,
+                savedAt: Date.now()
+            };
+        }
+
+        // Model files from IndexedDB when a recent copy exists (or we are offline),
+        // otherwise from the network, storing the result for next time
+        async function loadModelFiles(modelURL) {
+            const key = new URL(modelURL, window.location.href).href;
+            let cached = null;
+            try {
+                cached = await modelStore.get(key);
+            } catch (error) {
+                log.warn("Model cache unavailable:", error);
+            }
+            if (cached && (Date.now() - cached.savedAt < MODEL_DB_MAX_AGE_MS || !navigator.onLine)) {
+                return { modelFiles: cached, fromCache: true };
+            }
+
+            try {
+                const modelFiles = await fetchModelFiles(key);
+                modelStore.put({ key, ...modelFiles }).catch(error => log.warn("Could not cache the model:", error));
+                return { modelFiles, fromCache: false };
+            } catch (error) {
+                if (cached) {
+                    log.warn("Model download failed; using the cached copy.", error);
+                    return { modelFiles: cached, fromCache: true };
+                }
+                throw error;
+            }
+        }
+
+        // A black canvas used for warm-up and soak runs
+        function blankCanvas(width, height) {
+            const canvas = document.createElement('canvas');
+            canvas.width = width;
+            canvas.height = height;
+            canvas.getContext('2d').fillRect(0, 0, width, height);
+            return canvas;
+        }
+
+        // Runs PoseNet and the classifier on the UI thread. Reached only through
+        // mainThreadEngine below, which runs one call at a time.
+        const mainThreadCalls = {
+            models: new Map(), // key -> { model, modelFiles }; files are kept so reset() can reload
+            activeKey: null,
+
+            // modelFiles comes from loadModelFiles(): topology, weights and metadata.
+            // The model is kept under `key` next to any others and becomes the active one.
+            async load(key, modelFiles) {
+                const loaded = await tmPose.load(modelArtifacts(modelFiles), modelFiles.metadata);
+                await this.unload(key);
+                this.models.set(key, { model: loaded, modelFiles });
+                return this.activate(key);
+            },
+
+            async activate(key) {
+                const entry = this.models.get(key);
+                if (!entry) {
+                    throw new Error(`Model ${key} is not loaded.`);
+                }
+                model = entry.model;
+                this.activeKey = key;
+                return { totalClasses: model.getTotalClasses(), labels: model.getClassLabels() };
+            },
+
+            async unload(key) {
+                const entry = this.models.get(key);
+                if (!entry) {
+                    return;
+                }
+                this.models.delete(key);
+                if (key === this.activeKey) {
+                    model = null;
+                    this.activeKey = null;
+                }
+                entry.model.dispose();
+            },
+
+            async warmup(width, height, runs) {
+                const canvas = blankCanvas(width, height);
+                const start = performance.now();
+                for (let i = 0; i < runs; i++) {
+                    await this.infer(canvas);
+                }
+                return { ms: performance.now() - start };
+            },
+
+            // With a gate ({ reference, threshold }) the classifier only runs when the
+            // pose moved that far from the reference; otherwise prediction is null
+            async infer(canvas, gate = null) {
+                // Every tensor created during this step is disposed at endScope(),
+                // including anything tmPose leaves behind
+                tf.engine().startScope();
+                try {
+                    // ms is this frame's own work, without time queued behind other calls
+                    const start = performance.now();
+                    const { pose, posenetOutput } = await model.estimatePose(canvas);
+                    if (gate && pose && poseMotion(gate.reference, pose.keypoints) < gate.threshold) {
+                        return { pose, prediction: null, ms: performance.now() - start };
+                    }
+                    const prediction = await model.predict(posenetOutput);
+                    return { pose, prediction, ms: performance.now() - start };
+                } finally {
+                    tf.engine().endScope();
+                }
+            },
+
+            async memory() {
+                const { numTensors, numBytes } = tf.memory();
+                return { numTensors, numBytes, backend: tf.getBackend() };
+            },
+
+            async listBackends() {
+                return registeredBackends();
+            },
+
+            async setBackend(name) {
+                if (!(await tf.setBackend(name))) {
+                    throw new Error(`Backend ${name} could not be initialized.`);
+                }
+            },
+
+            // Median latency of one inference on `name`, after one untimed run
+            async benchmark(name, width, height, runs) {
+                await this.setBackend(name);
+                const canvas = blankCanvas(width, height);
+                await this.infer(canvas);
+                const times = [];
+                for (let i = 0; i < runs; i++) {
+                    const start = performance.now();
+                    await this.infer(canvas);
+                    times.push(performance.now() - start);
+                }
+                return { ms: median(times) };
+            },
+
+            // Drop every tensor (leaked or not) by resetting the tfjs engine,
+            // then load the active model again on the same backend. The other
+            // models' weights are gone too, so they are forgotten.
+            async reset() {
+                const backend = tf.getBackend();
+                const key = this.activeKey;
+                const { modelFiles } = this.models.get(key);
+                model = null;
+                this.activeKey = null;
+                this.models.clear();
+                tf.engine().reset();
+                await this.setBackend(backend);
+                return this.load(key, modelFiles);
+            }
+        };
+
+        // Calls are queued like the messages in pose-worker.js. tfjs scopes are
+        // engine-global, so a frame, a warm-up run and a soak run overlapping
+        // across an await could dispose each other's tensors at endScope().
+        const mainThreadEngine = { name: 'main thread' };
+        let mainThreadQueue = Promise.resolve();
+        for (const method of ['load', 'activate', 'unload', 'warmup', 'infer', 'memory',
+                              'listBackends', 'setBackend', 'benchmark', 'reset']) {
+            mainThreadEngine[method] = (...args) => {
+                const result = mainThreadQueue.then(() => mainThreadCalls[method](...args));
+                mainThreadQueue = result.catch(() => {});
+                return result;
+            };
+        }
+
+        // Runs PoseNet and the classifier in a Web Worker; frames are handed
+        // over as transferable ImageBitmaps so the UI thread only copies pixels
+        function createWorkerEngine() {
+            const worker = new Worker(POSE_WORKER_URL);
+            const pending = new Map();
+            let nextId = 1;
+
+            worker.onmessage = (event) => {
+                const { id, ok, result, error } = event.data;
+                const call = pending.get(id);
+                pending.delete(id);
+                if (ok) {
+                    call.resolve(result);
+                } else {
+                    call.reject(new Error(error));
+                }
+            };
+            worker.onerror = (event) => {
+                for (const call of pending.values()) {
+                    call.reject(new Error(event.message || "Inference worker failed."));
+                }
+                pending.clear();
+            };
+
+            function send(type, payload = {}, transfer = []) {
+                return new Promise((resolve, reject) => {
+                    const id = nextId++;
+                    pending.set(id, { resolve, reject });
+                    worker.postMessage({ ...payload, id, type }, transfer);
+                });
+            }
+
+            return {
+                name: 'worker',
+                backend: null,
+
+                async init() {
+                    const { backend } = await send('init', { scripts: VENDOR_SCRIPTS, wasmPath: WASM_BINARY_URL });
+                    this.backend = backend;
+                },
+
+                load(key, modelFiles) {
+                    return send('load', { key, modelFiles });
+                },
+
+                activate(key) {
+                    return send('activate', { key });
+                },
+
+                unload(key) {
+                    return send('unload', { key });
+                },
+
+                warmup(width, height, runs) {
+                    return send('warmup', { width, height, runs });
+                },
+
+                memory() {
+                    return send('memory');
+                },
+
+                async listBackends() {
+                    return (await send('backends')).backends;
+                },
+
+                async setBackend(name) {
+                    await send('setBackend', { name });
+                },
+
+                benchmark(name, width, height, runs) {
+                    return send('benchmark', { name, width, height, runs });
+                },
+
+                reset() {
+                    return send('reset');
+                },
+
+                async infer(canvas, gate = null) {
+                    const bitmap = await createImageBitmap(canvas);
+                    return send('frame', { bitmap, gate }, [bitmap]);
+                },
+
+                terminate() {
+                    worker.terminate();
+                }
+            };
+        }
+
+        // Prefer the worker when OffscreenCanvas is available (?worker=0 disables it)
+        async function chooseEngine() {
+            const workerSupported = typeof Worker !== 'undefined'
+                && typeof OffscreenCanvas !== 'undefined'
+                && typeof createImageBitmap === 'function';
+            if (workerSupported && pageParams.get('worker') !== '0') {
+                const workerEngine = createWorkerEngine();
+                try {
+                    await workerEngine.init();
+                    // With only the CPU backend the worker would be slower than
+                    // WebGL or WASM on the main thread
+                    const backends = await workerEngine.listBackends();
+                    if (backends.some(name => name !== 'cpu')) {
+                        return workerEngine;
+                    }
+                    log.warn("Worker has no WebGL or WASM backend; using the main thread.");
+                } catch (error) {
+                    log.warn("Inference worker unavailable; using the main thread.", error);
+                }
+                workerEngine.terminate();
+            }
+            return mainThreadEngine;
+        }
+
+        // Teachable Machine share links are fetched through this server's
+        // /models/ proxy so the whole class shares one cached download
+        function proxiedModelURL(modelURL) {
+            const match = modelURL.match(/^https?:\\/\\/teachablemachine\\.withgoogle\\.com\\/models\\/([A-Za-z0-9_-]+)\\/$/);
+            return match ? `/models/${match[1]}/` : modelURL;
+        }
 
         // Function to validate and load the model
         async function loadModel(modelURL) {
@@ -257,94 +1095,688 @@ HTML_PAGE = """
                 if (!modelURL.endsWith('/')) {
                     modelURL += '/';
                 }
+                const enteredURL = modelURL;
+                modelURL = proxiedModelURL(modelURL);
 
-                console.log(`Loading model from ${modelURL}`);
-
-                const modelJSON = modelURL + "model.json";
-                const metadataJSON = modelURL + "metadata.json";
-
-                // Attempt to load the model
-                model = await tmPose.load(modelJSON, metadataJSON);
-                maxPredictions = model.getTotalClasses();
+                // Same model already loaded: nothing to fetch again
+                if (loadedModelURL && modelURL === loadedModelURL) {
+                    log.info(`Model from ${modelURL} is already loaded.`);
+                    return true;
+                }
 
-                console.log(`Model loaded with ${maxPredictions} classes.`);
+                const loadStart = performance.now();
 
-                // Initialize classDurations
-                classDurations = {};
-                for (let i = 0; i < maxPredictions; i++) {
-                    let className = null;
+                // Loaded earlier: make it the active model again
+                if (loadedModels.has(modelURL)) {
+                    useModel(modelURL, enteredURL, await engine.activate(modelURL));
+                    modelLoadInfo = { ms: performance.now() - loadStart, fromCache: true, inMemory: true };
+                    log.info(`Switched to model ${modelURL}.`);
+                    return true;
+                }
 
-                    // Attempt to retrieve class names from model.classes
-                    if (model.classes && model.classes.length > 0) {
-                        className = model.classes[i];
+                log.info(`Loading model from ${modelURL}`);
+                const [{ modelFiles, fromCache }, chosenEngine] = await Promise.all([
+                    loadModelFiles(modelURL),
+                    engine ? engine : chooseEngine()
+                ]);
+                engine = chosenEngine;
+
+                // Free the least recently used model before loading another
+                while (loadedModels.size >= MODEL_SLOTS) {
+                    const [oldest] = loadedModels.keys();
+                    await engine.unload(oldest);
+                    loadedModels.delete(oldest);
+                    if (oldest === loadedModelURL) {
+                        loadedModelURL = null;
                     }
+                    log.info(`Disposed model ${oldest} to make room.`);
+                }
 
-                    // Fallback: Attempt to retrieve class names from model.labels
-                    if (!className && model.labels && model.labels.length > 0) {
-                        className = model.labels[i];
+                // Attempt to load the model
+                let modelInfo;
+                try {
+                    modelInfo = await engine.load(modelURL, modelFiles);
+                } catch (error) {
+                    if (engine === mainThreadEngine) {
+                        throw error;
                     }
+                    // The worker could not load it; retry on the main thread.
+                    // Models held by the worker go with it.
+                    log.warn("Worker failed to load the model; retrying on the main thread.", error);
+                    engine.terminate();
+                    engine = mainThreadEngine;
+                    backendInfo = null;
+                    loadedModels.clear();
+                    modelInfo = await engine.load(modelURL, modelFiles);
+                }
+                modelLoadInfo = { ms: performance.now() - loadStart, fromCache, inMemory: false };
 
-                    // Fallback: If className is still not found, use prediction class names later
-                    if (!className) {
-                        console.warn(`Class name at index ${i} is undefined. It will be tracked dynamically.`);
-                        continue;
-                    }
+                // Pick the TF.js backend once per engine, now that a model is there to time
+                if (!backendInfo || backendInfo.engine !== engine.name) {
+                    backendInfo = await selectBackend();
+                }
+
+                useModel(modelURL, enteredURL, modelInfo);
+                log.info(`Model loaded with ${maxPredictions} classes (inference on ${engine.name}, ${backendInfo.backend}).`);
+
+                // Compile shaders and allocate tensors now instead of on the first tracked frame
+                try {
+                    await warmupModel(WEBCAM_WIDTH, WEBCAM_HEIGHT);
+                } catch (error) {
+                    log.warn("Model warm-up failed:", error);
+                }
 
-                    classDurations[className] = 0; // Initialize duration to 0
+                // Watch the tensor count from here on, and run the soak test if asked
+                tensorWatchdog.start();
+                if (SOAK_ITERATIONS > 0) {
+                    runSoakTest(SOAK_ITERATIONS);
                 }
 
                 // If successful, return true
                 return true;
             } catch (error) {
-                console.error("Error loading model:", error);
+                log.error("Error loading model:", error);
                 feedback.textContent = `Error loading model: ${error.message}`;
                 feedback.className = "error";
                 return false;
             }
         }
 
-        // Function to initialize the main webcam
-        async function setupWebcam() {
-            const width = 320; // Standard webcam width for task
-            const height = 240; // Standard webcam height for task
-            const flip = true;
-            webcam = new tmPose.Webcam(width, height, flip);
+        // Make a model the engine has just loaded or activated the current one:
+        // class durations and the live chart follow its labels
+        function useModel(modelURL, enteredURL, modelInfo) {
+            loadedModels.delete(modelURL); // Re-inserted as the most recently used
+            loadedModels.set(modelURL, { url: enteredURL, labels: modelInfo.labels || [] });
+            loadedModelURL = modelURL;
+            maxPredictions = modelInfo.totalClasses;
+            qualityController.reset(); // Models (and backends, chosen just before) differ in speed
+
+            // Initialize classDurations
+            classDurations = {};
+            classFrames = {};
+            for (let i = 0; i < maxPredictions; i++) {
+                let className = null;
+
+                // Attempt to retrieve class names from the model metadata
+                if (modelInfo.labels && modelInfo.labels.length > 0) {
+                    className = modelInfo.labels[i];
+                }
+
+                // Fallback: If className is still not found, use prediction class names later
+                if (!className) {
+                    log.warn(`Class name at index ${i} is undefined. It will be tracked dynamically.`);
+                    continue;
+                }
+
+                classDurations[className] = 0; // Initialize duration to 0
+            }
+
+            motionGate.reset();
+
+            // The live chart is rebuilt with the new labels
+            if (barChart) {
+                barChart.destroy();
+                barChart = null;
+            }
+            barChartInitialized = false;
+
+            updateModelSelect();
+        }
+
+        // Lists the loaded models, most recently used first, once there is a choice
+        function updateModelSelect() {
+            modelSelect.replaceChildren(...[...loadedModels].reverse().map(([key, { url, labels }]) => {
+                const option = document.createElement('option');
+                option.value = url;
+                option.textContent = labels.length ? `${url} (${labels.join(', ')})` : url;
+                option.selected = key === loadedModelURL;
+                return option;
+            }));
+            modelSelect.classList.toggle('hidden', loadedModels.size < 2);
+        }
+
+        // Samples the tensor count every TENSOR_WATCH_MS. If it stays more than
+        // TENSOR_LEAK_LIMIT above the post-warm-up baseline for several samples
+        // in a row, something is leaking: reset the tfjs engine and reload the model.
+        const tensorWatchdog = {
+            timer: null,
+            baseline: null,
+            overLimitSamples: 0,
+            recovering: false,
+            recoveries: 0,
+            last: null,
+
+            start() {
+                this.stop();
+                this.baseline = null;
+                this.overLimitSamples = 0;
+                this.sample();
+                this.timer = setInterval(() => this.sample(), TENSOR_WATCH_MS);
+            },
+
+            stop() {
+                clearInterval(this.timer);
+                this.timer = null;
+            },
+
+            async sample() {
+                if (!engine || this.recovering) return;
+                try {
+                    this.last = await engine.memory();
+                } catch (error) {
+                    log.warn("Could not read tensor memory:", error);
+                    return;
+                }
+
+                const numTensors = this.last.numTensors;
+                if (this.baseline === null || numTensors < this.baseline) {
+                    this.baseline = numTensors;
+                }
+                if (numTensors - this.baseline > TENSOR_LEAK_LIMIT) {
+                    this.overLimitSamples++;
+                    log.warn(`Tensor count ${numTensors} is ${numTensors - this.baseline} above baseline ${this.baseline}.`);
+                    if (this.overLimitSamples >= TENSOR_LEAK_SAMPLES) {
+                        await this.recover();
+                    }
+                } else {
+                    this.overLimitSamples = 0;
+                }
+                updateDiagnostics();
+            },
+
+            async recover() {
+                this.recovering = true;
+                log.warn("Tensor leak detected; resetting the TF.js engine and reloading the model.");
+                try {
+                    await engine.reset();
+                    // Only the active model is reloaded; the others have to be fetched again
+                    for (const key of [...loadedModels.keys()]) {
+                        if (key !== loadedModelURL) {
+                            loadedModels.delete(key);
+                        }
+                    }
+                    updateModelSelect();
+                    await warmupModel(WEBCAM_WIDTH, WEBCAM_HEIGHT);
+                    qualityController.reset();
+                    this.recoveries++;
+                } catch (error) {
+                    log.error("Tensor leak recovery failed:", error);
+                } finally {
+                    this.baseline = null;
+                    this.overLimitSamples = 0;
+                    this.recovering = false;
+                }
+            }
+        };
+
+        // Long-run check (?soak=N): N inferences on a blank frame must leave
+        // the tensor count where it started
+        async function runSoakTest(iterations) {
+            const canvas = blankCanvas(WEBCAM_WIDTH, WEBCAM_HEIGHT);
+            const before = (await engine.memory()).numTensors;
+            let peak = before;
+            soakResult = `Soak test: running ${iterations} inferences...`;
+            updateDiagnostics();
+
+            for (let i = 1; i <= iterations; i++) {
+                await engine.infer(canvas);
+                if (i % 50 === 0 || i === iterations) {
+                    const { numTensors } = await engine.memory();
+                    peak = Math.max(peak, numTensors);
+                    soakResult = `Soak test: ${i}/${iterations}, tensors ${before} -> ${numTensors}`;
+                    updateDiagnostics();
+                }
+            }
+
+            const after = (await engine.memory()).numTensors;
+            const passed = after <= before;
+            soakResult = `Soak test ${passed ? 'PASSED' : 'FAILED'}: ${iterations} inferences, tensors ${before} -> ${after} (peak ${peak})`;
+            (passed ? log.info : log.error)(soakResult);
+            updateDiagnostics();
+            return passed;
+        }
+
+        // Refresh the on-page diagnostics panel (debug/soak mode only)
+        function updateDiagnostics() {
+            if (!DEBUG && SOAK_ITERATIONS === 0) return;
+            diagnosticsPanel.classList.remove('hidden');
+
+            const memory = tensorWatchdog.last;
+            const lines = [
+                `Inference: ${engine ? engine.name : 'n/a'}${memory ? ` (${memory.backend})` : ''}`,
+                `Backend choice: ${backendInfo ? `${backendInfo.backend}, ${backendInfo.latencyMs.toFixed(1)} ms (${backendInfo.source})` : 'n/a'}`,
+                `Tensors: ${memory ? memory.numTensors : 'n/a'} (baseline ${tensorWatchdog.baseline ?? 'n/a'})`,
+                `Tensor memory: ${memory ? (memory.numBytes / 1048576).toFixed(1) : 'n/a'} MB`,
+                `Leak recoveries: ${tensorWatchdog.recoveries}`,
+                `Inference latency: ${inferenceScheduler.latencyMs === null ? 'n/a' : inferenceScheduler.latencyMs.toFixed(1) + ' ms'}`,
+                motionGate.summary()
+            ];
+            if (soakResult) {
+                lines.push(soakResult);
+            }
+            diagnosticsPanel.textContent = lines.join('\\n');
+        }
+
+        // Choose the TF.js backend for the current engine: ?backend= wins, then
+        // the choice saved for this device, otherwise time each available
+        // backend on a blank frame and keep the fastest
+        async function selectBackend() {
+            const available = await engine.listBackends();
+            const override = pageParams.get('backend');
+
+            async function tryBackend(name, source) {
+                try {
+                    const { ms } = await engine.benchmark(name, WEBCAM_WIDTH, WEBCAM_HEIGHT, BENCHMARK_RUNS);
+                    return { engine: engine.name, backend: name, latencyMs: ms, source };
+                } catch (error) {
+                    log.warn(`Backend ${name} failed:`, error);
+                    return null;
+                }
+            }
+
+            if (override && available.includes(override)) {
+                const chosen = await tryBackend(override, 'override');
+                if (chosen) return chosen;
+            }
+
+            const saved = readSavedBackend();
+            if (!override && saved && saved.engine === engine.name && available.includes(saved.backend)) {
+                const chosen = await tryBackend(saved.backend, 'saved');
+                if (chosen) return chosen;
+            }
+
+            let best = null;
+            for (const name of available) {
+                const result = await tryBackend(name, 'benchmark');
+                log.info(`Backend ${name}: ${result ? result.latencyMs.toFixed(1) + ' ms' : 'unavailable'}`);
+                if (result && (!best || result.latencyMs < best.latencyMs)) {
+                    best = result;
+                }
+            }
+            if (!best) {
+                throw new Error("No TF.js backend could run the model.");
+            }
+            await engine.setBackend(best.backend);
+            saveBackend(best);
+            return best;
+        }
+
+        function readSavedBackend() {
+            try {
+                const saved = JSON.parse(localStorage.getItem(BACKEND_STORAGE_KEY));
+                return saved && saved.tfjs === tf.version.tfjs ? saved : null;
+            } catch (error) {
+                return null;
+            }
+        }
+
+        function saveBackend(choice) {
             try {
-                console.log("Setting up main webcam...");
-                await webcam.setup(); // Request webcam access
-                await webcam.play();
-                console.log("Main webcam started.");
+                localStorage.setItem(BACKEND_STORAGE_KEY, JSON.stringify({ ...choice, tfjs: tf.version.tfjs }));
+            } catch (error) {
+                log.warn("Could not save the backend choice:", error);
+            }
+        }
 
-                // Set canvas dimensions
-                webcamCanvas.width = webcam.canvas.width;
-                webcamCanvas.height = webcam.canvas.height;
+        // Run a few inferences on a blank frame of the webcam size so the
+        // first real frame is processed at steady-state speed
+        async function warmupModel(width, height) {
+            let { ms } = await engine.warmup(width, height, WARMUP_RUNS);
+            // One pass at every other capture size, so switching sizes later
+            // does not stall on new shaders
+            if (PINNED_QUALITY_LEVEL === null) {
+                for (const [levelWidth, levelHeight] of QUALITY_LEVELS) {
+                    if (levelWidth !== width || levelHeight !== height) {
+                        ms += (await engine.warmup(levelWidth, levelHeight, 1)).ms;
+                    }
+                }
+            }
+            warmupTimeMs = ms;
+            log.info(`Model warmed up in ${warmupTimeMs.toFixed(0)} ms.`);
+            return warmupTimeMs;
+        }
 
-                window.requestAnimationFrame(loop);
-                return true;
+        // Frame sources. Each looks like the tmPose.Webcam the page was written
+        // against: `canvas` is a mirrored display copy refreshed by update(), and
+        // stop() releases it. `element` is the video or image captureFrame reads,
+        // `stream` the MediaStream the <video> preview can show (null for
+        // recordings), `live` whether it is a camera, and `ended` whether a
+        // recording has played out. start() (re)starts playback. Recordings also
+        // have frameCount and seek(index) for deterministic replay.
+        async function webcamSource() {
+            const webcam = new tmPose.Webcam(WEBCAM_WIDTH, WEBCAM_HEIGHT, true); // Mirrored
+            log.info("Setting up webcam...");
+            await webcam.setup(); // Request webcam access
+            await webcam.play();
+            return {
+                live: true,
+                element: webcam.webcam,
+                stream: webcam.webcam.srcObject,
+                canvas: webcam.canvas,
+                ended: false,
+                start() {},
+                update: () => webcam.update(),
+                stop: () => webcam.stop() // Stops the MediaStream tracks, turning the camera light off
+            };
+        }
+
+        // Display canvas for a recording. Recordings hold unmirrored camera
+        // frames, so they are flipped the same way as the webcam, both here and
+        // by captureFrame(), and the model sees them as it would live.
+        function replayCanvas() {
+            const canvas = document.createElement('canvas');
+            canvas.width = WEBCAM_WIDTH;
+            canvas.height = WEBCAM_HEIGHT;
+            const ctx = canvas.getContext('2d');
+            ctx.setTransform(-1, 0, 0, 1, canvas.width, 0);
+            return { canvas, draw: (element) => ctx.drawImage(element, 0, 0, canvas.width, canvas.height) };
+        }
+
+        // Resolves on the element's next `name` event, rejects on its next error
+        function mediaEvent(element, name) {
+            return new Promise((resolve, reject) => {
+                const done = (event) => {
+                    element.removeEventListener(name, done);
+                    element.removeEventListener('error', done);
+                    if (event.type === 'error') {
+                        reject(new Error("The recording could not be read."));
+                    } else {
+                        resolve();
+                    }
+                };
+                element.addEventListener(name, done);
+                element.addEventListener('error', done);
+            });
+        }
+
+        async function videoFileSource(file) {
+            const url = URL.createObjectURL(file);
+            const video = document.createElement('video');
+            video.muted = true;
+            video.playsInline = true;
+            video.preload = 'auto';
+            const loaded = mediaEvent(video, 'loadeddata');
+            video.src = url;
+            try {
+                await loaded;
+                // WebM files from MediaRecorder often have no duration in their
+                // header; seeking past the end makes the browser work it out
+                if (!Number.isFinite(video.duration)) {
+                    const seeked = mediaEvent(video, 'seeked');
+                    video.currentTime = 1e9;
+                    await seeked;
+                    const rewound = mediaEvent(video, 'seeked');
+                    video.currentTime = 0;
+                    await rewound;
+                }
+                if (!Number.isFinite(video.duration)) {
+                    throw new Error("The length of the recording could not be read.");
+                }
             } catch (error) {
-                console.error("Error accessing main webcam:", error);
-                feedback.textContent = `Error accessing main webcam: ${error.message}`;
-                feedback.className = "error";
-                return false;
+                URL.revokeObjectURL(url);
+                throw error;
             }
+            const display = replayCanvas();
+            return {
+                live: false,
+                element: video,
+                stream: null,
+                canvas: display.canvas,
+                get ended() { return video.ended; },
+                frameCount: Math.floor(video.duration * REPLAY_FPS),
+
+                start() {
+                    video.currentTime = 0;
+                    return video.play();
+                },
+
+                async seek(index) {
+                    const seeked = mediaEvent(video, 'seeked');
+                    video.currentTime = index / REPLAY_FPS;
+                    await seeked;
+                },
+
+                update() {
+                    display.draw(video);
+                },
+
+                stop() {
+                    video.pause();
+                    video.removeAttribute('src');
+                    video.load();
+                    URL.revokeObjectURL(url);
+                }
+            };
+        }
+
+        // Images are decoded one at a time as they are due, never all at once
+        async function imageSequenceSource(files) {
+            const images = files.slice().sort((a, b) => a.name.localeCompare(b.name, undefined, { numeric: true }));
+            const display = replayCanvas();
+            let index = -1, image = null, startedAt = null, loading = null, stopped = false;
+
+            async function load(i) {
+                const bitmap = await createImageBitmap(images[i]);
+                if (stopped) {
+                    bitmap.close();
+                    return;
+                }
+                if (image) {
+                    image.close();
+                }
+                image = bitmap;
+                index = i;
+            }
+
+            await load(0);
+            return {
+                live: false,
+                get element() { return image; },
+                stream: null,
+                canvas: display.canvas,
+                get ended() {
+                    return startedAt !== null && (performance.now() - startedAt) * REPLAY_FPS / 1000 >= images.length;
+                },
+                frameCount: images.length,
+
+                start() {
+                    startedAt = performance.now();
+                },
+
+                seek: load,
+
+                update() {
+                    if (startedAt !== null && !loading) {
+                        const due = Math.min(Math.floor((performance.now() - startedAt) * REPLAY_FPS / 1000), images.length - 1);
+                        if (due !== index) {
+                            loading = load(due).finally(() => { loading = null; });
+                        }
+                    }
+                    if (image) {
+                        display.draw(image);
+                    }
+                },
+
+                stop() {
+                    stopped = true;
+                    if (image) {
+                        image.close();
+                        image = null;
+                    }
+                }
+            };
+        }
+
+        // Owns the page's one frame source and its one frame loop. Test and
+        // task mode only change what the loop does with each frame, so
+        // switching between them never reopens the device. The webcam is
+        // released by stop() or while the page is hidden, and reopened when
+        // the page is shown again if it was in use.
+        const camera = {
+            source: null, // Current frame source; see webcamSource()
+            openSource: webcamSource, // What start() opens: the webcam, or a chosen recording
+            opening: null, // Pending open(), shared by concurrent start() calls
+            wanted: false, // Whether the source should be on when the page is visible
+            loopRunning: false,
+            stepping: false, // A replay benchmark is driving the frames instead of the loop
+
+            // Resolves to true once frames are flowing
+            start() {
+                this.wanted = true;
+                if (this.source) return Promise.resolve(true);
+                if (!this.opening) {
+                    this.opening = this.open().finally(() => { this.opening = null; });
+                }
+                return this.opening;
+            },
+
+            async open() {
+                let source;
+                try {
+                    source = await this.openSource();
+                } catch (error) {
+                    log.error("Error opening the frame source:", error);
+                    feedback.textContent = `Error accessing webcam: ${error.message}`;
+                    feedback.className = "error";
+                    this.wanted = false;
+                    return false;
+                }
+                if (!this.wanted || document.hidden) {
+                    // Stopped or hidden while the permission prompt was open
+                    source.stop();
+                    return false;
+                }
+                this.source = source;
+                source.start();
+                log.info(source.live ? "Webcam started." : "Recording started.");
+
+                webcamCanvas.width = source.canvas.width;
+                webcamCanvas.height = source.canvas.height;
+                lastPose = null;
+                overlayRenderer.clear(ctxWebcamCanvas);
+                const preview = RENDER_MODE === 'video' && source.stream;
+                webcamVideo.classList.toggle('hidden', !preview);
+                if (preview) {
+                    webcamVideo.srcObject = source.stream;
+                    webcamVideo.play().catch(error => log.warn("Camera preview did not start:", error));
+                }
+                inferenceScheduler.reset();
+                if (!this.loopRunning) {
+                    this.loopRunning = true;
+                    window.requestAnimationFrame(loop);
+                }
+                return true;
+            },
+
+            stop() {
+                this.wanted = false;
+                this.release();
+            },
+
+            release() {
+                if (!this.source) return;
+                const { live } = this.source;
+                this.source.stop();
+                this.source = null;
+                webcamVideo.srcObject = null;
+                lastPose = null;
+                if (RENDER_MODE === 'video') {
+                    overlayRenderer.clear(ctxWebcamCanvas);
+                }
+                log.info(live ? "Webcam stopped." : "Recording stopped.");
+            }
+        };
+
+        // Give the webcam back while the tab is in the background
+        document.addEventListener('visibilitychange', () => {
+            if (document.hidden) {
+                if (camera.source && camera.source.live) {
+                    camera.release();
+                }
+            } else if (camera.wanted && !camera.stepping) {
+                camera.start();
+            }
+        });
+
+        // Reset duration accounting at the start of a session
+        function resetFrameStats() {
+            classFrames = {};
+            lastFrameTime = null;
+            framesProcessed = 0;
+            trackedTimeMs = 0;
+        }
+
+        // Milliseconds since the previous task frame, capped for throttled tabs.
+        // The cap follows the scheduler, so a device that can only infer every
+        // 300 ms still gets its full frame time counted.
+        function nextFrameDelta(frameTime) {
+            const cap = Math.max(MIN_FRAME_DELTA_CAP_MS, 2 * inferenceScheduler.intervalMs());
+            const delta = lastFrameTime === null ? 0 : Math.min(frameTime - lastFrameTime, cap);
+            lastFrameTime = frameTime;
+            framesProcessed++;
+            trackedTimeMs += delta;
+            return delta;
         }
 
         // Function to update the timer
         function updateTaskTimer() {
             const currentTime = performance.now();
             const elapsed = ((currentTime - taskStartTime) / 1000).toFixed(2);
-            taskTimer.textContent = `Time: ${elapsed}s`;
+            liveView.setText(taskTimer, `Time: ${elapsed}s`);
+            liveView.setText(inferenceRate, `Inference: ${inferenceScheduler.currentHz().toFixed(1)} Hz`);
         }
 
+        // Collects live overlay and chart changes and writes them out at most
+        // UI_RENDER_HZ times per second from the display loop. Values that did
+        // not change since the last write are skipped.
+        const liveView = {
+            pending: new Map(), // element -> { text, color }
+            chartDirty: false,
+            lastRenderTime: 0,
+
+            setText(element, text, color = null) {
+                this.pending.set(element, { text, color });
+            },
+
+            flush(now) {
+                if (now - this.lastRenderTime < 1000 / UI_RENDER_HZ) return;
+                this.lastRenderTime = now;
+
+                for (const [element, { text, color }] of this.pending) {
+                    if (element.textContent !== text) {
+                        element.textContent = text;
+                    }
+                    if (color !== null && element.style.color !== color) {
+                        element.style.color = color;
+                    }
+                }
+                this.pending.clear();
+
+                if (this.chartDirty && barChart) {
+                    barChart.update('none');
+                    this.chartDirty = false;
+                }
+            },
+
+            // Drops changes not written yet, so a late update from one task
+            // never shows up in the next, and lets the next flush run at once
+            reset() {
+                this.pending.clear();
+                this.chartDirty = false;
+                this.lastRenderTime = 0;
+            }
+        };
+
         // Function to initialize the real-time bar chart
-        function initializeBarChart(labels, initialData) {
+        function initializeBarChart(labels) {
+            liveChartData = labels.map(() => 0);
             barChart = new Chart(barChartCanvas, {
                 type: 'bar',
                 data: {
                     labels: labels,
                     datasets: [{
                         label: 'Pose Probability (%)',
-                        data: initialData,
+                        data: liveChartData,
                         backgroundColor: 'rgba(54, 162, 235, 0.7)',
                         borderColor: 'rgba(54, 162, 235, 1)',
                         borderWidth: 1
@@ -353,6 +1785,7 @@ HTML_PAGE = """
                 options: {
                     responsive: true,
                     maintainAspectRatio: false,
+                    animation: false, // Live data changes several times a second
                     scales: {
                         y: {
                             beginAtZero: true,
@@ -363,16 +1796,23 @@ HTML_PAGE = """
             });
         }
 
-        // Function to update the real-time bar chart
-        function updateBarChart(labels, data) {
+        // Function to update the real-time bar chart; the chart redraws on the next liveView flush
+        function updateBarChart(prediction) {
             if (!barChartInitialized) {
-                initializeBarChart(labels, data);
+                initializeBarChart(prediction.map(pred => pred.className));
                 barChartInitialized = true;
-            } else {
-                barChart.data.labels = labels;
-                barChart.data.datasets[0].data = data;
-                barChart.update();
             }
+
+            const labels = barChart.data.labels;
+            labels.length = prediction.length;
+            liveChartData.length = prediction.length;
+            for (let i = 0; i < prediction.length; i++) {
+                if (labels[i] !== prediction[i].className) {
+                    labels[i] = prediction[i].className;
+                }
+                liveChartData[i] = prediction[i].probability * 100;
+            }
+            liveView.chartDirty = true;
         }
 
         // Function to initialize the summary bar chart
@@ -439,34 +1879,315 @@ HTML_PAGE = """
             }, 1000);
         }
 
-        // Main prediction loop
-        async function loop() {
-            if (!webcam) return;
+        // Decides when the next inference may start. Inference runs at most
+        // TARGET_INFERENCE_HZ times per second, never overlaps a pending one,
+        // and slows down further when the measured latency does not fit
+        const inferenceScheduler = {
+            pending: false,
+            nextDueTime: 0,
+            latencyMs: null, // Moving average of inference latency
+            skippedFrames: 0, // Display frames that arrived while inference was pending
+
+            intervalMs() {
+                const targetInterval = 1000 / TARGET_INFERENCE_HZ;
+                if (this.latencyMs === null) return targetInterval;
+                return Math.max(targetInterval, this.latencyMs * LATENCY_HEADROOM);
+            },
+
+            currentHz() {
+                return 1000 / this.intervalMs();
+            },
+
+            tick(now, runInference) {
+                if (this.pending) {
+                    this.skippedFrames++;
+                    return;
+                }
+                if (now < this.nextDueTime) return;
+
+                this.pending = true;
+                this.nextDueTime = now + this.intervalMs();
+                const start = performance.now();
+                runInference().finally(() => {
+                    const latency = performance.now() - start;
+                    this.latencyMs = this.latencyMs === null
+                        ? latency
+                        : this.latencyMs + LATENCY_SMOOTHING * (latency - this.latencyMs);
+                    this.pending = false;
+                });
+            },
+
+            reset() {
+                this.pending = false;
+                this.nextDueTime = 0;
+                this.latencyMs = null;
+                this.skippedFrames = 0;
+            }
+        };
+
+        // Picks the capture size from the rolling median latency of the work that
+        // depends on it (capture plus inference). Reset for every task and model.
+        const qualityController = {
+            level: PINNED_QUALITY_LEVEL ?? DEFAULT_QUALITY_LEVEL,
+            samples: [],
+            frozen: false, // Set by the replay benchmark so every device uses the same size
+            latencyByLevel: new Map(), // level -> last median measured there
+            floor: 0, // Lowest level worth using; raised when a smaller size did not help
+            calmWindows: 0, // Windows in a row with plenty of headroom
+
+            reset() {
+                this.level = PINNED_QUALITY_LEVEL ?? DEFAULT_QUALITY_LEVEL;
+                this.samples = [];
+                this.latencyByLevel.clear();
+                this.floor = 0;
+                this.calmWindows = 0;
+            },
+
+            size() {
+                return QUALITY_LEVELS[this.level];
+            },
+
+            label() {
+                const [width, height] = this.size();
+                return `${width}x${height}${PINNED_QUALITY_LEVEL === null ? '' : ' (fixed)'}`;
+            },
+
+            record(latencyMs) {
+                if (PINNED_QUALITY_LEVEL !== null || this.frozen) return;
+                this.samples.push(latencyMs);
+                if (this.samples.length < QUALITY_WINDOW) return;
+
+                const latency = median(this.samples);
+                this.samples = [];
+                const budget = 1000 / TARGET_INFERENCE_HZ;
+                const larger = this.latencyByLevel.get(this.level + 1);
+                this.latencyByLevel.set(this.level, latency);
+
+                if (larger !== undefined && latency > larger * (1 - QUALITY_MIN_GAIN)) {
+                    // Not worth the lost detail: go back, and leave the rest to the scheduler
+                    this.floor = this.level + 1;
+                    this.setLevel(this.level + 1, latency);
+                } else if (latency > budget) {
+                    this.calmWindows = 0;
+                    if (this.level > this.floor) {
+                        this.setLevel(this.level - 1, latency);
+                    }
+                } else if (latency < budget * QUALITY_STEP_UP_RATIO && this.level < QUALITY_LEVELS.length - 1) {
+                    if (++this.calmWindows >= QUALITY_STEP_UP_WINDOWS) {
+                        this.setLevel(this.level + 1, latency);
+                    }
+                } else {
+                    this.calmWindows = 0;
+                }
+            },
+
+            setLevel(level, latency) {
+                this.level = level;
+                this.calmWindows = 0;
+                log.info(`Capture size set to ${this.label()} (median latency ${latency.toFixed(1)} ms).`);
+            }
+        };
+
+        // Mean movement of the keypoints confident in both poses, relative to the
+        // diagonal of the reference pose; Infinity when too few can be compared.
+        // static/pose-worker.js has the same function.
+        function poseMotion(reference, keypoints) {
+            const minScore = 0.5, minKeypoints = 5;
+            let minX = Infinity, minY = Infinity, maxX = -Infinity, maxY = -Infinity;
+            let total = 0, matched = 0;
+            for (let i = 0; i < reference.length && i < keypoints.length; i++) {
+                const a = reference[i], b = keypoints[i];
+                if (a.score < minScore || b.score < minScore) continue;
+                total += Math.hypot(a.position.x - b.position.x, a.position.y - b.position.y);
+                matched++;
+                minX = Math.min(minX, a.position.x);
+                maxX = Math.max(maxX, a.position.x);
+                minY = Math.min(minY, a.position.y);
+                maxY = Math.max(maxY, a.position.y);
+            }
+            const size = Math.hypot(maxX - minX, maxY - minY);
+            return matched >= minKeypoints && size > 0 ? total / matched / size : Infinity;
+        }
+
+        // Decides per frame how much of the inference to skip while the student
+        // holds still. The reference is the pose last classified, not the previous
+        // frame, so slow drift still adds up to a new classification.
+        const motionGate = {
+            reference: null, // Keypoints of the last classified pose
+            prediction: null, // ...and its prediction
+            classifiedAt: 0,
+            lastPose: null, // Last PoseNet result, reused on still frames
+            posedAt: 0,
+            thumb: null, // Grayscale thumbnail of the frame PoseNet last saw
+            nextThumb: null,
+            thumbCtx: null,
+            counts: { full: 0, classifierSkipped: 0, posenetSkipped: 0 },
+
+            // True when even PoseNet can be skipped for this frame (?still=N)
+            frameIsStill(frame, frameTime) {
+                if (!STILL_PIXEL_THRESHOLD) return false;
+                const [width, height] = STILL_THUMB_SIZE;
+                if (!this.thumbCtx) {
+                    const canvas = document.createElement('canvas');
+                    canvas.width = width;
+                    canvas.height = height;
+                    this.thumbCtx = canvas.getContext('2d', { willReadFrequently: true });
+                }
+                this.thumbCtx.drawImage(frame, 0, 0, width, height);
+                const pixels = this.thumbCtx.getImageData(0, 0, width, height).data;
+                const thumb = new Uint8Array(width * height);
+                for (let i = 0; i < thumb.length; i++) {
+                    thumb[i] = (pixels[i * 4] * 77 + pixels[i * 4 + 1] * 150 + pixels[i * 4 + 2] * 29) >> 8;
+                }
+                this.nextThumb = thumb;
+
+                if (!this.thumb || !this.prediction || frameTime - this.posedAt > MOTION_VERIFY_MS) return false;
+                let difference = 0;
+                for (let i = 0; i < thumb.length; i++) {
+                    difference += Math.abs(thumb[i] - this.thumb[i]);
+                }
+                return difference / thumb.length < STILL_PIXEL_THRESHOLD;
+            },
+
+            // Gate to pass to engine.infer(), or null when the classifier must run
+            request(frameTime) {
+                if (!MOTION_THRESHOLD || !this.reference || frameTime - this.classifiedAt > MOTION_VERIFY_MS) {
+                    return null;
+                }
+                return { reference: this.reference, threshold: MOTION_THRESHOLD };
+            },
+
+            // Takes an engine result and returns the prediction to use for the frame
+            result(frameTime, pose, prediction) {
+                this.lastPose = pose;
+                this.posedAt = frameTime;
+                this.thumb = this.nextThumb;
+                if (prediction) {
+                    this.reference = pose ? pose.keypoints : null;
+                    this.prediction = prediction;
+                    this.classifiedAt = frameTime;
+                    this.counts.full++;
+                    return prediction;
+                }
+                this.counts.classifierSkipped++;
+                return this.prediction;
+            },
+
+            // A still frame: reuse the last pose and prediction as they are
+            still() {
+                this.counts.posenetSkipped++;
+                return { pose: this.lastPose, prediction: this.prediction };
+            },
+
+            summary() {
+                const { full, classifierSkipped, posenetSkipped } = this.counts;
+                const total = full + classifierSkipped + posenetSkipped;
+                return total
+                    ? `Motion gate: ${full} full, ${classifierSkipped} classifier skipped, ${posenetSkipped} PoseNet skipped (${((1 - full / total) * 100).toFixed(0)}% of classifier runs saved)`
+                    : 'Motion gate: no frames yet';
+            },
+
+            // Forget the reference, e.g. for a new model or a new task
+            reset() {
+                this.reference = null;
+                this.prediction = null;
+                this.lastPose = null;
+                this.thumb = null;
+                this.nextThumb = null;
+                this.counts = { full: 0, classifierSkipped: 0, posenetSkipped: 0 };
+            }
+        };
+
+        // Mirrored copy of the current frame at the capture size chosen
+        // by qualityController; this is what inference sees
+        const captureCanvas = document.createElement('canvas');
+        const captureCtx = captureCanvas.getContext('2d');
+        function captureFrame() {
+            const [width, height] = qualityController.size();
+            if (captureCanvas.width !== width || captureCanvas.height !== height) {
+                captureCanvas.width = width;
+                captureCanvas.height = height;
+            }
+            captureCtx.setTransform(-1, 0, 0, 1, width, 0); // Flip like tmPose.Webcam(flip = true)
+            captureCtx.drawImage(camera.source.element, 0, 0, width, height);
+            return captureCanvas;
+        }
+
+        // Main display loop: shows every frame with the latest skeleton and
+        // lets the scheduler start inference when one is due. Only
+        // camera.open() starts it and it ends once the source is released
+        // (or a replay benchmark takes over), so there is never more than one.
+        function loop(now) {
+            if (!camera.source || camera.stepping) {
+                camera.loopRunning = false;
+                return;
+            }
+            if (camera.source.ended) {
+                recordingEnded();
+            }
 
-            webcam.update(); // Update the webcam frame
-            await predict();
+            const frameStart = performance.now();
+            inferenceScheduler.tick(now, predict);
+            const renderStart = performance.now();
+            drawPose(lastPose, lastPoseScale, ctxWebcamCanvas);
+            perfStats.record(`render (${renderMode()})`, performance.now() - renderStart);
+            liveView.flush(now);
+            perfStats.record('displayFrame', performance.now() - frameStart);
             window.requestAnimationFrame(loop);
         }
 
-        // Prediction function
-        async function predict() {
-            if (!model || !webcam.canvas) return;
+        // A recording played in real time ends the task or test like its button
+        function recordingEnded() {
+            if (isTaskMode) {
+                log.info("Recording finished; ending the task.");
+                endTaskButton.click();
+            } else if (!stopTestWebcamButton.classList.contains('hidden')) {
+                stopTestWebcamButton.click();
+            }
+        }
+
+        // Prediction function. frameTime is the clock the frame is accounted on:
+        // now for live frames, the recording's own time in a replay benchmark.
+        async function predict(frameTime = performance.now()) {
+            if (!loadedModelURL || tensorWatchdog.recovering || !camera.source) return;
 
             try {
-                const { pose, posenetOutput } = await model.estimatePose(webcam.canvas);
-                const prediction = await model.predict(posenetOutput);
+                const startTime = performance.now();
+                const frame = captureFrame();
+                const captureMs = performance.now() - startTime;
+                perfStats.record('capture', captureMs);
+                const frameWidth = frame.width, frameHeight = frame.height;
+                const poseScale = webcamCanvas.width / frameWidth;
+                let pose, prediction;
+                if (motionGate.frameIsStill(frame, frameTime)) {
+                    ({ pose, prediction } = motionGate.still());
+                    perfStats.record('stillFrame', performance.now() - startTime);
+                } else {
+                    const result = await engine.infer(frame, motionGate.request(frameTime));
+                    pose = result.pose;
+                    prediction = motionGate.result(frameTime, result.pose, result.prediction);
+
+                    // Still frames are not timed: they would make the capture size look cheap
+                    const latency = performance.now() - startTime;
+                    perfStats.record(result.prediction ? 'inference' : 'inferenceNoClassifier', latency);
+                    qualityController.record(captureMs + result.ms);
+                    liveView.setText(qualitySetting, `Capture: ${qualityController.label()}`);
+                }
+                if (!prediction) return; // The model changed while this frame was in flight
 
-                // Log predictions for debugging
-                console.log("Predictions:", prediction);
+                // Keep recent predictions for debugging
+                if (DEBUG) {
+                    predictionTrace.record(frameTime, prediction);
+                }
 
                 // Only update bar chart and track durations in task mode, not test mode
                 if (isTaskMode) {
-                    // Prepare data for real-time bar chart
-                    const labels = prediction.map(pred => pred.className);
-                    const data = prediction.map(pred => (pred.probability * 100).toFixed(2));
+                    // Wall-clock time this frame stands for
+                    const frameDelta = nextFrameDelta(frameTime) / 1000;
 
                     // Update the real-time bar chart with current probabilities
-                    updateBarChart(labels, data);
+                    updateBarChart(prediction);
+                    timelineRecorder.record(frameTime - taskStartTime, prediction, pose, frameWidth, frameHeight);
 
                     // Track durations for classes exceeding 80% similarity
                     // Find all classes with probability >= 0.8
@@ -476,62 +2197,292 @@ HTML_PAGE = """
                         // Select the prediction with the highest probability
                         const topHighConfidence = highConfidencePredictions.reduce((max, pred) => pred.probability > max.probability ? pred : max, highConfidencePredictions[0]);
 
-                        // Increment duration for the top high confidence class
+                        // Add the elapsed frame time to the top high confidence class
                         if (classDurations.hasOwnProperty(topHighConfidence.className)) {
-                            classDurations[topHighConfidence.className] += 0.1; // Assuming loop runs every 100ms
+                            classDurations[topHighConfidence.className] += frameDelta;
                         } else {
                             // Initialize if not present
-                            classDurations[topHighConfidence.className] = 0.1;
+                            classDurations[topHighConfidence.className] = frameDelta;
                         }
+                        classFrames[topHighConfidence.className] = (classFrames[topHighConfidence.className] || 0) + 1;
+
+                        livePose = { pose: topHighConfidence.className, probability: topHighConfidence.probability };
 
                         // Update overlay with current class and probability
-                        currentClass.textContent = `Class: ${topHighConfidence.className}`;
-                        currentProbability.textContent = `Probability: ${(topHighConfidence.probability * 100).toFixed(2)}%`;
+                        liveView.setText(currentClass, `Class: ${topHighConfidence.className}`);
+                        liveView.setText(currentProbability, `Probability: ${(topHighConfidence.probability * 100).toFixed(2)}%`);
 
                         // Provide feedback message based on probability
                         if (topHighConfidence.probability >= 0.8) {
-                            feedbackMessage.textContent = "Great Pose!";
-                            feedbackMessage.style.color = "green";
+                            liveView.setText(feedbackMessage, "Great Pose!", "green");
                         } else {
-                            feedbackMessage.textContent = "Adjust Your Pose.";
-                            feedbackMessage.style.color = "red";
+                            liveView.setText(feedbackMessage, "Adjust Your Pose.", "red");
                         }
 
-                        console.log(`Class "${topHighConfidence.className}" exceeded 80% similarity. Total duration: ${classDurations[topHighConfidence.className].toFixed(2)}s`);
+                        if (LOG_FRAMES) {
+                            log.debug(`Class "${topHighConfidence.className}" exceeded 80% similarity. Total duration: ${classDurations[topHighConfidence.className].toFixed(2)}s`);
+                        }
                     } else {
                         // If no class exceeds 80%, reset feedback
-                        currentClass.textContent = `Class: N/A`;
-                        currentProbability.textContent = `Probability: 0%`;
-                        feedbackMessage.textContent = "No Pose Detected.";
-                        feedbackMessage.style.color = "orange";
+                        livePose = { pose: '', probability: 0 };
+                        liveView.setText(currentClass, `Class: N/A`);
+                        liveView.setText(currentProbability, `Probability: 0%`);
+                        liveView.setText(feedbackMessage, "No Pose Detected.", "orange");
                     }
                 } else {
                     // In test mode, we just want to draw the pose without updating the chart
                     // or showing probability information
-                    currentClass.textContent = `Class: N/A`;
-                    currentProbability.textContent = `Probability: 0%`;
-                    feedbackMessage.textContent = "";
+                    liveView.setText(currentClass, `Class: N/A`);
+                    liveView.setText(currentProbability, `Probability: 0%`);
+                    liveView.setText(feedbackMessage, "");
                 }
 
-                // Draw the pose
-                drawPose(pose, ctxWebcamCanvas);
+                // Keep the pose for the display loop to draw
+                lastPose = pose;
+                lastPoseScale = poseScale;
             } catch (error) {
-                console.error("Error during prediction:", error);
+                log.error("Error during prediction:", error);
                 feedback.textContent = `Error during prediction: ${error.message}`;
                 feedback.className = "error";
             }
         }
 
         // Function to draw pose keypoints and skeleton
-        function drawPose(pose, ctx) {
-            if (webcam.canvas) {
-                ctx.drawImage(webcam.canvas, 0, 0, webcamCanvas.width, webcamCanvas.height);
-                if (pose) {
-                    const minPartConfidence = 0.5;
-                    tmPose.drawKeypoints(pose.keypoints, minPartConfidence, ctx);
-                    tmPose.drawSkeleton(pose.keypoints, minPartConfidence, ctx);
+        function drawPose(pose, scale, ctx) {
+            if (!camera.source) return;
+            if (renderMode() === 'video') {
+                overlayRenderer.draw(pose, scale, ctx);
+                return;
+            }
+            camera.source.update(); // Copy the current frame into source.canvas
+            ctx.drawImage(camera.source.canvas, 0, 0, webcamCanvas.width, webcamCanvas.height);
+            if (pose) {
+                drawSkeleton(pose, scale, ctx);
+            }
+        }
+
+        // Recordings have no stream for the <video> preview and always use the canvas
+        function renderMode() {
+            return RENDER_MODE === 'video' && camera.source && camera.source.stream ? 'video' : 'canvas';
+        }
+
+        function drawSkeleton(pose, scale, ctx) {
+            // Keypoints are in capture-size coordinates
+            ctx.save();
+            ctx.scale(scale, scale);
+            tmPose.drawKeypoints(pose.keypoints, MIN_PART_CONFIDENCE, ctx);
+            tmPose.drawSkeleton(pose.keypoints, MIN_PART_CONFIDENCE, ctx);
+            ctx.restore();
+        }
+
+        // Video mode: the overlay canvas is transparent except for the skeleton.
+        // It is redrawn only when the pose changes, clearing just the area the
+        // previous skeleton covered.
+        const overlayRenderer = {
+            drawnPose: null,
+            drawnScale: 1,
+            dirty: null, // [x, y, width, height] covered by the drawn skeleton
+
+            draw(pose, scale, ctx) {
+                if (pose === this.drawnPose && scale === this.drawnScale) return;
+                if (this.dirty) {
+                    ctx.clearRect(...this.dirty);
+                    this.dirty = null;
+                }
+                this.drawnPose = pose;
+                this.drawnScale = scale;
+                if (!pose) return;
+
+                let minX = Infinity, minY = Infinity, maxX = -Infinity, maxY = -Infinity;
+                for (const { score, position } of pose.keypoints) {
+                    if (score < MIN_PART_CONFIDENCE) continue;
+                    minX = Math.min(minX, position.x);
+                    maxX = Math.max(maxX, position.x);
+                    minY = Math.min(minY, position.y);
+                    maxY = Math.max(maxY, position.y);
+                }
+                if (minX === Infinity) return; // Nothing confident enough to draw
+
+                drawSkeleton(pose, scale, ctx);
+                // Keypoint radius and line width reach past the keypoints themselves
+                const pad = 6 * scale + 1;
+                const x = Math.max(Math.floor(minX * scale - pad), 0);
+                const y = Math.max(Math.floor(minY * scale - pad), 0);
+                this.dirty = [x, y, Math.ceil(maxX * scale + pad) - x, Math.ceil(maxY * scale + pad) - y];
+            },
+
+            clear(ctx) {
+                ctx.clearRect(0, 0, ctx.canvas.width, ctx.canvas.height);
+                this.drawnPose = null;
+                this.dirty = null;
+            }
+        };
+
+        // Session results are posted to the server when a task ends. Anything
+        // that could not be sent (offline, server busy) waits in localStorage
+        // and goes out with the next submit; the server ignores duplicate ids.
+        const SESSIONS_URL = {{ url_for('submit_sessions')|tojson }};
+        const PENDING_SESSIONS_KEY = 'poseTracker.pendingSessions';
+        const STUDENT_STORAGE_KEY = 'poseTracker.student';
+        const MAX_PENDING_SESSIONS = 50;
+
+        function newSessionId() {
+            if (crypto.randomUUID) { // Only available on secure origins
+                return crypto.randomUUID();
+            }
+            const bytes = crypto.getRandomValues(new Uint8Array(16));
+            return Array.from(bytes, b => b.toString(16).padStart(2, '0')).join('');
+        }
+
+        function buildSessionRecord(totalMs) {
+            const poses = {};
+            for (const className of Object.keys(classDurations)) {
+                poses[className] = {
+                    seconds: classDurations[className],
+                    frames: classFrames[className] || 0
+                };
+            }
+            return {
+                id: newSessionId(),
+                started_at: (Date.now() - totalMs) / 1000,
+                student: studentNameInput.value.trim(),
+                classroom: classCodeInput.value.trim(),
+                model_url: loadedModelURL || '',
+                total_seconds: totalMs / 1000,
+                frames: framesProcessed,
+                fps: trackedTimeMs > 0 ? framesProcessed / (trackedTimeMs / 1000) : 0,
+                latency_ms: inferenceScheduler.latencyMs,
+                backend: engine && backendInfo ? `${engine.name}/${backendInfo.backend}` : '',
+                poses
+            };
+        }
+
+        const sessionUploader = {
+            pending() {
+                try {
+                    return JSON.parse(localStorage.getItem(PENDING_SESSIONS_KEY)) || [];
+                } catch (error) {
+                    return [];
+                }
+            },
+
+            save(sessions) {
+                try {
+                    if (sessions.length) {
+                        localStorage.setItem(PENDING_SESSIONS_KEY, JSON.stringify(sessions.slice(-MAX_PENDING_SESSIONS)));
+                    } else {
+                        localStorage.removeItem(PENDING_SESSIONS_KEY);
+                    }
+                } catch (error) {
+                    log.warn("Could not store unsent sessions:", error);
+                }
+            },
+
+            // Queue a session and try to send everything that is waiting
+            submit(session) {
+                this.save(this.pending().concat([session]));
+                return this.flush();
+            },
+
+            // Resolves to true when nothing is left waiting
+            async flush() {
+                const sessions = this.pending();
+                if (!sessions.length) return true;
+                try {
+                    const response = await fetch(SESSIONS_URL, {
+                        method: 'POST',
+                        headers: { 'Content-Type': 'application/json' },
+                        body: JSON.stringify(sessions),
+                        keepalive: true
+                    });
+                    // 503 means the server is busy: keep the sessions and retry later.
+                    // Any other client error will never succeed, so drop them.
+                    if (response.status >= 500 || response.status === 429) {
+                        throw new Error(`HTTP ${response.status}`);
+                    }
+                    if (!response.ok) {
+                        log.error("Sessions rejected by the server:", await response.text());
+                    }
+                    const sent = new Set(sessions.map(session => session.id));
+                    this.save(this.pending().filter(session => !sent.has(session.id)));
+                    return true;
+                } catch (error) {
+                    log.warn("Could not send session results, will retry:", error);
+                    return false;
                 }
             }
+        };
+
+        // Heartbeats for the teacher's live dashboard (/live), sent during a
+        // task. ?livehz=N changes the rate and ?livehz=0 turns them off.
+        const LIVE_HEARTBEAT_HZ = pageParams.has('livehz') ? Math.max(Number(pageParams.get('livehz')) || 0, 0) : 1;
+        const LIVE_HEARTBEAT_URL = {{ url_for('live_heartbeat')|tojson }};
+        const LIVE_CLIENT_ID = newSessionId(); // Tells apart students who typed the same name
+        let livePose = { pose: '', probability: 0 }; // Pose currently held, as shown in the overlay
+
+        const liveHeartbeat = {
+            timer: null,
+            inFlight: false,
+
+            start() {
+                if (!LIVE_HEARTBEAT_HZ) return;
+                clearInterval(this.timer);
+                this.timer = setInterval(() => this.send('task'), 1000 / LIVE_HEARTBEAT_HZ);
+                this.send('task');
+            },
+
+            stop() {
+                if (!this.timer) return;
+                clearInterval(this.timer);
+                this.timer = null;
+                this.send('ended', true);
+            },
+
+            send(status, force = false) {
+                // Skip a beat rather than let requests pile up on a slow network
+                if (this.inFlight && !force) return;
+                this.inFlight = true;
+                const durations = {};
+                for (const [className, seconds] of Object.entries(classDurations)) {
+                    durations[className] = Math.round(seconds * 10) / 10;
+                }
+                fetch(LIVE_HEARTBEAT_URL, {
+                    method: 'POST',
+                    headers: { 'Content-Type': 'application/json' },
+                    keepalive: true,
+                    body: JSON.stringify({
+                        client: LIVE_CLIENT_ID,
+                        student: studentNameInput.value.trim(),
+                        classroom: classCodeInput.value.trim(),
+                        status,
+                        pose: livePose.pose,
+                        probability: livePose.probability,
+                        elapsed: taskStartTime === null ? 0 : (performance.now() - taskStartTime) / 1000,
+                        durations
+                    })
+                })
+                    .catch(() => {}) // The dashboard is best effort; results are sent separately
+                    .finally(() => { this.inFlight = false; });
+            }
+        };
+
+        // The timeline is sent once; unlike the session totals it is not kept
+        // for a retry, since it can be far larger than localStorage allows
+        async function uploadTimeline(sessionId) {
+            const body = timelineRecorder.encode();
+            try {
+                const response = await fetch(`${SESSIONS_URL}/${encodeURIComponent(sessionId)}/timeline`, {
+                    method: 'POST',
+                    headers: { 'Content-Type': 'application/x-pose-timeline' },
+                    body
+                });
+                if (!response.ok) {
+                    throw new Error(`HTTP ${response.status}`);
+                }
+                log.info(`Timeline uploaded: ${timelineRecorder.segmentCount} segments, ${body.byteLength} bytes.`);
+            } catch (error) {
+                log.warn("Could not upload the pose timeline:", error);
+            }
         }
 
         // Event Listener for Check Model Button
@@ -542,6 +2493,12 @@ HTML_PAGE = """
                 feedback.className = "error";
                 return;
             }
+            if (isTaskMode) {
+                feedback.textContent = "End the task before changing the model.";
+                feedback.className = "error";
+                updateModelSelect();
+                return;
+            }
 
             feedback.textContent = "Checking model URL...";
             feedback.className = "";
@@ -549,7 +2506,17 @@ HTML_PAGE = """
             const isValid = await loadModel(modelURL);
 
             if (isValid) {
-                feedback.textContent = "Model loaded successfully!";
+                const details = [
+                    modelLoadInfo.inMemory
+                        ? `already in memory, switched in ${modelLoadInfo.ms.toFixed(0)} ms`
+                        : `${modelLoadInfo.fromCache ? 'from cache' : 'downloaded'} in ${modelLoadInfo.ms.toFixed(0)} ms`,
+                    `inference on ${engine.name}`,
+                    `${backendInfo.backend} ${backendInfo.latencyMs.toFixed(0)} ms/frame`
+                ];
+                if (warmupTimeMs !== null && !modelLoadInfo.inMemory) {
+                    details.push(`warm-up: ${warmupTimeMs.toFixed(0)} ms`);
+                }
+                feedback.textContent = `Model loaded successfully! (${details.join(', ')})`;
                 feedback.className = "success";
                 taskSection.classList.remove('hidden');
                 startTaskButton.disabled = false;
@@ -563,10 +2530,16 @@ HTML_PAGE = """
             }
         });
 
+        // Picking a loaded model switches to it without downloading it again
+        modelSelect.addEventListener('change', () => {
+            modelUrlInput.value = modelSelect.value;
+            checkModelButton.click();
+        });
+
         // Event Listener for Test Webcam Button
         testWebcamButton.addEventListener('click', async () => {
             isTaskMode = false; // Set to test mode, not task mode
-            const testSuccess = await setupWebcam();
+            const testSuccess = await camera.start();
             if (testSuccess) {
                 testWebcamButton.classList.add('hidden');
                 stopTestWebcamButton.classList.remove('hidden');
@@ -580,12 +2553,7 @@ HTML_PAGE = """
 
         // Event Listener for Stop Test Webcam Button
         stopTestWebcamButton.addEventListener('click', () => {
-            // Stop the webcam
-            if (webcam) {
-                webcam.stop();
-                webcam = null;
-                console.log("Webcam stopped.");
-            }
+            camera.stop();
 
             stopTestWebcamButton.classList.add('hidden');
             testWebcamButton.classList.remove('hidden');
@@ -598,17 +2566,24 @@ HTML_PAGE = """
             // Hide feedback and model section
             document.getElementById('model-section').classList.add('hidden');
 
+            // Open the webcam now (or keep the test webcam) so camera start-up and
+            // the first inferences happen during the countdown, not after it
+            isTaskMode = false;
+            const webcamReady = camera.start();
+
             // Start the 5-second countdown
             startCountdown(5, countdownElement, async () => {
-                // Set to task mode
-                isTaskMode = true;
-                
-                // Initialize webcam for the task
-                const webcamSetupSuccess = await setupWebcam();
+                const webcamSetupSuccess = await webcamReady;
                 if (!webcamSetupSuccess) {
                     return;
                 }
 
+                // Set to task mode; the loop is already running at full speed
+                isTaskMode = true;
+                if (camera.source && !camera.source.live) {
+                    camera.source.start(); // Recordings play from the start of the task
+                }
+
                 // Show task section elements
                 startTaskButton.classList.add('hidden');
                 endTaskButton.classList.remove('hidden');
@@ -618,6 +2593,8 @@ HTML_PAGE = """
 
                 // Start the timer
                 taskStartTime = performance.now();
+                liveView.reset();
+                qualityController.reset();
                 taskTimerInterval = setInterval(updateTaskTimer, 100);
 
                 // Reset class durations
@@ -626,16 +2603,21 @@ HTML_PAGE = """
                         classDurations[className] = 0;
                     }
                 }
+                resetFrameStats();
+                timelineRecorder.start();
+                livePose = { pose: '', probability: 0 };
+                liveHeartbeat.start();
 
                 // Initialize real-time bar chart with zero probabilities
-                const initialLabels = Object.keys(classDurations);
-                const initialData = initialLabels.map(() => 0);
-                updateBarChart(initialLabels, initialData);
+                if (!barChartInitialized) {
+                    initializeBarChart(Object.keys(classDurations));
+                    barChartInitialized = true;
+                }
 
                 // Reset feedback message
                 feedbackMessage.textContent = "";
 
-                console.log("Task started.");
+                log.info("Task started.");
             });
         });
 
@@ -644,21 +2626,34 @@ HTML_PAGE = """
             // Reset task mode flag
             isTaskMode = false;
             
-            // Stop the webcam
-            if (webcam) {
-                webcam.stop();
-                webcam = null;
-                console.log("Main webcam stopped.");
-            }
+            // Ending the task is an explicit stop, so the camera light goes off
+            // while the summary is shown. The next Start Task reopens it
+            // during the countdown.
+            camera.stop();
 
             // Stop the timer
             clearInterval(taskTimerInterval);
-            const totalTime = ((performance.now() - taskStartTime) / 1000).toFixed(2);
-
-            // Prepare summary data: Show total duration of the task
+            liveView.reset();
+            liveHeartbeat.stop();
+            const totalMs = performance.now() - taskStartTime;
+            const totalTime = (totalMs / 1000).toFixed(2);
+
+            // Prepare summary data: Show total duration of the task, plus frame
+            // counts and effective FPS so results are comparable across devices
+            const effectiveFps = trackedTimeMs > 0 ? framesProcessed / (trackedTimeMs / 1000) : 0;
             let summaryHTML = `
                 <p><strong>Total Duration:</strong> ${totalTime} seconds</p>
+                <p><strong>Frames Processed:</strong> ${framesProcessed} (${effectiveFps.toFixed(1)} FPS)</p>
+                <table>
+                    <tr><th>Pose</th><th>Duration (s)</th><th>Frames</th><th>FPS</th></tr>
             `;
+            for (const className of Object.keys(classDurations)) {
+                const frames = classFrames[className] || 0;
+                const seconds = classDurations[className];
+                const fps = seconds > 0 ? frames / seconds : 0;
+                summaryHTML += `<tr><td>${className}</td><td>${seconds.toFixed(2)}</td><td>${frames}</td><td>${fps.toFixed(1)}</td></tr>`;
+            }
+            summaryHTML += `</table>`;
 
             summaryContent.innerHTML = summaryHTML;
 
@@ -671,9 +2666,19 @@ HTML_PAGE = """
 
             summarySection.style.display = 'block';
 
-            console.log("Task ended. Summary generated.");
-            console.log("Total Time:", totalTime);
-            console.log("Class Durations:", classDurations);
+            log.info("Task ended. Summary generated.");
+            log.info("Total Time:", totalTime);
+            log.info("Class Durations:", classDurations);
+
+            // Send the results to the server (or keep them until we can)
+            const session = buildSessionRecord(totalMs);
+            sessionStatus.textContent = "Saving results...";
+            sessionUploader.submit(session).then(sent => {
+                sessionStatus.textContent = sent
+                    ? "Results saved."
+                    : "Results will be sent when the connection is back.";
+            });
+            uploadTimeline(session.id);
 
             // Hide task section elements
             taskSection.classList.add('hidden');
@@ -684,11 +2689,13 @@ HTML_PAGE = """
             // Reset variables
             isTaskMode = false;
             summarySection.style.display = 'none';
+            sessionStatus.textContent = "";
             taskSection.classList.add('hidden');
             startTaskButton.classList.remove('hidden');
             endTaskButton.classList.add('hidden');
             taskTimer.textContent = "Time: 0.00s";
             feedbackMessage.textContent = "";
+            liveView.reset();
 
             // Hide bar chart container
             barChartContainer.classList.add('hidden');
@@ -711,6 +2718,7 @@ HTML_PAGE = """
                     classDurations[className] = 0;
                 }
             }
+            resetFrameStats();
 
             // Reset model section
             document.getElementById('model-section').classList.remove('hidden');
@@ -721,15 +2729,173 @@ HTML_PAGE = """
             testWebcamButton.disabled = true;
             stopTestWebcamButton.classList.add('hidden');
 
-            console.log("Application restarted.");
+            log.info("Application restarted.");
         });
 
+        // Picking a recording makes it the frame source for Test Webcam, Start
+        // Task and the benchmark; clearing the picker goes back to the webcam
+        replayInput.addEventListener('change', () => {
+            const files = Array.from(replayInput.files);
+            const videos = files.filter(file => file.type.startsWith('video/'));
+            const images = files.filter(file => file.type.startsWith('image/'));
+            replayStatus.textContent = "";
+            if (videos.length === 1 && files.length === 1) {
+                camera.openSource = () => videoFileSource(videos[0]);
+                replayStatus.textContent = `Using ${videos[0].name} instead of the webcam.`;
+            } else if (images.length && images.length === files.length) {
+                camera.openSource = () => imageSequenceSource(images);
+                replayStatus.textContent = `Using ${images.length} images at ${REPLAY_FPS} fps instead of the webcam.`;
+            } else {
+                camera.openSource = webcamSource;
+                if (files.length) {
+                    replayStatus.textContent = "Choose one video, or only images.";
+                }
+            }
+            replayBenchmarkButton.disabled = camera.openSource === webcamSource;
+        });
+
+        replayBenchmarkButton.addEventListener('click', () => runReplayBenchmark());
+
+        // Deterministic replay: every frame of the chosen recording (one per
+        // 1/REPLAY_FPS s) is classified in turn, as fast as inference allows.
+        // Durations are accounted on the recording's clock, so for the same
+        // recording and model they only differ where the inference does.
+        let replayResult = null; // Last benchmark, also returned by poseDebug.replay()
+
+        async function runReplayBenchmark() {
+            if (isTaskMode) {
+                replayStatus.textContent = "End the task before running the benchmark.";
+                return;
+            }
+            if (!loadedModelURL) {
+                replayStatus.textContent = "Load a model before running the benchmark.";
+                return;
+            }
+            camera.stop();
+            stopTestWebcamButton.classList.add('hidden');
+            testWebcamButton.classList.remove('hidden');
+            let source;
+            try {
+                source = await camera.openSource();
+            } catch (error) {
+                log.error("Could not open the recording:", error);
+                replayStatus.textContent = `Could not open the recording: ${error.message}`;
+                return;
+            }
+
+            // Drive the frames from here instead of the display loop
+            camera.stepping = true;
+            camera.source = source;
+            webcamCanvas.width = source.canvas.width;
+            webcamCanvas.height = source.canvas.height;
+            webcamVideo.classList.add('hidden');
+            const buttons = [replayBenchmarkButton, testWebcamButton, startTaskButton];
+            const wasDisabled = buttons.map(button => button.disabled);
+            for (const button of buttons) {
+                button.disabled = true;
+            }
+            // Same capture size on every device, so the poses and durations
+            // depend only on the recording and the model
+            const { level, samples } = qualityController;
+            qualityController.level = PINNED_QUALITY_LEVEL ?? DEFAULT_QUALITY_LEVEL;
+            qualityController.frozen = true;
+            barChartContainer.classList.remove('hidden');
+
+            // Same starting point as a task
+            for (const className in classDurations) {
+                classDurations[className] = 0;
+            }
+            resetFrameStats();
+            motionGate.reset();
+            timelineRecorder.start();
+            taskStartTime = 0;
+            isTaskMode = true;
+
+            const frameMs = 1000 / REPLAY_FPS;
+            let processingMs = 0; // Decoding the recording (seek) is not counted
+            log.info(`Replay benchmark: ${source.frameCount} frames.`);
+            try {
+                for (let i = 0; i < source.frameCount && camera.source === source; i++) {
+                    await source.seek(i);
+                    const frameStart = performance.now();
+                    await predict(i * frameMs);
+                    drawPose(lastPose, lastPoseScale, ctxWebcamCanvas);
+                    liveView.flush(performance.now());
+                    processingMs += performance.now() - frameStart;
+                    if (i % REPLAY_FPS === 0) {
+                        replayStatus.textContent = `Replaying frame ${i + 1} of ${source.frameCount}...`;
+                    }
+                }
+            } catch (error) {
+                log.error("Replay benchmark failed:", error);
+            } finally {
+                isTaskMode = false;
+                camera.stepping = false;
+                if (camera.source === source) {
+                    camera.release();
+                }
+                buttons.forEach((button, i) => { button.disabled = wasDisabled[i]; });
+                Object.assign(qualityController, { level, samples, frozen: false });
+            }
+
+            const seconds = processingMs / 1000;
+            replayResult = {
+                frames: framesProcessed,
+                seconds,
+                framesPerSecond: seconds > 0 ? framesProcessed / seconds : 0,
+                engine: engine && backendInfo ? `${engine.name}/${backendInfo.backend}` : '',
+                model: loadedModelURL,
+                motion: { ...motionGate.counts },
+                classDurations: { ...classDurations },
+                classFrames: { ...classFrames }
+            };
+            const lines = [
+                `Replayed ${replayResult.frames} frames in ${seconds.toFixed(2)} s ` +
+                    `(${replayResult.framesPerSecond.toFixed(1)} frames/s on ${replayResult.engine})`,
+                ...Object.keys(classDurations).map(className =>
+                    `${className}: ${classDurations[className].toFixed(2)} s, ${classFrames[className] || 0} frames`)
+            ];
+            replayStatus.textContent = lines.join('\\n');
+            log.info("Replay benchmark:", JSON.stringify(replayResult));
+        }
+
         // Initialize the application on page load
         window.addEventListener('load', () => {
             // Initially hide task and summary sections
             taskSection.classList.add('hidden');
             summarySection.style.display = 'none';
-            console.log("Application loaded. Awaiting user input.");
+            replaySection.classList.toggle('hidden', !REPLAY_ENABLED);
+            log.info("Application loaded. Awaiting user input.");
+
+            // Remember who is using this device, and send any results left over
+            // from an earlier offline session
+            try {
+                const student = JSON.parse(localStorage.getItem(STUDENT_STORAGE_KEY)) || {};
+                studentNameInput.value = student.name || '';
+                classCodeInput.value = student.classCode || '';
+            } catch (error) {
+                // Nothing saved yet
+            }
+            const saveStudent = () => {
+                try {
+                    localStorage.setItem(STUDENT_STORAGE_KEY, JSON.stringify({
+                        name: studentNameInput.value.trim(),
+                        classCode: classCodeInput.value.trim()
+                    }));
+                } catch (error) {
+                    // Storage may be disabled; the fields still work for this visit
+                }
+            };
+            studentNameInput.addEventListener('change', saveStudent);
+            classCodeInput.addEventListener('change', saveStudent);
+            sessionUploader.flush();
+            window.addEventListener('online', () => sessionUploader.flush());
+
+            // Offline support: the service worker keeps the page, libraries and models
+            if ('serviceWorker' in navigator) {
+                navigator.serviceWorker.register({{ url_for('service_worker')|tojson }})
+                    .catch(error => log.warn("Service worker registration failed:", error));
+            }
         });
     </script>
 </body>
@@ -738,11 +2904,615 @@ HTML_PAGE = """
 
 """
 
+LIVE_DASHBOARD_HTML = """
+<!DOCTYPE html>
+<html lang="en">
+<head>
+    <meta charset="UTF-8">
+    <title>Live Class Dashboard</title>
+    <style>
+        body {
+            font-family: Arial, sans-serif;
+            text-align: center;
+            background-color: #f7f7f7;
+            margin: 0;
+            padding: 20px;
+        }
+        h1 {
+            color: #333;
+        }
+        #connect-section, #students-section {
+            margin: 20px auto;
+            padding: 20px;
+            max-width: 1000px;
+            background-color: #fff;
+            border-radius: 8px;
+            box-shadow: 0 0 10px rgba(0, 0, 0, 0.1);
+        }
+        #connect-section input {
+            width: 30%;
+            padding: 10px;
+            font-size: 1em;
+            margin: 5px;
+        }
+        #connect-section button {
+            padding: 10px 20px;
+            font-size: 1em;
+            margin: 5px;
+            cursor: pointer;
+        }
+        #connection-status {
+            margin-top: 10px;
+            font-weight: bold;
+        }
+        table {
+            width: 100%;
+            border-collapse: collapse;
+        }
+        th, td {
+            padding: 8px;
+            border-bottom: 1px solid #ddd;
+            text-align: left;
+        }
+        tr.stale {
+            color: #999;
+        }
+        .probability-bar {
+            display: inline-block;
+            height: 10px;
+            background-color: #4caf50;
+            vertical-align: middle;
+            margin-right: 6px;
+        }
+        @media (max-width: 600px) {
+            #connect-section input, #connect-section button {
+                width: 100%;
+                margin: 5px 0;
+            }
+        }
+    </style>
+</head>
+<body>
+    <h1>Live Class Dashboard</h1>
+
+    <div id="connect-section">
+        <input type="text" id="class-code" placeholder="Class code">
+        <input type="password" id="report-token" placeholder="Report token (if required)">
+        <button type="button" id="connect-button">Watch Class</button>
+        <div id="connection-status">Not connected.</div>
+    </div>
+
+    <div id="students-section">
+        <table>
+            <thead>
+                <tr><th>Student</th><th>Status</th><th>Current Pose</th><th>Probability</th><th>Time (s)</th><th>Pose Durations (s)</th></tr>
+            </thead>
+            <tbody id="students-body"></tbody>
+        </table>
+    </div>
+
+    <script type="text/javascript">
+        const STREAM_URL = {{ url_for('live_stream')|tojson }};
+        const STALE_MS = 5000; // Rows without a heartbeat for this long are greyed out
+
+        const classCodeInput = document.getElementById('class-code');
+        const tokenInput = document.getElementById('report-token');
+        const connectButton = document.getElementById('connect-button');
+        const connectionStatus = document.getElementById('connection-status');
+        const studentsBody = document.getElementById('students-body');
+
+        let students = {}; // client id -> latest state
+        let source = null;
+        let renderPending = false;
+
+        // Snapshots replace the table; updates carry only students that changed.
+        // seq guards against an update that is older than the snapshot.
+        function apply(data, replace) {
+            const message = JSON.parse(data);
+            if (replace) {
+                students = {};
+            }
+            for (const [client, state] of Object.entries(message.students)) {
+                const current = students[client];
+                if (!current || state.seq > current.seq) {
+                    students[client] = state;
+                }
+            }
+            for (const client of message.removed) {
+                delete students[client];
+            }
+            scheduleRender();
+        }
+
+        // At most one table rebuild per animation frame
+        function scheduleRender() {
+            if (renderPending) return;
+            renderPending = true;
+            window.requestAnimationFrame(() => {
+                renderPending = false;
+                render();
+            });
+        }
+
+        function cell(row, text) {
+            const td = document.createElement('td');
+            td.textContent = text;
+            row.appendChild(td);
+            return td;
+        }
+
+        function render() {
+            const now = Date.now();
+            const rows = Object.values(students)
+                .sort((a, b) => a.student.localeCompare(b.student));
+            const fragment = document.createDocumentFragment();
+            for (const state of rows) {
+                const row = document.createElement('tr');
+                if (now - state.seen_at * 1000 > STALE_MS) {
+                    row.className = 'stale';
+                }
+                cell(row, state.student || '(no name)');
+                cell(row, state.status);
+                cell(row, state.pose || '-');
+                const probability = cell(row, `${(state.probability * 100).toFixed(0)}%`);
+                const bar = document.createElement('span');
+                bar.className = 'probability-bar';
+                bar.style.width = `${state.probability * 60}px`;
+                probability.prepend(bar);
+                cell(row, state.elapsed.toFixed(1));
+                cell(row, Object.entries(state.durations)
+                    .map(([pose, seconds]) => `${pose}: ${seconds.toFixed(1)}`)
+                    .join(', '));
+                fragment.appendChild(row);
+            }
+            studentsBody.replaceChildren(fragment);
+        }
+
+        function connect() {
+            if (source) {
+                source.close();
+            }
+            const params = new URLSearchParams({ class: classCodeInput.value.trim() });
+            const token = tokenInput.value.trim();
+            if (token) {
+                params.set('token', token);
+            }
+            history.replaceState(null, '', `?class=${encodeURIComponent(params.get('class'))}`);
+
+            connectionStatus.textContent = "Connecting...";
+            // EventSource reconnects by itself; the server starts every
+            // connection with a fresh snapshot
+            source = new EventSource(`${STREAM_URL}?${params}`);
+            source.addEventListener('snapshot', event => apply(event.data, true));
+            source.addEventListener('update', event => apply(event.data, false));
+            source.onopen = () => {
+                connectionStatus.textContent = `Watching class "${params.get('class') || '(no class code)'}".`;
+            };
+            source.onerror = () => {
+                connectionStatus.textContent = "Connection lost, reconnecting...";
+            };
+        }
+
+        connectButton.addEventListener('click', connect);
+        window.addEventListener('load', () => {
+            const pageParams = new URLSearchParams(window.location.search);
+            if (pageParams.has('class')) {
+                classCodeInput.value = pageParams.get('class');
+                connect();
+            }
+            // Keep the stale highlighting current when nobody is sending
+            setInterval(render, 1000);
+        });
+    </script>
+</body>
+</html>
+"""
+
+VENDOR = VendorBundle()
+app.jinja_env.globals["vendor_script"] = VENDOR.script_tag
+app.jinja_env.globals["vendor_url"] = VENDOR.url
+
+STATIC_FILES = load_directory(os.path.join(os.path.dirname(os.path.abspath(__file__)), "static"))
+
+SERVICE_WORKER_JS = """
+// Service worker for offline use. The app shell and pinned libraries are
+// precached on install; model files use stale-while-revalidate. Both cache
+// names carry the deploy version, so a new deploy replaces them cleanly.
+const VERSION = {{ version|tojson }};
+const SHELL_CACHE = `shell-${VERSION}`;
+const MODEL_CACHE = `models-${VERSION}`;
+const PRECACHE_URLS = {{ precache_urls|tojson }};
+
+// Teachable Machine model files (proxied or direct) and the PoseNet
+// backbone weights that tmPose downloads
+const MODEL_URL_PATTERNS = [
+    /^\\/models\\//,
+    /^https:\\/\\/teachablemachine\\.withgoogle\\.com\\/models\\//,
+    /^https:\\/\\/storage\\.googleapis\\.com\\/(tm-model|tfjs-models)\\//
+];
+
+self.addEventListener('install', (event) => {
+    event.waitUntil(
+        caches.open(SHELL_CACHE)
+            .then(cache => cache.addAll(PRECACHE_URLS))
+            .then(() => self.skipWaiting())
+    );
+});
+
+self.addEventListener('activate', (event) => {
+    event.waitUntil(
+        caches.keys()
+            .then(names => Promise.all(names
+                .filter(name => name !== SHELL_CACHE && name !== MODEL_CACHE)
+                .map(name => caches.delete(name))))
+            .then(() => self.clients.claim())
+    );
+});
+
+async function cacheFirst(request, options) {
+    const cached = await caches.match(request, options);
+    return cached || fetch(request);
+}
+
+async function staleWhileRevalidate(event) {
+    const cache = await caches.open(MODEL_CACHE);
+    const cached = await cache.match(event.request);
+    const refresh = fetch(event.request)
+        .then(response => {
+            // Partial (206) responses cannot be stored
+            if (response.status === 200) {
+                cache.put(event.request, response.clone());
+            }
+            return response;
+        })
+        .catch(() => null);
+
+    if (cached) {
+        event.waitUntil(refresh);
+        return cached;
+    }
+    return (await refresh) || Response.error();
+}
+
+self.addEventListener('fetch', (event) => {
+    const request = event.request;
+    if (request.method !== 'GET') return;
+
+    const url = new URL(request.url);
+    const sameOrigin = url.origin === self.location.origin;
+    const path = sameOrigin ? url.pathname : url.href;
+
+    if (request.mode === 'navigate' && sameOrigin && url.pathname === '/') {
+        // Page options such as ?debug=1 do not change the page itself
+        event.respondWith(cacheFirst('/', { ignoreSearch: true }));
+    } else if (PRECACHE_URLS.includes(path)) {
+        event.respondWith(cacheFirst(request));
+    } else if (MODEL_URL_PATTERNS.some(pattern => pattern.test(path))) {
+        event.respondWith(staleWhileRevalidate(event));
+    }
+});
+"""
+
 @app.route("/")
 def index():
-    return render_template_string(HTML_PAGE)
+    return send_asset(PAGE)
+
+@app.route("/sw.js")
+def service_worker():
+    return send_asset(SERVICE_WORKER)
+
+@app.route("/static/<path:filename>")
+def static(filename):
+    asset = STATIC_FILES.get(filename)
+    if asset is None:
+        abort(404)
+    return send_asset(asset)
+
+@app.route("/vendor/<path:filename>")
+def vendor_file(filename):
+    asset = VENDOR.asset(filename)
+    if asset is None:
+        abort(404)
+    return send_asset(asset)
+
+MODEL_CACHE = ModelCache()
+
+@app.route("/models/<model_id>/<filename>")
+def model_file(model_id, filename):
+    # Same-origin proxy for Teachable Machine model files, so one upstream
+    # download serves every student in the room.
+    if not MODEL_ID_RE.match(model_id) or not FILENAME_RE.match(filename):
+        abort(404)
+    for _ in range(2):
+        try:
+            entry = MODEL_CACHE.get(model_id, filename)
+        except UpstreamError as error:
+            abort(error.status, str(error))
+        try:
+            return send_file(
+                MODEL_CACHE.blob_path(entry["sha256"]),
+                mimetype=entry["content_type"],
+                conditional=True,
+                etag=entry["sha256"],
+                last_modified=entry["fetched_at"],
+                max_age=60,
+            )
+        except FileNotFoundError:
+            # Evicted (perhaps by another worker) between lookup and send.
+            # Forget the entry so the next lookup fetches the file again.
+            MODEL_CACHE.forget(model_id, filename)
+            continue
+    abort(503)
+
+SESSION_WRITER = SessionWriter()
+
+@app.route("/api/sessions", methods=["POST"])
+def submit_sessions():
+    # Accepts one JSON session, a JSON list of them, or one binary record.
+    # Records are queued for the background writer and acknowledged at once.
+    try:
+        if request.mimetype == BINARY_MIMETYPE:
+            records = [parse_session(decode_binary_session(request.get_data()))]
+        else:
+            data = request.get_json(silent=True)
+            if data is None:
+                raise ValueError("expected a JSON body")
+            records = parse_sessions(data)
+    except ValueError as error:
+        return jsonify(error=str(error)), 400
+
+    try:
+        SESSION_WRITER.submit("session", records)
+    except QueueFull:
+        # Some records may already be queued; resubmitting is safe because
+        # session ids are unique and duplicates are ignored.
+        response = jsonify(error="server busy, please retry")
+        response.status_code = 503
+        response.headers["Retry-After"] = "5"
+        return response
+    return jsonify(accepted=len(records), ids=[record["id"] for record in records]), 202
+
+TIMELINES = TimelineStore()
+
+@app.route("/api/sessions/<session_id>/timeline", methods=["POST"])
+def upload_timeline(session_id):
+    if not SESSION_ID_RE.match(session_id):
+        abort(404)
+    try:
+        info = TIMELINES.save(session_id, request.stream)
+    except TimelineError as error:
+        return jsonify(error=str(error)), 400
+    try:
+        SESSION_WRITER.submit("timeline", [info])
+    except QueueFull:
+        response = jsonify(error="server busy, please retry")
+        response.status_code = 503
+        response.headers["Retry-After"] = "5"
+        return response
+    return jsonify(info), 202
+
+# Reports include student names, so they can be locked with a shared token
+# (sent as "Authorization: Bearer <token>" or ?token=<token>)
+REPORT_TOKEN = os.environ.get("REPORT_TOKEN")
+
+def report_access(view):
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        if REPORT_TOKEN:
+            auth = request.headers.get("Authorization", "")
+            token = auth[7:] if auth.startswith("Bearer ") else request.args.get("token", "")
+            if not hmac.compare_digest(token.encode(), REPORT_TOKEN.encode()):
+                abort(401)
+        return view(*args, **kwargs)
+    return wrapper
+
+@app.route("/api/sessions/<session_id>/timeline")
+@report_access
+def get_timeline(session_id):
+    # Decoded as JSON while streaming, so long timelines are never held in memory
+    if not SESSION_ID_RE.match(session_id):
+        abort(404)
+    try:
+        f = open(TIMELINES.path(session_id), "rb")
+    except FileNotFoundError:
+        abort(404)
+
+    def generate():
+        with f:
+            reader = TimelineReader(f)
+            yield '{"classes": %s, "segments": [' % json.dumps(reader.classes)
+            for i, segment in enumerate(reader.segments()):
+                yield ("," if i else "") + json.dumps(segment._asdict())
+            yield '], "samples": ['
+            for i, sample in enumerate(reader.samples()):
+                yield ("," if i else "") + json.dumps(sample._asdict())
+            yield "]}"
+
+    return Response(generate(), mimetype="application/json")
+
+def report_filters():
+    # ?class= selects a class ('' is students without a class code); ?student= narrows it
+    return request.args.get("class", ""), request.args.get("student")
+
+@app.route("/api/reports/classes")
+@report_access
+def report_classes():
+    conn = reports.connect(SESSION_WRITER.path)
+    try:
+        return jsonify(classes=reports.classes(conn))
+    finally:
+        conn.close()
+
+@app.route("/api/reports/students")
+@report_access
+def report_students():
+    classroom, _ = report_filters()
+    conn = reports.connect(SESSION_WRITER.path)
+    try:
+        return jsonify(classroom=classroom, students=reports.students(conn, classroom))
+    finally:
+        conn.close()
+
+@app.route("/api/reports/poses")
+@report_access
+def report_poses():
+    classroom, student = report_filters()
+    conn = reports.connect(SESSION_WRITER.path)
+    try:
+        return jsonify(classroom=classroom, student=student,
+                       poses=reports.poses(conn, classroom, student))
+    finally:
+        conn.close()
+
+@app.route("/api/reports/weekly")
+@report_access
+def report_weekly():
+    classroom, student = report_filters()
+    weeks = min(max(request.args.get("weeks", 12, type=int), 1), 104)
+    conn = reports.connect(SESSION_WRITER.path)
+    try:
+        return jsonify(classroom=classroom, student=student,
+                       weeks=reports.weekly(conn, classroom, student, weeks))
+    finally:
+        conn.close()
+
+@app.route("/api/export/sessions.<fmt>")
+@report_access
+def export_sessions(fmt):
+    # One row per session and pose, streamed straight from the cursor
+    if fmt not in ("csv", "json"):
+        abort(404)
+    try:
+        since = reports.parse_time(request.args.get("since"))
+        until = reports.parse_time(request.args.get("until"))
+    except ValueError as error:
+        return jsonify(error=str(error)), 400
+    classroom = request.args.get("class")
+    encode = reports.iter_csv if fmt == "csv" else reports.iter_json
+
+    def generate():
+        conn = reports.connect(SESSION_WRITER.path)
+        try:
+            yield from encode(reports.export_rows(conn, classroom, since, until))
+        finally:
+            conn.close()
+
+    response = Response(generate(), mimetype="text/csv" if fmt == "csv" else "application/json")
+    response.headers["Content-Disposition"] = f"attachment; filename=sessions.{fmt}"
+    return response
+
+LIVE_HUB = LiveHub()
+LIVE_KEEPALIVE = 15 # Seconds between SSE comments that keep idle proxies from closing the stream
+
+@app.route("/live")
+def live_dashboard():
+    return send_asset(LIVE_DASHBOARD)
+
+@app.route("/api/live/heartbeat", methods=["POST"])
+def live_heartbeat():
+    try:
+        classroom, client, state = parse_heartbeat(request.get_json(silent=True))
+    except ValueError as error:
+        return jsonify(error=str(error)), 400
+    try:
+        LIVE_HUB.update(classroom, client, state)
+    except HubFull as error:
+        return jsonify(error=str(error)), 503
+    return "", 204
+
+@app.route("/api/live/stream")
+@report_access
+def live_stream():
+    # Server-Sent Events: a snapshot first, then one coalesced update per tick
+    try:
+        subscription = LIVE_HUB.subscribe(request.args.get("class", ""))
+    except HubFull as error:
+        return jsonify(error=str(error)), 503
+
+    def generate():
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                message = subscription.get(timeout=LIVE_KEEPALIVE)
+                if subscription.closed:
+                    return
+                if message is None:
+                    yield ": keepalive\n\n"
+                else:
+                    event, data = message
+                    yield f"event: {event}\ndata: {data}\n\n"
+        finally:
+            LIVE_HUB.unsubscribe(subscription)
+
+    response = Response(generate(), mimetype="text/event-stream")
+    response.headers["Cache-Control"] = "no-cache"
+    response.headers["X-Accel-Buffering"] = "no" # Stop nginx-style proxies from buffering the stream
+    return response
+
+@app.cli.command("simulate-class")
+@click.option("--url", default="http://127.0.0.1:5000", help="Base URL of a running server.")
+@click.option("--classroom", default="SIM")
+@click.option("--students", default=40)
+@click.option("--hz", default=3.0, help="Heartbeats per second per student.")
+@click.option("--seconds", default=30.0)
+@click.option("--dashboards", default=2)
+@click.option("--slow-dashboards", default=1, help="Dashboards that read slowly.")
+def simulate_class(url, classroom, students, hz, seconds, dashboards, slow_dashboards):
+    """Load-test the live dashboard with simulated students and dashboards."""
+    simulate(url, classroom, students, hz, seconds, dashboards, slow_dashboards, token=REPORT_TOKEN)
+
+@app.cli.command("rebuild-reports")
+def rebuild_reports():
+    """Recompute the report summary tables from the stored sessions."""
+    conn = connect_sessions(SESSION_WRITER.path)
+    try:
+        rebuild_summaries(conn)
+    finally:
+        conn.close()
+
+@app.cli.command("fetch-vendor")
+def fetch_vendor():
+    """Download the pinned JavaScript libraries into the vendor directory."""
+    fetch_all()
+
+# Last-Modified for pages rendered from this file: the same in every worker,
+# unlike each worker's start time
+SOURCE_MTIME = os.path.getmtime(os.path.abspath(__file__))
+
+def build_page():
+    # The page does not change between requests, so render it once and keep
+    # compressed copies instead of running Jinja on every hit. Runs after all
+    # routes exist so the template can use url_for().
+    with app.test_request_context():
+        html = render_template_string(HTML_PAGE)
+    return StaticAsset(html, "text/html", last_modified=SOURCE_MTIME)
+
+PAGE = build_page()
+
+def build_live_dashboard():
+    with app.test_request_context():
+        html = render_template_string(LIVE_DASHBOARD_HTML)
+    return StaticAsset(html, "text/html", last_modified=SOURCE_MTIME)
+
+LIVE_DASHBOARD = build_live_dashboard()
+
+def build_service_worker():
+    # The cache version changes whenever the page, a static file or a pinned
+    # library changes, so every deploy starts from fresh caches.
+    with app.test_request_context():
+        precache_urls = [url_for("index")]
+        precache_urls += [url_for("static", filename=name) for name in sorted(STATIC_FILES)]
+        precache_urls += [VENDOR.url(name) for name in sorted(LIBRARIES)]
+        parts = [PAGE.digest] + [STATIC_FILES[name].digest for name in sorted(STATIC_FILES)] + precache_urls
+        version = hashlib.sha256("\n".join(parts).encode("utf-8")).hexdigest()[:12]
+        js = render_template_string(SERVICE_WORKER_JS, version=version, precache_urls=precache_urls)
+    last_modified = max([SOURCE_MTIME] + [asset.last_modified for asset in STATIC_FILES.values()])
+    return StaticAsset(js, "application/javascript", last_modified=last_modified)
+
+SERVICE_WORKER = build_service_worker()
 
 if __name__ == "__main__":
-    import sys
+    # Development server only; production runs under gunicorn (see gunicorn.conf.py).
+    # The debugger allows running code from the browser, so it is opt-in.
     port = int(os.environ.get("PORT", 5000))
-    app.run(host="0.0.0.0", port=port, debug=True)
+    app.run(host="0.0.0.0", port=port, debug=os.environ.get("FLASK_DEBUG") == "1")
@@ -0,0 +1,113 @@
+import gzip
+import hashlib
+import mimetypes
+import os
+import time
+
+from flask import Response, request
+from werkzeug.http import http_date, parse_date
+
+# Brotli is optional: without it we still serve gzip and identity.
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+mimetypes.add_type("application/wasm", ".wasm")
+
+# Bodies smaller than this are not worth compressing.
+MIN_COMPRESS_SIZE = 512
+
+
+class StaticAsset:
+    """An in-memory response body with precompressed variants.
+
+    Built once (at startup or from disk) and served many times, so every
+    request is a dictionary lookup plus a header check.
+    """
+
+    def __init__(self, body, mimetype, cache_control="no-cache",
+                 last_modified=None, variants=None):
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+        self.body = body
+        self.mimetype = mimetype
+        self.cache_control = cache_control
+        self.last_modified = int(last_modified or time.time())
+        self.digest = hashlib.sha256(body).hexdigest()
+
+        # encoding -> compressed bytes; identity is always self.body
+        if variants is None:
+            variants = {}
+            if len(body) >= MIN_COMPRESS_SIZE:
+                variants["gzip"] = gzip.compress(body, compresslevel=9, mtime=0)
+                if brotli is not None:
+                    variants["br"] = brotli.compress(body, quality=11)
+        self.variants = {
+            encoding: data for encoding, data in variants.items()
+            if len(data) < len(body)
+        }
+
+    def etag(self, encoding=None):
+        # Strong ETags must differ per content-coding.
+        tag = self.digest[:32]
+        return f"{tag}-{encoding}" if encoding else tag
+
+    def choose_encoding(self, accept_encoding):
+        for encoding in ("br", "gzip"):
+            if encoding in self.variants and accept_encoding[encoding]:
+                return encoding
+        return None
+
+
+def _not_modified(asset, etag):
+    if_none_match = request.if_none_match
+    if if_none_match:
+        # Any variant of the same content counts as a match, and so does a
+        # weak validator: proxies that re-compress the body weaken the ETag.
+        return if_none_match.contains_weak(etag) or if_none_match.contains_weak(asset.etag()) \
+            or if_none_match.star_tag
+    since = request.headers.get("If-Modified-Since")
+    if since:
+        since = parse_date(since)
+        return since is not None and asset.last_modified <= since.timestamp()
+    return False
+
+
+def send_asset(asset):
+    """Serve a StaticAsset with content negotiation and conditional GET."""
+    encoding = asset.choose_encoding(request.accept_encodings)
+    etag = asset.etag(encoding)
+
+    headers = {
+        "Cache-Control": asset.cache_control,
+        "Last-Modified": http_date(asset.last_modified),
+        "ETag": f'"{etag}"',
+        "Vary": "Accept-Encoding",
+    }
+
+    if _not_modified(asset, etag):
+        return Response(status=304, headers=headers)
+
+    body = asset.variants[encoding] if encoding else asset.body
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return Response(body, mimetype=asset.mimetype, headers=headers)
+
+
+def load_directory(directory, cache_control="no-cache"):
+    """Load every file under `directory` as a StaticAsset keyed by relative path."""
+    assets = {}
+    for root, _, files in os.walk(directory):
+        for name in files:
+            path = os.path.join(root, name)
+            relative = os.path.relpath(path, directory).replace(os.sep, "/")
+            mimetype = mimetypes.guess_type(name)[0] or "application/octet-stream"
+            with open(path, "rb") as f:
+                assets[relative] = StaticAsset(
+                    f.read(),
+                    mimetype,
+                    cache_control=cache_control,
+                    last_modified=os.path.getmtime(path),
+                )
+    return assets
@@ -0,0 +1,363 @@
+"""Offline load benchmark for the HTTP endpoints.
+
+Starts a stand-in for the Teachable Machine upstream and a local instance
+of the app (gunicorn by default), then drives each scenario with
+`--concurrency` keep-alive clients for `--duration` seconds and reports
+throughput and p50/p95/p99 latency. Results are saved as JSON so runs
+from different versions can be compared:
+
+    python bench.py --concurrency 32 --duration 10
+    python bench.py --compare bench_results/bench-20250101-080000.json
+
+Use --url to target an instance that is already running; it must then
+be started with MODEL_UPSTREAM pointing at the stand-in URL printed here.
+"""
+import argparse
+import http.client
+import json
+import math
+import os
+import platform
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+import urllib.request
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from sessions import BINARY_MIMETYPE, encode_binary_session
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+MODEL_COUNT = 8  # Distinct model ids the proxy has to cache
+WEIGHTS_BYTES = 2 * 1024 * 1024  # About the size of a Teachable Machine pose model
+POSES = ["Stand", "Squat", "Lunge", "Plank"]
+
+
+# -- stand-in upstream -----------------------------------------------------
+
+def upstream_files():
+    weights = random.Random(0).randbytes(WEIGHTS_BYTES)
+    model = {
+        "format": "layers-model",
+        "modelTopology": {"class_name": "Sequential", "config": {"layers": []}},
+        "weightsManifest": [{"paths": ["weights.bin"], "weights": []}],
+    }
+    metadata = {"labels": POSES, "modelSettings": {"posenet": {"inputResolution": 257}}}
+    return {
+        "model.json": json.dumps(model).encode(),
+        "metadata.json": json.dumps(metadata).encode(),
+        "weights.bin": weights,
+    }
+
+
+def start_upstream(latency=0.05):
+    """Serve /<model id>/<file> for any model id, after `latency` seconds."""
+    files = upstream_files()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            time.sleep(latency)
+            body = files.get(self.path.rsplit("/", 1)[-1])
+            if body is None:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}/"
+
+
+# -- app under test --------------------------------------------------------
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_app(mode, upstream_url, workdir):
+    port = free_port()
+    env = dict(
+        os.environ,
+        PORT=str(port),
+        HOST="127.0.0.1",
+        MODEL_UPSTREAM=upstream_url,
+        MODEL_CACHE_DIR=os.path.join(workdir, "model_cache"),
+        SESSION_DB=os.path.join(workdir, "sessions.db"),
+        TIMELINE_DIR=os.path.join(workdir, "timelines"),
+        GUNICORN_ACCESSLOG="",
+        REPORT_TOKEN="",
+        FLASK_DEBUG="0",
+    )
+    if mode == "gunicorn":
+        command = [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "app:app"]
+    else:
+        command = [sys.executable, "app.py"]
+    log = open(os.path.join(workdir, "server.log"), "wb")
+    process = subprocess.Popen(command, cwd=HERE, env=env, stdout=log, stderr=subprocess.STDOUT)
+
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            break
+        try:
+            urllib.request.urlopen(url + "/sw.js", timeout=1).close()
+            return process, url
+        except OSError:
+            time.sleep(0.2)
+    process.kill()
+    raise SystemExit(f"server did not start, see {log.name}")
+
+
+def stop_app(process):
+    process.terminate()
+    try:
+        process.wait(30)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+
+# -- scenarios -------------------------------------------------------------
+
+def session_record(i):
+    return {
+        "id": uuid.uuid4().hex,
+        "student": f"Student {i % 300}",
+        "classroom": f"Class {i % 12}",
+        "started_at": time.time() - 600,
+        "total_seconds": 600.0,
+        "frames": 9000,
+        "fps": 15.0,
+        "latency_ms": 40.0,
+        "backend": "worker/webgl",
+        "poses": {pose: {"seconds": 100.0 + i % 50, "frames": 1500} for pose in POSES},
+    }
+
+
+def binary_session(i):
+    record = session_record(i)
+    record["poses"] = {pose: (value["seconds"], value["frames"]) for pose, value in record["poses"].items()}
+    return encode_binary_session(record)
+
+
+JSON = {"Content-Type": "application/json"}
+
+# name -> request(i) returning (method, path, body, headers)
+SCENARIOS = {
+    "page": lambda i: ("GET", "/", None, {"Accept-Encoding": "br, gzip"}),
+    "static": lambda i: (
+        "GET", ("/sw.js", "/static/pose-worker.js", "/live")[i % 3], None, {"Accept-Encoding": "gzip"}
+    ),
+    "model-proxy": lambda i: (
+        "GET",
+        f"/models/bench{i % MODEL_COUNT}/{('model.json', 'metadata.json', 'weights.bin')[i // MODEL_COUNT % 3]}",
+        None, {},
+    ),
+    "sessions-json": lambda i: ("POST", "/api/sessions", json.dumps(session_record(i)).encode(), JSON),
+    "sessions-binary": lambda i: (
+        "POST", "/api/sessions", binary_session(i), {"Content-Type": BINARY_MIMETYPE}
+    ),
+    "heartbeat": lambda i: ("POST", "/api/live/heartbeat", json.dumps({
+        "client": f"bench-{i % 40}", "student": f"Student {i % 40}", "classroom": "Bench",
+        "status": "task", "pose": POSES[i % len(POSES)], "probability": 0.9,
+        "elapsed": i / 10, "durations": dict.fromkeys(POSES, 1.0),
+    }).encode(), JSON),
+    "reports": lambda i: ("GET", f"/api/reports/students?class=Class%20{i % 12}", None, {}),
+}
+
+
+def percentile(values, p):
+    # Nearest-rank percentile of sorted values
+    if not values:
+        return None
+    return values[min(len(values) - 1, max(0, math.ceil(p / 100 * len(values)) - 1))]
+
+
+def run_scenario(url, name, concurrency, duration, warmup):
+    make_request = SCENARIOS[name]
+    parsed = urllib.parse.urlsplit(url)
+    counter = iter(range(10 ** 12))
+    counter_lock = threading.Lock()
+    results = []
+
+    def client():
+        latencies, statuses, errors, received = [], {}, 0, 0
+        conn = http.client.HTTPConnection(parsed.hostname, parsed.port, timeout=30)
+        start = time.monotonic()
+        while True:
+            now = time.monotonic()
+            if now - start >= warmup + duration:
+                break
+            with counter_lock:
+                i = next(counter)
+            method, path, body, headers = make_request(i)
+            t0 = time.perf_counter()
+            try:
+                conn.request(method, path, body=body, headers=headers)
+                response = conn.getresponse()
+                data = response.read()
+            except (OSError, http.client.HTTPException):
+                errors += 1
+                conn.close()
+                conn = http.client.HTTPConnection(parsed.hostname, parsed.port, timeout=30)
+                continue
+            elapsed = time.perf_counter() - t0
+            if now - start >= warmup:
+                latencies.append(elapsed)
+                statuses[response.status] = statuses.get(response.status, 0) + 1
+                received += len(data)
+        conn.close()
+        results.append((latencies, statuses, errors, received))
+
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    latencies = sorted(l for r in results for l in r[0])
+    statuses = {}
+    for r in results:
+        for status, count in r[1].items():
+            statuses[str(status)] = statuses.get(str(status), 0) + count
+
+    def ms(seconds):
+        return None if seconds is None else round(seconds * 1000, 3)
+
+    return {
+        "requests": len(latencies),
+        "errors": sum(r[2] for r in results),
+        "statuses": statuses,
+        "throughput_rps": round(len(latencies) / duration, 1),
+        "bytes_per_s": round(sum(r[3] for r in results) / duration),
+        "mean_ms": ms(sum(latencies) / len(latencies)) if latencies else None,
+        "p50_ms": ms(percentile(latencies, 50)),
+        "p95_ms": ms(percentile(latencies, 95)),
+        "p99_ms": ms(percentile(latencies, 99)),
+        "max_ms": ms(latencies[-1]) if latencies else None,
+    }
+
+
+# -- reporting -------------------------------------------------------------
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=HERE, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_table(results):
+    print(f"{'scenario':<16} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>7}  statuses")
+    for name, r in results.items():
+        print(f"{name:<16} {r['throughput_rps']:>9} {r['p50_ms'] or '-':>9} {r['p95_ms'] or '-':>9}"
+              f" {r['p99_ms'] or '-':>9} {r['errors']:>7}  {r['statuses']}")
+
+
+def print_comparison(old, new):
+    print(f"\nCompared with {old['meta'].get('revision')} ({old['meta'].get('started')}):")
+    print(f"{'scenario':<16} {'req/s':>22} {'p95 ms':>22}")
+    for name, r in new["scenarios"].items():
+        before = old["scenarios"].get(name)
+        if not before:
+            continue
+
+        def change(key):
+            a, b = before[key], r[key]
+            if not a or b is None:
+                return f"{a} -> {b}"
+            return f"{a} -> {b} ({(b - a) / a * 100:+.0f}%)"
+
+        print(f"{name:<16} {change('throughput_rps'):>22} {change('p95_ms'):>22}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--concurrency", type=int, default=16, help="simultaneous clients per scenario")
+    parser.add_argument("--duration", type=float, default=5.0, help="measured seconds per scenario")
+    parser.add_argument("--warmup", type=float, default=1.0, help="unmeasured seconds before each scenario")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="comma-separated list")
+    parser.add_argument("--server", choices=("gunicorn", "werkzeug"), default="gunicorn")
+    parser.add_argument("--url", help="benchmark a running instance instead of starting one")
+    parser.add_argument("--upstream-latency", type=float, default=0.05, help="stand-in upstream delay (s)")
+    parser.add_argument("--output", help="JSON results file (default bench_results/bench-<time>.json)")
+    parser.add_argument("--compare", help="earlier results file to compare with")
+    args = parser.parse_args()
+
+    names = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = set(names) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    upstream, upstream_url = start_upstream(args.upstream_latency)
+    print(f"Stand-in upstream at {upstream_url}")
+    workdir = tempfile.mkdtemp(prefix="pose-bench-")
+    process = None
+    try:
+        if args.url:
+            url = args.url.rstrip("/")
+        else:
+            process, url = start_app(args.server, upstream_url, workdir)
+            print(f"Started {args.server} at {url}")
+
+        started = time.strftime("%Y-%m-%dT%H:%M:%S")
+        results = {}
+        for name in names:
+            print(f"Running {name}...", flush=True)
+            results[name] = run_scenario(url, name, args.concurrency, args.duration, args.warmup)
+    finally:
+        if process is not None:
+            stop_app(process)
+        upstream.shutdown()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        "meta": {
+            "started": started,
+            "revision": git_revision(),
+            "server": "external" if args.url else args.server,
+            "concurrency": args.concurrency,
+            "duration_s": args.duration,
+            "warmup_s": args.warmup,
+            "upstream_latency_s": args.upstream_latency,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+        },
+        "scenarios": results,
+    }
+    print()
+    print_table(results)
+
+    output = args.output or os.path.join(
+        HERE, "bench_results", time.strftime("bench-%Y%m%d-%H%M%S.json")
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nSaved {output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            print_comparison(json.load(f), report)
+
+
+if __name__ == "__main__":
+    main()
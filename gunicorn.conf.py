@@ -0,0 +1,54 @@
+# Production server settings, read by `gunicorn app:app` from this directory
+# (or `gunicorn --chdir 2025app -c gunicorn.conf.py app:app` for the 2025 app).
+# Every setting can be overridden with the environment variables below.
+import multiprocessing
+import os
+import signal
+import sys
+
+cpus = multiprocessing.cpu_count()
+
+bind = f"{os.environ.get('HOST', '0.0.0.0')}:{os.environ.get('PORT', 5000)}"
+
+# Threads suit this app: request work is I/O (model proxy, SQLite queue,
+# long-lived SSE streams) while inference runs in the browsers. The live
+# dashboard hub and the session write queue live in process memory, so one
+# worker is the default; raise WEB_CONCURRENCY only without the live dashboard.
+worker_class = os.environ.get("GUNICORN_WORKER_CLASS", "gthread")
+workers = int(os.environ.get("WEB_CONCURRENCY", 1))
+threads = int(os.environ.get("GUNICORN_THREADS", max(16, cpus * 8)))
+
+# Each open dashboard stream holds one of those threads for as long as it is
+# open, so by default dashboards may take at most half of them and heartbeats,
+# submits and page loads always have threads left. Workers inherit this.
+os.environ.setdefault("LIVE_MAX_SUBSCRIBERS", str(max(threads // 2, 1)))
+
+keepalive = int(os.environ.get("GUNICORN_KEEPALIVE", 5))
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 60))
+graceful_timeout = int(os.environ.get("GUNICORN_GRACEFUL_TIMEOUT", 30))
+
+accesslog = os.environ.get("GUNICORN_ACCESSLOG", "-") or None  # Empty turns it off
+errorlog = "-"
+loglevel = os.environ.get("GUNICORN_LOGLEVEL", "info")
+
+
+def post_worker_init(worker):
+    # Event streams never finish on their own, so close them as soon as the
+    # worker is told to stop instead of waiting out graceful_timeout.
+    # Browsers reconnect to the next worker by themselves.
+    previous = signal.getsignal(signal.SIGTERM)
+
+    def handle_term(signum, frame):
+        hub = getattr(sys.modules.get("app"), "LIVE_HUB", None)
+        if hub is not None:
+            hub.close()
+        previous(signum, frame)
+
+    signal.signal(signal.SIGTERM, handle_term)
+
+
+def worker_exit(server, worker):
+    # Write out session results still waiting in the queue
+    writer = getattr(sys.modules.get("app"), "SESSION_WRITER", None)
+    if writer is not None:
+        writer.close()
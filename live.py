@@ -0,0 +1,326 @@
+import json
+import math
+import os
+import re
+import threading
+import time
+import urllib.request
+from collections import deque
+
+LIVE_TICK = float(os.environ.get("LIVE_TICK", 0.5))  # Seconds between dashboard pushes
+LIVE_QUEUE_SIZE = int(os.environ.get("LIVE_QUEUE_SIZE", 8))  # Pushes buffered per dashboard
+LIVE_STALE_AFTER = float(os.environ.get("LIVE_STALE_AFTER", 60))  # Seconds before a silent student is dropped
+LIVE_MAX_STUDENTS = int(os.environ.get("LIVE_MAX_STUDENTS", 2000))
+LIVE_MAX_SUBSCRIBERS = int(os.environ.get("LIVE_MAX_SUBSCRIBERS", 100))
+
+CLIENT_ID_RE = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+STATUSES = ("test", "task", "ended")
+MAX_TEXT = 100
+MAX_DURATIONS = 50
+
+
+class HubFull(Exception):
+    pass
+
+
+def parse_heartbeat(data):
+    """Validate a heartbeat; return (classroom, client id, state)."""
+    if not isinstance(data, dict):
+        raise ValueError("heartbeat must be an object")
+
+    def text(field):
+        value = data.get(field) or ""
+        if not isinstance(value, str):
+            raise ValueError(f"{field} must be a string")
+        return value.strip()[:MAX_TEXT]
+
+    def number(value, field, upper=math.inf):
+        if isinstance(value, bool) or not isinstance(value, (int, float)) \
+                or not 0 <= value <= upper:
+            raise ValueError(f"{field} must be a number between 0 and {upper}")
+        return round(float(value), 3)
+
+    client = data.get("client")
+    if not isinstance(client, str) or not CLIENT_ID_RE.match(client):
+        raise ValueError("client must be an id of letters, digits, '-' and '_'")
+    status = data.get("status")
+    if status not in STATUSES:
+        raise ValueError(f"status must be one of {', '.join(STATUSES)}")
+    durations = data.get("durations") or {}
+    if not isinstance(durations, dict) or len(durations) > MAX_DURATIONS:
+        raise ValueError(f"durations must be an object with at most {MAX_DURATIONS} entries")
+
+    state = {
+        "student": text("student"),
+        "status": status,
+        "pose": text("pose"),
+        "probability": number(data.get("probability", 0), "probability", 1),
+        "elapsed": number(data.get("elapsed", 0), "elapsed"),
+        "durations": {
+            str(name)[:MAX_TEXT]: number(value, f"durations[{name!r}]")
+            for name, value in durations.items()
+        },
+    }
+    return text("classroom"), client, state
+
+
+class _Room:
+    def __init__(self):
+        self.students = {}  # client id -> (state, monotonic time of last heartbeat)
+        self.dirty = set()
+        self.subscribers = set()
+
+
+class Subscription:
+    """One dashboard's view of a classroom.
+
+    The hub never waits on a subscriber: each keeps at most `size` pending
+    pushes, and when a slow reader falls further behind its backlog is
+    dropped and it gets a fresh snapshot on the next get() instead.
+    """
+
+    def __init__(self, hub, classroom, size):
+        self.hub = hub
+        self.classroom = classroom
+        self._size = size
+        self._messages = deque()
+        self._resync = True  # The first get() returns a snapshot
+        self._cond = threading.Condition()
+        self.dropped = 0
+        self.closed = False
+
+    def _close(self):
+        with self._cond:
+            self.closed = True
+            self._cond.notify()
+
+    def _offer(self, message):
+        with self._cond:
+            if len(self._messages) >= self._size:
+                self.dropped += len(self._messages)
+                self._messages.clear()
+                self._resync = True
+            else:
+                self._messages.append(message)
+            self._cond.notify()
+
+    def get(self, timeout=None):
+        """Return ("snapshot" | "update", JSON text), or None after `timeout`
+        or once the hub is closed."""
+        with self._cond:
+            if not self._messages and not self._resync and not self.closed:
+                self._cond.wait(timeout)
+            if self.closed:
+                return None
+            if self._resync:
+                self._resync = False
+                self._messages.clear()
+            elif self._messages:
+                return "update", self._messages.popleft()
+            else:
+                return None
+        # Taken outside our lock: the hub holds its own lock while snapshotting
+        return "snapshot", self.hub.snapshot(self.classroom)
+
+
+class LiveHub:
+    """In-memory fan-out of student heartbeats to dashboard subscribers.
+
+    Heartbeats only overwrite the student's latest state. Once per tick a
+    background thread sends each classroom's changed students to its
+    subscribers as one message, however many heartbeats arrived in
+    between. State is per process; see the README for multi-worker use.
+    """
+
+    def __init__(self, tick=LIVE_TICK, queue_size=LIVE_QUEUE_SIZE, stale_after=LIVE_STALE_AFTER,
+                 max_students=LIVE_MAX_STUDENTS, max_subscribers=LIVE_MAX_SUBSCRIBERS):
+        self.tick = tick
+        self.queue_size = queue_size
+        self.stale_after = stale_after
+        self.max_students = max_students
+        self.max_subscribers = max_subscribers
+        self._lock = threading.Lock()
+        self._rooms = {}
+        self._student_count = 0
+        self._subscriber_count = 0
+        self._seq = 0
+        self._thread = None
+        self._pid = None
+        self.closed = False
+
+    def _room(self, classroom):
+        room = self._rooms.get(classroom)
+        if room is None:
+            room = self._rooms[classroom] = _Room()
+        return room
+
+    def update(self, classroom, client, state):
+        self._ensure_thread()
+        with self._lock:
+            room = self._room(classroom)
+            if client not in room.students:
+                if self._student_count >= self.max_students:
+                    raise HubFull("too many live students")
+                self._student_count += 1
+            self._seq += 1
+            # seq lets dashboards ignore an update older than their snapshot
+            room.students[client] = (dict(state, seq=self._seq, seen_at=time.time()), time.monotonic())
+            room.dirty.add(client)
+
+    def subscribe(self, classroom):
+        self._ensure_thread()
+        with self._lock:
+            if self.closed:
+                raise HubFull("server is shutting down")
+            if self._subscriber_count >= self.max_subscribers:
+                raise HubFull("too many live dashboards")
+            self._subscriber_count += 1
+            subscription = Subscription(self, classroom, self.queue_size)
+            self._room(classroom).subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            room = self._rooms.get(subscription.classroom)
+            if room is not None and subscription in room.subscribers:
+                room.subscribers.discard(subscription)
+                self._subscriber_count -= 1
+
+    def close(self):
+        """End every subscription, e.g. so open streams do not delay shutdown."""
+        with self._lock:
+            self.closed = True
+            subscriptions = [sub for room in self._rooms.values() for sub in room.subscribers]
+        for subscription in subscriptions:
+            subscription._close()
+
+    def snapshot(self, classroom):
+        with self._lock:
+            room = self._rooms.get(classroom)
+            students = {client: state for client, (state, _) in room.students.items()} if room else {}
+        return json.dumps({"students": students, "removed": []})
+
+    def stats(self):
+        with self._lock:
+            return {
+                "classrooms": len(self._rooms),
+                "students": self._student_count,
+                "subscribers": self._subscriber_count,
+            }
+
+    def _ensure_thread(self):
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is None or self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._run, name="live-hub", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.tick)
+            self.flush()
+
+    def flush(self):
+        """Send one coalesced update per changed classroom; called every tick."""
+        now = time.monotonic()
+        outgoing = []
+        with self._lock:
+            for classroom, room in list(self._rooms.items()):
+                removed = [
+                    client for client, (_, seen) in room.students.items()
+                    if now - seen > self.stale_after
+                ]
+                for client in removed:
+                    del room.students[client]
+                    room.dirty.discard(client)
+                self._student_count -= len(removed)
+
+                if (room.dirty or removed) and room.subscribers:
+                    message = json.dumps({
+                        "students": {client: room.students[client][0] for client in room.dirty},
+                        "removed": removed,
+                    })
+                    outgoing.append((list(room.subscribers), message))
+                room.dirty.clear()
+                if not room.students and not room.subscribers:
+                    del self._rooms[classroom]
+        # Delivered without the hub lock, so heartbeats never wait on dashboards
+        for subscribers, message in outgoing:
+            for subscription in subscribers:
+                subscription._offer(message)
+
+
+def simulate(base_url, classroom="SIM", students=40, hz=3.0, seconds=30.0,
+             dashboards=2, slow_dashboards=1, token=None, log=print):
+    """Drive a running server with simulated students and dashboards.
+
+    Students post heartbeats at `hz`; dashboards read the SSE stream, and
+    the slow ones pause between reads to show they do not hold up the
+    rest. Returns counts per role.
+    """
+    base_url = base_url.rstrip("/")
+    stop = time.monotonic() + seconds
+    results = {"heartbeats": 0, "heartbeat_errors": 0, "dashboards": []}
+    lock = threading.Lock()
+    poses = ["Stand", "Squat", "Lunge"]
+
+    def student(n):
+        client = f"sim-{n}"
+        durations = dict.fromkeys(poses, 0.0)
+        started = time.monotonic()
+        while time.monotonic() < stop:
+            pose = poses[int(time.monotonic() / 2 + n) % len(poses)]
+            durations[pose] += 1 / hz
+            body = json.dumps({
+                "client": client, "student": f"Student {n}", "classroom": classroom,
+                "status": "task", "pose": pose, "probability": 0.9,
+                "elapsed": time.monotonic() - started, "durations": durations,
+            }).encode()
+            request = urllib.request.Request(
+                base_url + "/api/live/heartbeat", body, {"Content-Type": "application/json"}
+            )
+            try:
+                urllib.request.urlopen(request, timeout=5).close()
+                key = "heartbeats"
+            except OSError:
+                key = "heartbeat_errors"
+            with lock:
+                results[key] += 1
+            time.sleep(1 / hz)
+
+    def dashboard(slow):
+        url = f"{base_url}/api/live/stream?class={urllib.request.quote(classroom)}"
+        if token:
+            url += "&token=" + urllib.request.quote(token)
+        counts = {"slow": slow, "snapshot": 0, "update": 0, "max_lag_s": 0.0}
+        try:
+            with urllib.request.urlopen(url, timeout=seconds + 10) as stream:
+                event = None
+                while time.monotonic() < stop:
+                    line = stream.readline().decode().rstrip("\n")
+                    if line.startswith("event: "):
+                        event = line[7:]
+                    elif line.startswith("data: ") and event in counts:
+                        counts[event] += 1
+                        states = json.loads(line[6:])["students"].values()
+                        if states:
+                            lag = time.time() - min(state["seen_at"] for state in states)
+                            counts["max_lag_s"] = max(counts["max_lag_s"], round(lag, 2))
+                        if slow:
+                            time.sleep(2.0)
+        except OSError as error:
+            counts["error"] = str(error)
+        with lock:
+            results["dashboards"].append(counts)
+
+    threads = [threading.Thread(target=dashboard, args=(i < slow_dashboards,)) for i in range(dashboards)]
+    threads += [threading.Thread(target=student, args=(n,)) for n in range(students)]
+    for thread in threads:
+        thread.daemon = True
+        thread.start()
+    for thread in threads:
+        thread.join(seconds + 15)
+    log(json.dumps(results, indent=2))
+    return results
@@ -0,0 +1,273 @@
+import contextlib
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import OrderedDict
+
+# The index is shared by every worker process; without fcntl (Windows) the
+# cache is only safe with a single process, as under the development server.
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+MODEL_UPSTREAM = os.environ.get(
+    "MODEL_UPSTREAM", "https://teachablemachine.withgoogle.com/models/"
+)
+MODEL_CACHE_DIR = os.environ.get(
+    "MODEL_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "model_cache"),
+)
+MODEL_CACHE_MAX_BYTES = int(os.environ.get("MODEL_CACHE_MAX_BYTES", 512 * 1024 * 1024))
+# Teachable Machine keeps the same URL when a model is re-uploaded, so cached
+# files are re-checked upstream after this many seconds.
+MODEL_CACHE_TTL = int(os.environ.get("MODEL_CACHE_TTL", 3600))
+# Cache hits only update this process's index; they are written to the
+# shared one at most this often, so the hot path rarely takes the file lock.
+USE_SAVE_INTERVAL = 10
+
+MODEL_ID_RE = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+FILENAME_RE = re.compile(r"^[A-Za-z0-9_.-]{1,128}$")
+
+CONTENT_TYPES = {
+    ".json": "application/json",
+    ".bin": "application/octet-stream",
+}
+
+
+class UpstreamError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class _Call:
+    # One in-flight upstream fetch that concurrent misses wait on.
+    def __init__(self):
+        self.done = threading.Event()
+        self.entry = None
+        self.error = None
+
+
+class ModelCache:
+    """On-disk, content-addressed cache of Teachable Machine model files.
+
+    Blobs live under objects/<sha256>; a small JSON index maps
+    (model id, file name) to a blob and is kept in LRU order so the cache
+    can be trimmed to `max_bytes`. Concurrent misses for the same file
+    share a single upstream request.
+
+    Worker processes share the directory. Each keeps its own copy of the
+    index and, under a file lock, merges the one on disk into it before
+    every change, so entries other workers added or evicted are seen.
+    """
+
+    def __init__(self, directory=MODEL_CACHE_DIR, upstream=MODEL_UPSTREAM,
+                 max_bytes=MODEL_CACHE_MAX_BYTES, ttl=MODEL_CACHE_TTL,
+                 use_save_interval=USE_SAVE_INTERVAL):
+        self.directory = directory
+        self.upstream = upstream if upstream.endswith("/") else upstream + "/"
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.use_save_interval = use_save_interval
+        self._uses_saved_at = time.monotonic()
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self._index = OrderedDict()
+        os.makedirs(os.path.join(directory, "objects"), exist_ok=True)
+        with self._locked_index():
+            pass
+
+    # -- index -------------------------------------------------------------
+
+    def _index_path(self):
+        return os.path.join(self.directory, "index.json")
+
+    @contextlib.contextmanager
+    def _locked_index(self):
+        # Holds the thread and file locks with the index merged from disk,
+        # and writes it back if the block succeeds.
+        with self._lock, open(os.path.join(self.directory, "index.lock"), "a") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            self._merge_index()
+            yield
+            self._save_index()
+
+    def _merge_index(self):
+        # Called with the locks held. For each file keep the most recently
+        # fetched copy and the latest use; drop entries whose blob another
+        # worker has deleted, and blobs that no entry refers to any more.
+        try:
+            with open(self._index_path()) as f:
+                on_disk = json.load(f)
+        except (OSError, ValueError):
+            on_disk = []
+        merged = {}
+        replaced = set()
+        for entry in on_disk + list(self._index.values()):
+            current = merged.get(entry["key"])
+            if current is None:
+                merged[entry["key"]] = entry
+                continue
+            newer, older = (entry, current) if entry["fetched_at"] > current["fetched_at"] else (current, entry)
+            newer["used_at"] = max(newer["used_at"], older["used_at"])
+            merged[entry["key"]] = newer
+            if older["sha256"] != newer["sha256"]:
+                replaced.add(older["sha256"])
+        self._index = OrderedDict(
+            (entry["key"], entry)
+            for entry in sorted(merged.values(), key=lambda e: e.get("used_at", 0))
+            if os.path.exists(self.blob_path(entry["sha256"]))
+        )
+        for sha256 in replaced:
+            self._drop_blob(sha256)
+
+    def _save_index(self):
+        # Called with the locks held.
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump(list(self._index.values()), f)
+        os.replace(tmp, self._index_path())
+
+    def blob_path(self, sha256):
+        return os.path.join(self.directory, "objects", sha256)
+
+    def total_bytes(self):
+        with self._lock:
+            return sum(entry["size"] for entry in self._index.values())
+
+    # -- lookup ------------------------------------------------------------
+
+    def get(self, model_id, filename):
+        """Return the index entry for a model file, fetching it if needed."""
+        key = f"{model_id}/{filename}"
+        with self._lock:
+            entry = self._index.get(key)
+            hit = entry is not None and time.time() - entry["fetched_at"] < self.ttl
+            if hit:
+                self._index.move_to_end(key)
+                entry["used_at"] = time.time()
+                save_uses = time.monotonic() - self._uses_saved_at >= self.use_save_interval
+                if save_uses:
+                    self._uses_saved_at = time.monotonic()
+            else:
+                call = self._inflight.get(key)
+                leader = call is None
+                if leader:
+                    call = self._inflight[key] = _Call()
+
+        if hit:
+            if save_uses:
+                # The merge keeps the latest use of every entry, so other
+                # workers evict by this process's hits too
+                with self._locked_index():
+                    pass
+            return entry
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.entry
+
+        try:
+            call.entry = self._fetch(key, stale=entry)
+        except Exception as error:
+            # Waiting requests get the same error, whether it came from the
+            # upstream or from storing the file (a full disk, say)
+            call.error = error
+            raise
+        finally:
+            with self._lock:
+                del self._inflight[key]
+            call.done.set()
+        return call.entry
+
+    def _fetch(self, key, stale=None):
+        request = urllib.request.Request(self.upstream + key)
+        try:
+            with urllib.request.urlopen(request, timeout=30) as response:
+                data = response.read()
+        except urllib.error.HTTPError as error:
+            if error.code == 404:
+                raise UpstreamError(404, f"{key} not found upstream")
+            if stale is not None:
+                return self._touch(key, stale)
+            raise UpstreamError(502, f"upstream returned {error.code} for {key}")
+        except (urllib.error.URLError, OSError) as error:
+            # Keep serving the old copy when the upstream is unreachable.
+            if stale is not None:
+                return self._touch(key, stale)
+            raise UpstreamError(502, f"upstream unreachable: {error}")
+
+        sha256 = hashlib.sha256(data).hexdigest()
+        path = self.blob_path(sha256)
+        if not os.path.exists(path):
+            fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+
+        now = time.time()
+        entry = {
+            "key": key,
+            "sha256": sha256,
+            "size": len(data),
+            "content_type": CONTENT_TYPES.get(
+                os.path.splitext(key)[1], "application/octet-stream"
+            ),
+            "fetched_at": now,
+            "used_at": now,
+        }
+        with self._locked_index():
+            old = self._index.pop(key, None)
+            self._index[key] = entry
+            if old is not None and old["sha256"] != sha256:
+                self._drop_blob(old["sha256"])
+            self._evict()
+        return entry
+
+    def forget(self, model_id, filename):
+        """Drop a file from the index, e.g. after its blob was found missing."""
+        with self._locked_index():
+            entry = self._index.pop(f"{model_id}/{filename}", None)
+            if entry is not None:
+                self._drop_blob(entry["sha256"])
+
+    def _touch(self, key, entry):
+        # Serve the stale copy for another TTL. Saved right away, so other
+        # workers do not re-check the upstream for it either.
+        with self._locked_index():
+            current = self._index.get(key)
+            if current is None or current["sha256"] != entry["sha256"]:
+                # Evicted, or another worker fetched a newer copy meanwhile
+                return current or entry
+            current["fetched_at"] = current["used_at"] = time.time()
+            self._index.move_to_end(key)
+        return current
+
+    # -- eviction ----------------------------------------------------------
+
+    def _evict(self):
+        # Called with the locks held. The newest entry is never evicted.
+        total = sum(entry["size"] for entry in self._index.values())
+        while total > self.max_bytes and len(self._index) > 1:
+            _, entry = self._index.popitem(last=False)
+            total -= entry["size"]
+            self._drop_blob(entry["sha256"])
+
+    def _drop_blob(self, sha256):
+        # Blobs are shared by identical files, so only delete unreferenced ones.
+        if any(entry["sha256"] == sha256 for entry in self._index.values()):
+            return
+        try:
+            os.remove(self.blob_path(sha256))
+        except OSError:
+            pass
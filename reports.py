@@ -0,0 +1,166 @@
+import csv
+import datetime
+import json
+import sqlite3
+
+from sessions import SESSION_DB
+
+EXPORT_COLUMNS = (
+    "session_id", "started_at", "received_at", "student", "classroom", "model_url",
+    "total_seconds", "frames", "fps", "latency_ms", "backend",
+    "pose", "pose_seconds", "pose_frames",
+)
+EXPORT_FETCH_SIZE = 500
+
+
+def connect(path=SESSION_DB):
+    # Readers get their own connection; WAL lets them run alongside the writer.
+    conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA query_only = ON")
+    return conn
+
+
+def parse_time(value):
+    """Accept epoch seconds or an ISO date/datetime (UTC); None passes through."""
+    if value is None or value == "":
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        parsed = datetime.datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f"invalid time: {value!r}")
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=datetime.timezone.utc)
+    return parsed.timestamp()
+
+
+# -- rollups (summary tables only) -----------------------------------------
+
+def classes(conn):
+    rows = conn.execute(
+        "SELECT classroom, COUNT(*) AS students, SUM(sessions) AS sessions,"
+        " SUM(seconds) AS seconds, MAX(last_at) AS last_at"
+        " FROM student_totals GROUP BY classroom ORDER BY classroom"
+    )
+    return [dict(row) for row in rows]
+
+
+def students(conn, classroom):
+    rows = conn.execute(
+        "SELECT student, sessions, seconds, frames, first_at, last_at"
+        " FROM student_totals WHERE classroom = ? ORDER BY student",
+        (classroom,),
+    )
+    return [dict(row) for row in rows]
+
+
+def poses(conn, classroom, student=None):
+    if student is not None:
+        rows = conn.execute(
+            "SELECT pose, sessions, seconds, frames, best_session_seconds, best_streak_ms"
+            " FROM pose_totals WHERE classroom = ? AND student = ? ORDER BY pose",
+            (classroom, student),
+        )
+    else:
+        rows = conn.execute(
+            "SELECT pose, SUM(sessions) AS sessions, SUM(seconds) AS seconds,"
+            " SUM(frames) AS frames, MAX(best_session_seconds) AS best_session_seconds,"
+            " MAX(best_streak_ms) AS best_streak_ms"
+            " FROM pose_totals WHERE classroom = ? GROUP BY pose ORDER BY pose",
+            (classroom,),
+        )
+    return [dict(row) for row in rows]
+
+
+def weekly(conn, classroom, student=None, weeks=12):
+    """Per-week totals for the last `weeks` weeks, oldest first."""
+    today = datetime.datetime.now(datetime.timezone.utc).date()
+    since = (today - datetime.timedelta(days=today.weekday(), weeks=weeks - 1)).isoformat()
+    where = "classroom = ? AND week >= ?"
+    params = [classroom, since]
+    if student is not None:
+        where += " AND student = ?"
+        params.append(student)
+
+    result = {}
+    for row in conn.execute(
+        f"SELECT week, SUM(sessions) AS sessions, SUM(seconds) AS seconds,"
+        f" COUNT(DISTINCT student) AS students"
+        f" FROM weekly_totals WHERE {where} GROUP BY week ORDER BY week",
+        params,
+    ):
+        result[row["week"]] = dict(row, poses={})
+    for row in conn.execute(
+        f"SELECT week, pose, SUM(seconds) AS seconds FROM weekly_pose_totals"
+        f" WHERE {where} GROUP BY week, pose",
+        params,
+    ):
+        if row["week"] in result:
+            result[row["week"]]["poses"][row["pose"]] = row["seconds"]
+    return list(result.values())
+
+
+# -- exports (raw records, streamed) ----------------------------------------
+
+def export_rows(conn, classroom=None, since=None, until=None):
+    """Yield one tuple per (session, pose) in EXPORT_COLUMNS order."""
+    where, params = [], []
+    if classroom is not None:
+        where.append("s.classroom = ?")
+        params.append(classroom)
+    if since is not None:
+        where.append("s.received_at >= ?")
+        params.append(since)
+    if until is not None:
+        where.append("s.received_at < ?")
+        params.append(until)
+    cursor = conn.execute(
+        "SELECT s.id, s.started_at, s.received_at, s.student, s.classroom, s.model_url,"
+        " s.total_seconds, s.frames, s.fps, s.latency_ms, s.backend,"
+        " p.pose, p.seconds, p.frames"
+        " FROM sessions s LEFT JOIN session_poses p ON p.session_id = s.id"
+        + (" WHERE " + " AND ".join(where) if where else "")
+        + " ORDER BY s.received_at, s.id",
+        params,
+    )
+    while True:
+        rows = cursor.fetchmany(EXPORT_FETCH_SIZE)
+        if not rows:
+            return
+        for row in rows:
+            yield tuple(row)
+
+
+class _Line:
+    # csv.writer target that hands back each formatted line.
+    def write(self, line):
+        return line
+
+
+def iter_csv(rows):
+    writer = csv.writer(_Line())
+    yield writer.writerow(EXPORT_COLUMNS)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def iter_json(rows):
+    """Group (session, pose) rows into one JSON object per session."""
+    yield "["
+    current = None
+    for row in rows:
+        if current is None or current["id"] != row[0]:
+            if current is not None:
+                yield json.dumps(current) + ","
+            current = dict(zip(
+                ("id",) + EXPORT_COLUMNS[1:11], row[:11]
+            ), poses={})
+        if row[11] is not None:
+            current["poses"][row[11]] = {"seconds": row[12], "frames": row[13]}
+    if current is not None:
+        yield json.dumps(current)
+    yield "]"
@@ -0,0 +1,557 @@
+import atexit
+import json
+import logging
+import math
+import os
+import queue
+import re
+import sqlite3
+import struct
+import threading
+import time
+import uuid
+
+SESSION_DB = os.environ.get(
+    "SESSION_DB", os.path.join(os.path.dirname(os.path.abspath(__file__)), "sessions.db")
+)
+SESSION_QUEUE_SIZE = int(os.environ.get("SESSION_QUEUE_SIZE", 10000))
+SESSION_BATCH_SIZE = int(os.environ.get("SESSION_BATCH_SIZE", 500))
+SESSION_FLUSH_INTERVAL = float(os.environ.get("SESSION_FLUSH_INTERVAL", 0.2))
+SESSION_WRITE_RETRIES = int(os.environ.get("SESSION_WRITE_RETRIES", 5))
+SESSION_RETRY_DELAY = float(os.environ.get("SESSION_RETRY_DELAY", 0.5))
+
+SESSION_ID_RE = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+MAX_TEXT = 200
+MAX_POSES = 100
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    id TEXT PRIMARY KEY,
+    received_at REAL NOT NULL,
+    started_at REAL,
+    student TEXT NOT NULL DEFAULT '',
+    classroom TEXT NOT NULL DEFAULT '',
+    model_url TEXT NOT NULL DEFAULT '',
+    total_seconds REAL NOT NULL,
+    frames INTEGER NOT NULL,
+    fps REAL NOT NULL,
+    latency_ms REAL,
+    backend TEXT NOT NULL DEFAULT ''
+);
+CREATE TABLE IF NOT EXISTS session_poses (
+    session_id TEXT NOT NULL REFERENCES sessions(id),
+    pose TEXT NOT NULL,
+    seconds REAL NOT NULL,
+    frames INTEGER NOT NULL,
+    PRIMARY KEY (session_id, pose)
+);
+CREATE TABLE IF NOT EXISTS timelines (
+    session_id TEXT PRIMARY KEY,
+    received_at REAL NOT NULL,
+    bytes INTEGER NOT NULL,
+    segments INTEGER NOT NULL,
+    samples INTEGER NOT NULL,
+    keypoints INTEGER NOT NULL
+);
+-- Longest continuous hold per pose, from the session's timeline
+CREATE TABLE IF NOT EXISTS session_streaks (
+    session_id TEXT NOT NULL,
+    pose TEXT NOT NULL,
+    best_ms INTEGER NOT NULL,
+    PRIMARY KEY (session_id, pose)
+);
+CREATE INDEX IF NOT EXISTS sessions_by_received ON sessions (received_at);
+CREATE INDEX IF NOT EXISTS sessions_by_class ON sessions (classroom, received_at);
+
+-- Summary tables, updated in the same transaction as each batch of sessions
+-- so reports never have to scan the raw records
+CREATE TABLE IF NOT EXISTS student_totals (
+    classroom TEXT NOT NULL,
+    student TEXT NOT NULL,
+    sessions INTEGER NOT NULL,
+    seconds REAL NOT NULL,
+    frames INTEGER NOT NULL,
+    first_at REAL NOT NULL,
+    last_at REAL NOT NULL,
+    PRIMARY KEY (classroom, student)
+);
+CREATE TABLE IF NOT EXISTS pose_totals (
+    classroom TEXT NOT NULL,
+    student TEXT NOT NULL,
+    pose TEXT NOT NULL,
+    sessions INTEGER NOT NULL,
+    seconds REAL NOT NULL,
+    frames INTEGER NOT NULL,
+    best_session_seconds REAL NOT NULL,
+    best_streak_ms INTEGER NOT NULL,
+    PRIMARY KEY (classroom, student, pose)
+);
+CREATE TABLE IF NOT EXISTS weekly_totals (
+    classroom TEXT NOT NULL,
+    student TEXT NOT NULL,
+    week TEXT NOT NULL, -- Monday of the week, YYYY-MM-DD (UTC)
+    sessions INTEGER NOT NULL,
+    seconds REAL NOT NULL,
+    PRIMARY KEY (classroom, student, week)
+);
+CREATE TABLE IF NOT EXISTS weekly_pose_totals (
+    classroom TEXT NOT NULL,
+    student TEXT NOT NULL,
+    week TEXT NOT NULL,
+    pose TEXT NOT NULL,
+    seconds REAL NOT NULL,
+    frames INTEGER NOT NULL,
+    PRIMARY KEY (classroom, student, week, pose)
+);
+CREATE TEMP TABLE IF NOT EXISTS new_sessions (id TEXT PRIMARY KEY);
+"""
+
+# Bump when the summary tables change shape or meaning; connect() rebuilds
+# them from the raw tables when the database is behind.
+SUMMARY_VERSION = 1
+SUMMARY_TABLES = ("student_totals", "pose_totals", "weekly_totals", "weekly_pose_totals")
+
+# Week of a session, as the Monday on or before its start (UTC)
+_WEEK = "date(COALESCE(s.started_at, s.received_at), 'unixepoch', '-6 days', 'weekday 1')"
+
+# Fold the sessions listed in new_sessions into the summary tables
+SUMMARY_UPDATES = (
+    """
+    INSERT INTO student_totals (classroom, student, sessions, seconds, frames, first_at, last_at)
+    SELECT s.classroom, s.student, COUNT(*), SUM(s.total_seconds), SUM(s.frames),
+           MIN(COALESCE(s.started_at, s.received_at)), MAX(COALESCE(s.started_at, s.received_at))
+    FROM sessions s JOIN new_sessions n ON n.id = s.id
+    WHERE true
+    GROUP BY s.classroom, s.student
+    ON CONFLICT (classroom, student) DO UPDATE SET
+        sessions = sessions + excluded.sessions,
+        seconds = seconds + excluded.seconds,
+        frames = frames + excluded.frames,
+        first_at = MIN(first_at, excluded.first_at),
+        last_at = MAX(last_at, excluded.last_at)
+    """,
+    """
+    INSERT INTO pose_totals (classroom, student, pose, sessions, seconds, frames,
+                             best_session_seconds, best_streak_ms)
+    SELECT s.classroom, s.student, p.pose, COUNT(*), SUM(p.seconds), SUM(p.frames),
+           MAX(p.seconds), MAX(COALESCE(k.best_ms, 0))
+    FROM session_poses p
+    JOIN new_sessions n ON n.id = p.session_id
+    JOIN sessions s ON s.id = p.session_id
+    LEFT JOIN session_streaks k ON k.session_id = p.session_id AND k.pose = p.pose
+    WHERE true
+    GROUP BY s.classroom, s.student, p.pose
+    ON CONFLICT (classroom, student, pose) DO UPDATE SET
+        sessions = sessions + excluded.sessions,
+        seconds = seconds + excluded.seconds,
+        frames = frames + excluded.frames,
+        best_session_seconds = MAX(best_session_seconds, excluded.best_session_seconds),
+        best_streak_ms = MAX(best_streak_ms, excluded.best_streak_ms)
+    """,
+    f"""
+    INSERT INTO weekly_totals (classroom, student, week, sessions, seconds)
+    SELECT s.classroom, s.student, {_WEEK}, COUNT(*), SUM(s.total_seconds)
+    FROM sessions s JOIN new_sessions n ON n.id = s.id
+    WHERE true
+    GROUP BY 1, 2, 3
+    ON CONFLICT (classroom, student, week) DO UPDATE SET
+        sessions = sessions + excluded.sessions,
+        seconds = seconds + excluded.seconds
+    """,
+    f"""
+    INSERT INTO weekly_pose_totals (classroom, student, week, pose, seconds, frames)
+    SELECT s.classroom, s.student, {_WEEK}, p.pose, SUM(p.seconds), SUM(p.frames)
+    FROM session_poses p
+    JOIN new_sessions n ON n.id = p.session_id
+    JOIN sessions s ON s.id = p.session_id
+    WHERE true
+    GROUP BY 1, 2, 3, 4
+    ON CONFLICT (classroom, student, week, pose) DO UPDATE SET
+        seconds = seconds + excluded.seconds,
+        frames = frames + excluded.frames
+    """,
+)
+
+# Binary session record (little-endian), for clients that want something
+# smaller than JSON:
+#   b"PSN1"
+#   f64 started_at, f64 total_seconds, u32 frames, f32 fps, f32 latency_ms
+#   5 strings (u16 length + UTF-8): id, student, classroom, model_url, backend
+#   u16 pose count, then per pose: string name, f32 seconds, u32 frames
+BINARY_MAGIC = b"PSN1"
+BINARY_MIMETYPE = "application/x-pose-session"
+_HEADER = struct.Struct("<ddIff")
+_POSE = struct.Struct("<fI")
+_U16 = struct.Struct("<H")
+_STRING_FIELDS = ("id", "student", "classroom", "model_url", "backend")
+
+
+class QueueFull(Exception):
+    pass
+
+
+def connect(path=SESSION_DB):
+    conn = sqlite3.connect(path, timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(SCHEMA)
+    (version,) = conn.execute("PRAGMA user_version").fetchone()
+    if version < SUMMARY_VERSION:
+        rebuild_summaries(conn)
+    return conn
+
+
+def rebuild_summaries(conn):
+    """Recompute every summary table from the raw session tables."""
+    with conn:
+        for table in SUMMARY_TABLES:
+            conn.execute(f"DELETE FROM {table}")
+        conn.execute("DELETE FROM new_sessions")
+        conn.execute("INSERT INTO new_sessions (id) SELECT id FROM sessions")
+        for statement in SUMMARY_UPDATES:
+            conn.execute(statement)
+        conn.execute("DELETE FROM new_sessions")
+        conn.execute(f"PRAGMA user_version = {SUMMARY_VERSION}")
+
+
+# -- parsing ---------------------------------------------------------------
+
+def _text(value, field):
+    if value is None:
+        return ""
+    if not isinstance(value, str):
+        raise ValueError(f"{field} must be a string")
+    return value.strip()[:MAX_TEXT]
+
+
+def _number(value, field, integer=False, required=True):
+    if value is None and not required:
+        return None
+    if isinstance(value, bool) or not isinstance(value, (int, float)) \
+            or not math.isfinite(value) or value < 0:
+        raise ValueError(f"{field} must be a non-negative number")
+    return int(value) if integer else float(value)
+
+
+def parse_session(data):
+    """Validate one JSON session object and return a normalised record."""
+    if not isinstance(data, dict):
+        raise ValueError("session must be an object")
+
+    poses = data.get("poses") or {}
+    if not isinstance(poses, dict) or len(poses) > MAX_POSES:
+        raise ValueError(f"poses must be an object with at most {MAX_POSES} entries")
+    parsed_poses = {}
+    for name, value in poses.items():
+        if isinstance(value, dict):
+            seconds, frames = value.get("seconds"), value.get("frames", 0)
+        else:
+            seconds, frames = value, 0
+        parsed_poses[_text(name, "pose name")] = (
+            _number(seconds, f"poses[{name!r}].seconds"),
+            _number(frames, f"poses[{name!r}].frames", integer=True),
+        )
+
+    session_id = _text(data.get("id"), "id") or uuid.uuid4().hex
+    if not SESSION_ID_RE.match(session_id):
+        raise ValueError("id may only contain letters, digits, '-' and '_'")
+    return {
+        "id": session_id,
+        "started_at": _number(data.get("started_at"), "started_at", required=False),
+        "student": _text(data.get("student"), "student"),
+        "classroom": _text(data.get("classroom"), "classroom"),
+        "model_url": _text(data.get("model_url"), "model_url"),
+        "total_seconds": _number(data.get("total_seconds"), "total_seconds"),
+        "frames": _number(data.get("frames", 0), "frames", integer=True),
+        "fps": _number(data.get("fps", 0), "fps"),
+        "latency_ms": _number(data.get("latency_ms"), "latency_ms", required=False),
+        "backend": _text(data.get("backend"), "backend"),
+        "poses": parsed_poses,
+    }
+
+
+def parse_sessions(data):
+    """Accept a single session object or a list of them."""
+    items = data if isinstance(data, list) else [data]
+    if not items or len(items) > 1000:
+        raise ValueError("expected 1 to 1000 sessions")
+    return [parse_session(item) for item in items]
+
+
+def encode_binary_session(record):
+    parts = [BINARY_MAGIC, _HEADER.pack(
+        record.get("started_at") or 0.0,
+        record["total_seconds"],
+        record.get("frames", 0),
+        record.get("fps", 0.0),
+        record.get("latency_ms") or 0.0,
+    )]
+    for field in _STRING_FIELDS:
+        encoded = (record.get(field) or "").encode("utf-8")
+        parts += [_U16.pack(len(encoded)), encoded]
+    poses = record.get("poses", {})
+    parts.append(_U16.pack(len(poses)))
+    for name, value in poses.items():
+        seconds, frames = value if isinstance(value, (tuple, list)) else (value, 0)
+        encoded = name.encode("utf-8")
+        parts += [_U16.pack(len(encoded)), encoded, _POSE.pack(seconds, frames)]
+    return b"".join(parts)
+
+
+def decode_binary_session(data):
+    """Decode one binary session record into the same dict parse_session() takes."""
+    try:
+        if data[:4] != BINARY_MAGIC:
+            raise ValueError("not a binary session record")
+        offset = 4
+        started_at, total_seconds, frames, fps, latency_ms = _HEADER.unpack_from(data, offset)
+        offset += _HEADER.size
+
+        def read_string():
+            nonlocal offset
+            (length,) = _U16.unpack_from(data, offset)
+            offset += _U16.size
+            value = data[offset:offset + length].decode("utf-8")
+            offset += length
+            return value
+
+        session = {field: read_string() for field in _STRING_FIELDS}
+        (count,) = _U16.unpack_from(data, offset)
+        offset += _U16.size
+        poses = {}
+        for _ in range(count):
+            name = read_string()
+            seconds, pose_frames = _POSE.unpack_from(data, offset)
+            offset += _POSE.size
+            poses[name] = {"seconds": seconds, "frames": pose_frames}
+    except (struct.error, UnicodeDecodeError) as error:
+        raise ValueError(f"malformed binary session: {error}")
+
+    session.update(
+        started_at=started_at or None,
+        total_seconds=total_seconds,
+        frames=frames,
+        fps=fps,
+        latency_ms=latency_ms or None,
+        poses=poses,
+    )
+    return session
+
+
+# -- writer ----------------------------------------------------------------
+
+class SessionWriter:
+    """Append-only writer that batches submitted records into SQLite.
+
+    Request threads only put records on a bounded queue; a background
+    thread drains it and commits each batch in one transaction. The
+    thread is started on first use so it lives in the serving process
+    (not in a pre-fork master).
+
+    A batch that fails is retried with backoff. If it still fails it is
+    appended to a spill file next to the database, which the writer
+    replays when it next starts.
+    """
+
+    def __init__(self, path=SESSION_DB, queue_size=SESSION_QUEUE_SIZE,
+                 batch_size=SESSION_BATCH_SIZE, flush_interval=SESSION_FLUSH_INTERVAL,
+                 retries=SESSION_WRITE_RETRIES, retry_delay=SESSION_RETRY_DELAY):
+        self.path = path
+        self.spill_path = path + ".spill.jsonl"
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self.written = 0
+        self.spilled = 0
+        # Schema is created up front so readers never see a missing table.
+        connect(path).close()
+
+    def submit(self, kind, records):
+        """Queue records of `kind` for writing. Raises QueueFull when saturated."""
+        self._ensure_thread()
+        for record in records:
+            try:
+                self._queue.put_nowait((kind, record))
+            except queue.Full:
+                raise QueueFull("session queue is full")
+
+    def pending(self):
+        return self._queue.qsize()
+
+    def _ensure_thread(self):
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is None or self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._stopping.clear()
+                self._thread = threading.Thread(
+                    target=self._run, name="session-writer", daemon=True
+                )
+                self._thread.start()
+                atexit.register(self.close)
+
+    def close(self, timeout=10):
+        """Flush everything queued so far and stop the background thread."""
+        if self._thread is None or self._pid != os.getpid():
+            return
+        self._stopping.set()
+        self._thread.join(timeout)
+        self._thread = None
+
+    def _run(self):
+        conn = connect(self.path)
+        try:
+            self._replay_spill(conn)
+            while not (self._stopping.is_set() and self._queue.empty()):
+                batch = self._next_batch()
+                if batch:
+                    self._write(conn, batch)
+        finally:
+            conn.close()
+
+    def _next_batch(self):
+        try:
+            batch = [self._queue.get(timeout=self.flush_interval)]
+        except queue.Empty:
+            return []
+        # Give concurrent submits a moment to join this batch.
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self._queue.get(timeout=max(remaining, 0)) if remaining > 0
+                             else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, conn, batch):
+        by_kind = {}
+        for kind, record in batch:
+            by_kind.setdefault(kind, []).append(record)
+        delay = self.retry_delay
+        for attempt in range(self.retries + 1):
+            try:
+                with conn:
+                    for kind, records in by_kind.items():
+                        WRITERS[kind](conn, records)
+                self.written += len(batch)
+                return
+            except sqlite3.Error:
+                if attempt == self.retries:
+                    logging.getLogger(__name__).exception(
+                        "failed to write %d records; spilling them to %s", len(batch), self.spill_path)
+                else:
+                    logging.getLogger(__name__).warning(
+                        "failed to write %d records; retrying in %.1fs", len(batch), delay, exc_info=True)
+                    time.sleep(delay)
+                    delay *= 2
+        self._spill(batch)
+
+    def _spill(self, batch):
+        try:
+            with open(self.spill_path, "a", encoding="utf-8") as f:
+                for kind, record in batch:
+                    f.write(json.dumps([kind, record]) + "\n")
+            self.spilled += len(batch)
+        except OSError:
+            # Keep the thread alive; the batch is lost but later ones are not.
+            logging.getLogger(__name__).exception("failed to spill %d records", len(batch))
+
+    def _replay_spill(self, conn):
+        # Claim the file first, so two workers never replay the same records
+        # and anything that fails again is spilled to a fresh file.
+        claimed = f"{self.spill_path}.{os.getpid()}"
+        try:
+            os.replace(self.spill_path, claimed)
+        except FileNotFoundError:
+            return
+        with open(claimed, encoding="utf-8") as f:
+            batch = [tuple(json.loads(line)) for line in f if line.strip()]
+        logging.getLogger(__name__).info("replaying %d spilled records", len(batch))
+        # Replays are safe: sessions already stored are skipped and
+        # timelines replace their row.
+        for start in range(0, len(batch), self.batch_size):
+            self._write(conn, batch[start:start + self.batch_size])
+        os.remove(claimed)
+
+
+def _write_sessions(conn, records):
+    # Only sessions not stored yet count towards the summaries, so client
+    # retries and duplicates within the batch are never added twice.
+    unique = {}
+    for record in records:
+        unique.setdefault(record["id"], record)
+    records = list(unique.values())
+    conn.execute("DELETE FROM new_sessions")
+    conn.executemany(
+        "INSERT INTO new_sessions (id) SELECT ? WHERE NOT EXISTS (SELECT 1 FROM sessions WHERE id = ?)",
+        [(r["id"], r["id"]) for r in records],
+    )
+
+    now = time.time()
+    conn.executemany(
+        "INSERT OR IGNORE INTO sessions (id, received_at, started_at, student, classroom,"
+        " model_url, total_seconds, frames, fps, latency_ms, backend)"
+        " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        [
+            (r["id"], now, r["started_at"], r["student"], r["classroom"], r["model_url"],
+             r["total_seconds"], r["frames"], r["fps"], r["latency_ms"], r["backend"])
+            for r in records
+        ],
+    )
+    conn.executemany(
+        "INSERT OR IGNORE INTO session_poses (session_id, pose, seconds, frames)"
+        " VALUES (?, ?, ?, ?)",
+        [
+            (r["id"], pose, seconds, frames)
+            for r in records
+            for pose, (seconds, frames) in r["poses"].items()
+        ],
+    )
+    for statement in SUMMARY_UPDATES:
+        conn.execute(statement)
+
+
+def _write_timelines(conn, records):
+    # A re-uploaded timeline replaces the file on disk, so replace the row too.
+    now = time.time()
+    conn.executemany(
+        "INSERT OR REPLACE INTO timelines (session_id, received_at, bytes, segments, samples,"
+        " keypoints) VALUES (?, ?, ?, ?, ?, ?)",
+        [
+            (r["session_id"], now, r["bytes"], r["segments"], r["samples"], r["keypoints"])
+            for r in records
+        ],
+    )
+    streaks = [
+        (r["session_id"], pose, best_ms)
+        for r in records
+        for pose, best_ms in r.get("streaks", {}).items()
+    ]
+    conn.executemany(
+        "INSERT OR REPLACE INTO session_streaks (session_id, pose, best_ms) VALUES (?, ?, ?)",
+        streaks,
+    )
+    # Sessions that are already stored get their best streak updated here;
+    # later ones pick it up from session_streaks when they are written.
+    conn.executemany(
+        "UPDATE pose_totals SET best_streak_ms = MAX(best_streak_ms, ?)"
+        " WHERE (classroom, student) = (SELECT classroom, student FROM sessions WHERE id = ?)"
+        " AND pose = ?",
+        [(best_ms, session_id, pose) for session_id, pose, best_ms in streaks],
+    )
+
+
+# kind -> function(conn, records), called inside the batch transaction
+WRITERS = {
+    "session": _write_sessions,
+    "timeline": _write_timelines,
+}
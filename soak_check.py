@@ -0,0 +1,102 @@
+"""Headless soak test of the page's inference engines.
+
+Opens the page in headless Chromium (through Playwright) with a fake
+camera, loads a Teachable Machine model with ?soak=N and starts the
+webcam test, so the soak runs alongside the live frame loop the way it
+would for a student. An engine passes when the tensor count after the
+soak is back where it started and no prediction failed:
+
+    pip install playwright && playwright install chromium
+    python soak_check.py --model https://teachablemachine.withgoogle.com/models/<id>/
+
+The model and PoseNet weights are downloaded, and so are the libraries
+unless the vendor directory is populated (flask --app app fetch-vendor).
+Prints one line per engine and exits 1 if any failed.
+"""
+import argparse
+import shutil
+import sys
+import tempfile
+
+from bench import start_app, stop_app
+from model_proxy import MODEL_UPSTREAM
+
+ENGINES = {"worker": "1", "main": "0"}  # Engine name -> ?worker= value
+FAKE_CAMERA_ARGS = ["--use-fake-ui-for-media-stream", "--use-fake-device-for-media-stream"]
+
+
+def soak(browser, url, model, engine, iterations, timeout):
+    """Run one soak; return (passed, summary line)."""
+    page = browser.new_page()
+    errors = []
+    page.on("pageerror", lambda error: errors.append(str(error)))
+    try:
+        page.goto(f"{url}/?soak={iterations}&worker={ENGINES[engine]}")
+        page.fill("#model-url", model)
+        page.click("#check-model-button")
+        page.wait_for_selector("#feedback.success, #feedback.error", timeout=timeout * 1000)
+        if page.get_attribute("#feedback", "class") == "error":
+            return False, page.inner_text("#feedback")
+
+        # Frames from the fake camera are classified while the soak runs
+        page.click("#test-webcam-button")
+        page.wait_for_function(
+            "/Soak test (PASSED|FAILED)/.test(document.getElementById('diagnostics').textContent)",
+            timeout=timeout * 1000,
+        )
+        result = [line for line in page.inner_text("#diagnostics").splitlines() if "Soak test" in line][0]
+        feedback = page.inner_text("#feedback")
+        if "Error during prediction" in feedback:
+            return False, f"{result}; {feedback}"
+        if errors:
+            return False, f"{result}; page error: {errors[0]}"
+        return "PASSED" in result, result
+    finally:
+        page.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--model", required=True, help="Teachable Machine pose model URL")
+    parser.add_argument("--iterations", type=int, default=300, help="inferences per soak")
+    parser.add_argument("--engines", default=",".join(ENGINES), help="comma-separated: worker, main")
+    parser.add_argument("--url", help="test a running instance instead of starting one")
+    parser.add_argument("--chrome", help="Chromium/Chrome executable (default: Playwright's)")
+    parser.add_argument("--timeout", type=float, default=600, help="seconds allowed per engine")
+    args = parser.parse_args()
+
+    engines = [name.strip() for name in args.engines.split(",") if name.strip()]
+    unknown = set(engines) - set(ENGINES)
+    if unknown:
+        parser.error(f"unknown engines: {', '.join(sorted(unknown))}")
+    try:
+        from playwright.sync_api import sync_playwright
+    except ImportError:
+        raise SystemExit("soak_check.py needs Playwright: pip install playwright && playwright install chromium")
+
+    workdir = tempfile.mkdtemp(prefix="pose-soak-")
+    process = None
+    failed = 0
+    try:
+        if args.url:
+            url = args.url.rstrip("/")
+        else:
+            process, url = start_app("werkzeug", MODEL_UPSTREAM, workdir)
+        with sync_playwright() as playwright:
+            browser = playwright.chromium.launch(executable_path=args.chrome, args=FAKE_CAMERA_ARGS)
+            try:
+                for engine in engines:
+                    passed, summary = soak(browser, url, args.model, engine, args.iterations, args.timeout)
+                    failed += not passed
+                    print(f"{engine}: {'PASS' if passed else 'FAIL'} - {summary}", flush=True)
+            finally:
+                browser.close()
+    finally:
+        if process is not None:
+            stop_app(process)
+        shutil.rmtree(workdir, ignore_errors=True)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+// Pose inference worker: runs PoseNet and the Teachable Machine classifier
+// off the main thread. The page sends frames as transferable ImageBitmaps
+// and gets back the pose and class probabilities.
+//
+// Every message carries an id; the reply is {id, ok, result} or {id, ok: false, error}.
+
+let model = null; // The active model
+let activeKey = null;
+const models = new Map(); // key -> { model, modelFiles }; files are kept so reset() can reload
+let frameCanvas = null;
+let frameCtx = null;
+
+// Copy a frame into the reusable OffscreenCanvas and return its pixels.
+// tfjs 1.x cannot read an OffscreenCanvas directly, but it accepts ImageData.
+function frameData(bitmap) {
+    if (!frameCanvas || frameCanvas.width !== bitmap.width || frameCanvas.height !== bitmap.height) {
+        frameCanvas = new OffscreenCanvas(bitmap.width, bitmap.height);
+        frameCtx = frameCanvas.getContext('2d');
+    }
+    frameCtx.drawImage(bitmap, 0, 0);
+    bitmap.close();
+    return frameCtx.getImageData(0, 0, frameCanvas.width, frameCanvas.height);
+}
+
+// Mean movement of the keypoints confident in both poses, relative to the
+// diagonal of the reference pose; Infinity when too few can be compared.
+// Same as poseMotion() on the page.
+function poseMotion(reference, keypoints) {
+    const minScore = 0.5, minKeypoints = 5;
+    let minX = Infinity, minY = Infinity, maxX = -Infinity, maxY = -Infinity;
+    let total = 0, matched = 0;
+    for (let i = 0; i < reference.length && i < keypoints.length; i++) {
+        const a = reference[i], b = keypoints[i];
+        if (a.score < minScore || b.score < minScore) continue;
+        total += Math.hypot(a.position.x - b.position.x, a.position.y - b.position.y);
+        matched++;
+        minX = Math.min(minX, a.position.x);
+        maxX = Math.max(maxX, a.position.x);
+        minY = Math.min(minY, a.position.y);
+        maxY = Math.max(maxY, a.position.y);
+    }
+    const size = Math.hypot(maxX - minX, maxY - minY);
+    return matched >= minKeypoints && size > 0 ? total / matched / size : Infinity;
+}
+
+// With a gate ({ reference, threshold }) the classifier only runs when the
+// pose moved that far from the reference; otherwise prediction is null
+async function infer(source, gate = null) {
+    // Every tensor created during this step is disposed at endScope()
+    tf.engine().startScope();
+    try {
+        const { pose, posenetOutput } = await model.estimatePose(source);
+        if (gate && pose && poseMotion(gate.reference, pose.keypoints) < gate.threshold) {
+            return { pose, prediction: null };
+        }
+        const prediction = await model.predict(posenetOutput);
+        return { pose, prediction };
+    } finally {
+        tf.engine().endScope();
+    }
+}
+
+const handlers = {
+    // Load tfjs and tmPose from the same URLs the page uses
+    async init({ scripts, wasmPath }) {
+        importScripts(...scripts);
+        if (tf.wasm && tf.wasm.setWasmPath) {
+            tf.wasm.setWasmPath(wasmPath);
+        }
+        if (tf.ready) {
+            await tf.ready();
+        }
+        return { backend: tf.getBackend() };
+    },
+
+    async backends() {
+        const order = ['webgl', 'wasm', 'cpu'];
+        const backends = Object.keys(tf.engine().registryFactory)
+            .sort((a, b) => (order.indexOf(a) + 1 || 99) - (order.indexOf(b) + 1 || 99));
+        return { backends };
+    },
+
+    async setBackend({ name }) {
+        if (!(await tf.setBackend(name))) {
+            throw new Error(`Backend ${name} could not be initialized.`);
+        }
+        return { backend: tf.getBackend() };
+    },
+
+    // Median latency of one inference on `name`, after one untimed run
+    async benchmark({ name, width, height, runs }) {
+        await handlers.setBackend({ name });
+        const blank = new ImageData(width, height);
+        await infer(blank);
+        const times = [];
+        for (let i = 0; i < runs; i++) {
+            const start = performance.now();
+            await infer(blank);
+            times.push(performance.now() - start);
+        }
+        times.sort((a, b) => a - b);
+        return { ms: times[Math.floor(times.length / 2)] };
+    },
+
+    // modelFiles holds topology, weights and metadata, fetched (and cached) by the page.
+    // The model is kept under `key` next to any others and becomes the active one.
+    async load({ key, modelFiles: files }) {
+        const artifacts = tf.io.fromMemory({
+            modelTopology: files.modelTopology,
+            weightSpecs: files.weightSpecs,
+            weightData: files.weightData
+        });
+        const loaded = await tmPose.load(artifacts, files.metadata);
+        await handlers.unload({ key });
+        models.set(key, { model: loaded, modelFiles: files });
+        return handlers.activate({ key });
+    },
+
+    async activate({ key }) {
+        const entry = models.get(key);
+        if (!entry) {
+            throw new Error(`Model ${key} is not loaded.`);
+        }
+        model = entry.model;
+        activeKey = key;
+        return { totalClasses: model.getTotalClasses(), labels: model.getClassLabels() };
+    },
+
+    async unload({ key }) {
+        const entry = models.get(key);
+        if (!entry) {
+            return { unloaded: false };
+        }
+        models.delete(key);
+        if (key === activeKey) {
+            model = null;
+            activeKey = null;
+        }
+        entry.model.dispose();
+        return { unloaded: true };
+    },
+
+    async warmup({ width, height, runs }) {
+        const blank = new ImageData(width, height);
+        const start = performance.now();
+        for (let i = 0; i < runs; i++) {
+            await infer(blank);
+        }
+        return { ms: performance.now() - start };
+    },
+
+    // ms is this frame's own work, without time queued behind other messages
+    async frame({ bitmap, gate }) {
+        const start = performance.now();
+        const result = await infer(frameData(bitmap), gate);
+        return { ...result, ms: performance.now() - start };
+    },
+
+    async memory() {
+        const { numTensors, numBytes } = tf.memory();
+        return { numTensors, numBytes, backend: tf.getBackend() };
+    },
+
+    // Drop every tensor (leaked or not) and load the active model again on the
+    // same backend. The other models' weights are gone too, so they are forgotten.
+    async reset() {
+        const backend = tf.getBackend();
+        const { modelFiles } = models.get(activeKey);
+        const key = activeKey;
+        model = null;
+        activeKey = null;
+        models.clear();
+        tf.engine().reset();
+        await handlers.setBackend({ name: backend });
+        return handlers.load({ key, modelFiles });
+    }
+};
+
+async function handle(message) {
+    const { id, type } = message;
+    try {
+        const result = await handlers[type](message);
+        self.postMessage({ id, ok: true, result });
+    } catch (error) {
+        self.postMessage({ id, ok: false, error: error.message || String(error) });
+    }
+}
+
+// Handle one message at a time so a frame never runs against a model that
+// is being replaced or disposed
+let queue = Promise.resolve();
+self.onmessage = (event) => {
+    queue = queue.then(() => handle(event.data));
+};
@@ -0,0 +1,63 @@
+import http.server
+import os
+import tempfile
+import threading
+import time
+
+import pytest
+
+# app.py creates its cache, session database and timeline directory at import
+# time, so point them somewhere disposable before any test imports it.
+_DATA_DIR = tempfile.mkdtemp(prefix="pose-tests-")
+os.environ.setdefault("MODEL_CACHE_DIR", os.path.join(_DATA_DIR, "model_cache"))
+os.environ.setdefault("SESSION_DB", os.path.join(_DATA_DIR, "sessions.db"))
+os.environ.setdefault("TIMELINE_DIR", os.path.join(_DATA_DIR, "timelines"))
+
+
+class Upstream:
+    """Local stand-in for the Teachable Machine model host."""
+
+    def __init__(self):
+        self.files = {}  # path -> bytes; anything else is a 404
+        self.status = {}  # path -> forced error status
+        self.delay = 0.0
+        self.hits = {}
+        self._lock = threading.Lock()
+        upstream = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                with upstream._lock:
+                    upstream.hits[self.path] = upstream.hits.get(self.path, 0) + 1
+                time.sleep(upstream.delay)
+                status = upstream.status.get(self.path)
+                body = upstream.files.get(self.path)
+                if status is None and body is None:
+                    status = 404
+                if status is not None:
+                    self.send_response(status)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}/models/"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def upstream():
+    server = Upstream()
+    yield server
+    server.close()
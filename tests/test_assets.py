@@ -0,0 +1,139 @@
+import base64
+import gzip
+import hashlib
+
+import pytest
+from flask import Flask
+from werkzeug.http import http_date
+
+import vendor
+from assets import StaticAsset, brotli, send_asset
+from vendor import VendorBundle, fetch_all
+
+BODY = b"console.log('pose');\n" * 100
+
+
+@pytest.fixture
+def client():
+    app = Flask(__name__)
+    asset = StaticAsset(BODY, "text/javascript", last_modified=1_700_000_000)
+    app.add_url_rule("/asset.js", "asset", lambda: send_asset(asset))
+    return app.test_client()
+
+
+@pytest.mark.parametrize("accept, encoding, decode", [
+    pytest.param("br, gzip", "br", lambda body: brotli.decompress(body),
+                 marks=pytest.mark.skipif(brotli is None, reason="brotli is not installed")),
+    ("gzip", "gzip", gzip.decompress),
+    ("identity", None, lambda body: body),
+])
+def test_encoding_is_negotiated(client, accept, encoding, decode):
+    response = client.get("/asset.js", headers={"Accept-Encoding": accept})
+
+    assert response.status_code == 200
+    assert response.headers.get("Content-Encoding") == encoding
+    assert response.headers["Vary"] == "Accept-Encoding"
+    assert decode(response.data) == BODY
+
+
+def test_etag_differs_per_encoding(client):
+    gzip_tag = client.get("/asset.js", headers={"Accept-Encoding": "gzip"}).headers["ETag"]
+    plain_tag = client.get("/asset.js", headers={"Accept-Encoding": "identity"}).headers["ETag"]
+
+    assert gzip_tag != plain_tag
+
+
+@pytest.mark.parametrize("if_none_match", [
+    '"{tag}"',  # Strong, same encoding
+    'W/"{tag}"',  # Weakened by a proxy that re-compressed the body
+    '"{plain}"',  # Another encoding of the same content
+    '"other", W/"{tag}"',
+    "*",
+])
+def test_matching_etag_is_not_modified(client, if_none_match):
+    first = client.get("/asset.js", headers={"Accept-Encoding": "gzip"})
+    tag = first.headers["ETag"].strip('"')
+    plain = tag.rsplit("-", 1)[0]
+
+    response = client.get("/asset.js", headers={
+        "Accept-Encoding": "gzip",
+        "If-None-Match": if_none_match.format(tag=tag, plain=plain),
+    })
+
+    assert response.status_code == 304
+    assert response.data == b""
+    assert response.headers["ETag"] == first.headers["ETag"]
+
+
+def test_other_etag_is_served(client):
+    response = client.get("/asset.js", headers={"If-None-Match": '"stale"'})
+
+    assert response.status_code == 200
+
+
+@pytest.mark.parametrize("since, status", [
+    (1_700_000_000, 304),
+    (1_700_000_100, 304),
+    (1_699_999_999, 200),
+])
+def test_if_modified_since(client, since, status):
+    response = client.get("/asset.js", headers={"If-Modified-Since": http_date(since)})
+
+    assert response.status_code == status
+
+
+def test_last_modified(client):
+    assert client.get("/asset.js").headers["Last-Modified"] == http_date(1_700_000_000)
+
+
+def test_page_last_modified_is_the_source_mtime():
+    import app as app_module
+
+    response = app_module.app.test_client().get("/")
+
+    assert response.headers["Last-Modified"] == http_date(int(app_module.SOURCE_MTIME))
+
+
+@pytest.fixture
+def vendored(tmp_path, upstream, monkeypatch):
+    """Fetch every pinned library from the local stand-in into tmp_path."""
+    monkeypatch.setattr(vendor, "CDN_BASE", upstream.url)
+    files = {}
+    for name, (package, version, path) in vendor.LIBRARIES.items():
+        files[name] = f"/* {name} */\n".encode() * 50
+        upstream.files[f"/models/{package}@{version}/{path}"] = files[name]
+    fetch_all(str(tmp_path), log=lambda message: None)
+    return VendorBundle(str(tmp_path)), files
+
+
+def test_vendor_files_are_content_hashed(vendored):
+    bundle, files = vendored
+
+    for name, data in files.items():
+        digest = hashlib.sha256(data).hexdigest()[:12]
+        assert bundle.manifest[name]["file"].split(".")[-2] == digest
+        assert bundle.url(name) == "/vendor/" + bundle.manifest[name]["file"]
+
+    asset = bundle.asset(bundle.manifest["tfjs"]["file"])
+    assert asset.body == files["tfjs"]
+    assert set(asset.variants) == ({"gzip", "br"} if brotli else {"gzip"})
+    assert "immutable" in asset.cache_control
+    assert bundle.asset("tf.min.000000000000.js") is None
+
+
+def test_vendor_script_tag_has_integrity(vendored):
+    bundle, files = vendored
+    integrity = "sha384-" + base64.b64encode(hashlib.sha384(files["tmpose"]).digest()).decode()
+
+    tag = bundle.script_tag("tmpose")
+
+    assert f'src="{bundle.url("tmpose")}"' in tag
+    assert f'integrity="{integrity}"' in tag
+    assert 'crossorigin="anonymous"' in tag
+
+
+def test_unfetched_library_falls_back_to_the_cdn(tmp_path):
+    bundle = VendorBundle(str(tmp_path))
+
+    assert bundle.url("tfjs") == vendor.cdn_url("tfjs")
+    assert "integrity" not in bundle.script_tag("tfjs")
@@ -0,0 +1,130 @@
+import json
+import time
+
+import pytest
+
+from live import HubFull, LiveHub, parse_heartbeat
+
+# A tick long enough that the hub's own thread never flushes during a test;
+# the tests call flush() themselves.
+NEVER = 3600
+
+
+def _heartbeat(**fields):
+    return dict({"client": "c1", "classroom": "5b", "student": "Amy", "status": "task",
+                 "pose": "Tree", "probability": 0.9, "elapsed": 12, "durations": {"Tree": 10}},
+                **fields)
+
+
+def test_parse_heartbeat_normalises_fields():
+    classroom, client, state = parse_heartbeat(_heartbeat(classroom=" 5b ", probability=0.12345))
+
+    assert (classroom, client) == ("5b", "c1")
+    assert state == {"student": "Amy", "status": "task", "pose": "Tree", "probability": 0.123,
+                     "elapsed": 12.0, "durations": {"Tree": 10.0}}
+
+
+@pytest.mark.parametrize("fields", [
+    {"client": "no spaces"},
+    {"status": "paused"},
+    {"probability": 1.5},
+    {"elapsed": -1},
+    {"elapsed": True},
+    {"student": 5},
+    {"durations": {"Tree": "long"}},
+    {"durations": {str(n): 1 for n in range(51)}},
+])
+def test_parse_heartbeat_rejects_invalid_fields(fields):
+    with pytest.raises(ValueError):
+        parse_heartbeat(_heartbeat(**fields))
+
+
+def test_subscriber_gets_snapshot_then_coalesced_updates():
+    hub = LiveHub(tick=NEVER)
+    hub.update("5b", "c1", {"pose": "Tree"})
+    subscription = hub.subscribe("5b")
+
+    event, data = subscription.get(timeout=0)
+    assert event == "snapshot"
+    assert json.loads(data)["students"]["c1"]["pose"] == "Tree"
+
+    hub.update("5b", "c1", {"pose": "Chair"})
+    hub.update("5b", "c1", {"pose": "Warrior"})
+    hub.update("5b", "c2", {"pose": "Tree"})
+    hub.update("other", "c3", {"pose": "Tree"})
+    hub.flush()
+
+    event, data = subscription.get(timeout=0)
+    students = json.loads(data)["students"]
+    assert event == "update"
+    assert {client: state["pose"] for client, state in students.items()} == {"c1": "Warrior", "c2": "Tree"}
+    assert subscription.get(timeout=0) is None
+
+
+def test_slow_subscriber_is_resynced_with_a_snapshot():
+    hub = LiveHub(tick=NEVER, queue_size=2)
+    subscription = hub.subscribe("5b")
+    subscription.get(timeout=0)  # Initial snapshot
+
+    for n in range(3):
+        hub.update("5b", "c1", {"pose": f"Pose {n}"})
+        hub.flush()
+
+    assert subscription.dropped == 2
+    event, data = subscription.get(timeout=0)
+    assert event == "snapshot"
+    assert json.loads(data)["students"]["c1"]["pose"] == "Pose 2"
+    assert subscription.get(timeout=0) is None
+
+
+def test_stale_students_are_removed():
+    hub = LiveHub(tick=NEVER, stale_after=0.05)
+    hub.update("5b", "c1", {"pose": "Tree"})
+    subscription = hub.subscribe("5b")
+    subscription.get(timeout=0)
+
+    time.sleep(0.1)
+    hub.flush()
+
+    event, data = subscription.get(timeout=0)
+    assert event == "update"
+    assert json.loads(data) == {"students": {}, "removed": ["c1"]}
+    assert hub.stats()["students"] == 0
+
+
+def test_hub_limits_students_and_subscribers():
+    hub = LiveHub(tick=NEVER, max_students=1, max_subscribers=1)
+    hub.update("5b", "c1", {})
+    hub.update("5b", "c1", {})  # Known students can keep reporting
+    with pytest.raises(HubFull):
+        hub.update("5b", "c2", {})
+
+    subscription = hub.subscribe("5b")
+    with pytest.raises(HubFull):
+        hub.subscribe("6a")
+    hub.unsubscribe(subscription)
+    hub.subscribe("6a")
+
+
+def test_close_ends_subscriptions():
+    hub = LiveHub(tick=NEVER)
+    subscription = hub.subscribe("5b")
+
+    hub.close()
+
+    assert subscription.get(timeout=0) is None
+    assert subscription.closed
+    with pytest.raises(HubFull):
+        hub.subscribe("5b")
+
+
+def test_heartbeat_endpoint(monkeypatch):
+    import app as app_module
+
+    monkeypatch.setattr(app_module, "LIVE_HUB", LiveHub(tick=NEVER, max_students=1))
+    client = app_module.app.test_client()
+
+    assert client.post("/api/live/heartbeat", json=_heartbeat()).status_code == 204
+    assert client.post("/api/live/heartbeat", json=_heartbeat(status="paused")).status_code == 400
+    assert client.post("/api/live/heartbeat", json=_heartbeat(client="c2")).status_code == 503
+    assert app_module.LIVE_HUB.stats()["students"] == 1
@@ -0,0 +1,164 @@
+import os
+import threading
+
+import pytest
+
+from model_proxy import ModelCache, UpstreamError
+
+
+def test_cache_hit_does_not_refetch(tmp_path, upstream):
+    upstream.files["/models/abc/model.json"] = b'{"a": 1}'
+    cache = ModelCache(str(tmp_path), upstream=upstream.url)
+
+    first = cache.get("abc", "model.json")
+    second = cache.get("abc", "model.json")
+
+    assert second["sha256"] == first["sha256"]
+    assert first["content_type"] == "application/json"
+    assert upstream.hits["/models/abc/model.json"] == 1
+    with open(cache.blob_path(first["sha256"]), "rb") as f:
+        assert f.read() == b'{"a": 1}'
+
+
+def test_least_recently_used_file_is_evicted(tmp_path, upstream):
+    for name in ("a", "b", "c"):
+        upstream.files[f"/models/m/{name}.bin"] = name.encode() * 100
+    cache = ModelCache(str(tmp_path), upstream=upstream.url, max_bytes=250)
+
+    a = cache.get("m", "a.bin")
+    b = cache.get("m", "b.bin")
+    cache.get("m", "a.bin")  # a is now more recently used than b
+    cache.get("m", "c.bin")
+
+    assert cache.total_bytes() == 200
+    assert not os.path.exists(cache.blob_path(b["sha256"]))
+    assert os.path.exists(cache.blob_path(a["sha256"]))
+    cache.get("m", "a.bin")
+    assert upstream.hits["/models/m/a.bin"] == 1
+    cache.get("m", "b.bin")
+    assert upstream.hits["/models/m/b.bin"] == 2
+
+
+def test_concurrent_misses_share_one_upstream_request(tmp_path, upstream):
+    upstream.files["/models/abc/weights.bin"] = b"w" * 1000
+    upstream.delay = 0.2
+    cache = ModelCache(str(tmp_path), upstream=upstream.url)
+    results = []
+
+    def fetch():
+        results.append(cache.get("abc", "weights.bin")["sha256"])
+
+    threads = [threading.Thread(target=fetch) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(results) == 8 and len(set(results)) == 1
+    assert upstream.hits["/models/abc/weights.bin"] == 1
+
+
+def test_upstream_errors_are_passed_through(tmp_path, upstream):
+    upstream.status["/models/abc/broken.json"] = 500
+    cache = ModelCache(str(tmp_path), upstream=upstream.url)
+
+    with pytest.raises(UpstreamError) as missing:
+        cache.get("abc", "missing.json")
+    assert missing.value.status == 404
+    with pytest.raises(UpstreamError) as broken:
+        cache.get("abc", "broken.json")
+    assert broken.value.status == 502
+
+
+def test_workers_sharing_a_directory_merge_their_indexes(tmp_path, upstream):
+    upstream.files["/models/m/a.bin"] = b"a" * 100
+    upstream.files["/models/m/b.bin"] = b"b" * 100
+    first = ModelCache(str(tmp_path), upstream=upstream.url, max_bytes=150)
+    second = ModelCache(str(tmp_path), upstream=upstream.url, max_bytes=150)
+
+    a = first.get("m", "a.bin")
+    second.get("m", "b.bin")  # Sees a in the shared index and evicts it
+
+    assert not os.path.exists(first.blob_path(a["sha256"]))
+    reopened = ModelCache(str(tmp_path), upstream=upstream.url, max_bytes=150)
+    assert reopened.total_bytes() == 100
+    assert reopened.get("m", "b.bin")["size"] == 100
+    assert upstream.hits["/models/m/b.bin"] == 1
+
+
+def test_proxy_refetches_a_blob_evicted_behind_its_back(tmp_path, upstream):
+    import app as app_module
+
+    upstream.files["/models/abc/model.json"] = b'{"a": 1}'
+    cache = ModelCache(str(tmp_path), upstream=upstream.url)
+    client = app_module.app.test_client()
+    original = app_module.MODEL_CACHE
+    app_module.MODEL_CACHE = cache
+    try:
+        assert client.get("/models/abc/model.json").data == b'{"a": 1}'
+        # Another worker evicts the blob while this one still has it indexed
+        os.remove(cache.blob_path(cache.get("abc", "model.json")["sha256"]))
+
+        response = client.get("/models/abc/model.json")
+    finally:
+        app_module.MODEL_CACHE = original
+
+    assert response.status_code == 200
+    assert response.data == b'{"a": 1}'
+    assert upstream.hits["/models/abc/model.json"] == 2
+
+
+def test_waiting_requests_get_the_leaders_error(tmp_path, upstream, monkeypatch):
+    upstream.files["/models/abc/weights.bin"] = b"w" * 1000
+    upstream.delay = 0.2
+    cache = ModelCache(str(tmp_path), upstream=upstream.url)
+
+    def disk_full():
+        raise OSError(28, "No space left on device")
+
+    monkeypatch.setattr(cache, "_save_index", disk_full)
+    errors = []
+
+    def fetch():
+        try:
+            cache.get("abc", "weights.bin")
+        except Exception as error:
+            errors.append(error)
+
+    threads = [threading.Thread(target=fetch) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(errors) == 6
+    assert all(isinstance(error, OSError) and error.errno == 28 for error in errors)
+    assert upstream.hits["/models/abc/weights.bin"] == 1
+
+
+def test_serving_a_stale_copy_is_shared_with_other_workers(tmp_path, upstream):
+    upstream.files["/models/m/model.json"] = b"{}"
+    first = ModelCache(str(tmp_path), upstream=upstream.url, ttl=0)
+    fetched_at = first.get("m", "model.json")["fetched_at"]
+    upstream.status["/models/m/model.json"] = 500
+
+    assert first.get("m", "model.json")["fetched_at"] > fetched_at
+
+    second = ModelCache(str(tmp_path), upstream=upstream.url)
+    assert second.get("m", "model.json")["fetched_at"] > fetched_at
+    assert upstream.hits["/models/m/model.json"] == 2
+
+
+def test_cache_hits_are_shared_with_other_workers(tmp_path, upstream):
+    for name in ("a", "b", "c"):
+        upstream.files[f"/models/m/{name}.bin"] = name.encode() * 100
+    first = ModelCache(str(tmp_path), upstream=upstream.url, max_bytes=250, use_save_interval=0)
+    second = ModelCache(str(tmp_path), upstream=upstream.url, max_bytes=250, use_save_interval=0)
+
+    a = first.get("m", "a.bin")
+    b = first.get("m", "b.bin")
+    first.get("m", "a.bin")  # Only a cache hit: a is now more recently used than b
+    second.get("m", "c.bin")
+
+    assert os.path.exists(second.blob_path(a["sha256"]))
+    assert not os.path.exists(second.blob_path(b["sha256"]))
@@ -0,0 +1,136 @@
+import csv
+import io
+
+import pytest
+
+import reports
+from sessions import SUMMARY_TABLES, SessionWriter, connect, parse_session, rebuild_summaries
+
+WEEK = 7 * 24 * 3600
+MONDAY = 1_700_438_400  # 2023-11-20 00:00 UTC
+
+
+def _session(session_id, student, classroom, started_at, poses):
+    return parse_session({"id": session_id, "student": student, "classroom": classroom,
+                          "started_at": started_at, "total_seconds": sum(s for s, _ in poses.values()),
+                          "frames": sum(f for _, f in poses.values()), "fps": 15, "backend": "webgl",
+                          "poses": {pose: {"seconds": s, "frames": f} for pose, (s, f) in poses.items()}})
+
+
+def _timeline(session_id, streaks):
+    return {"session_id": session_id, "bytes": 100, "segments": 3, "samples": 0, "keypoints": 0,
+            "streaks": streaks}
+
+
+def _write(path, kind, records):
+    # One writer per call, so each call is its own batch
+    writer = SessionWriter(path, flush_interval=0.01)
+    writer.submit(kind, records)
+    writer.close()
+
+
+def _summaries(conn):
+    return {table: sorted(conn.execute(f"SELECT * FROM {table}").fetchall()) for table in SUMMARY_TABLES}
+
+
+@pytest.fixture
+def db(tmp_path):
+    path = str(tmp_path / "sessions.db")
+    _write(path, "session", [
+        _session("a1", "amy", "5b", MONDAY + 3600, {"Tree": (10.5, 150), "Chair": (4.0, 60)}),
+        _session("b1", "ben", "5b", MONDAY + 7200, {"Tree": (3.0, 45)}),
+        _session("a1", "amy", "5b", MONDAY + 3600, {"Tree": (10.5, 150)}),  # Duplicate in the batch
+    ])
+    # A timeline that arrives before its session
+    _write(path, "timeline", [_timeline("a2", {"Tree": 6000})])
+    _write(path, "session", [
+        _session("a1", "amy", "5b", MONDAY + 3600, {"Tree": (10.5, 150)}),  # Client retry
+        _session("a2", "amy", "5b", MONDAY + WEEK + 60, {"Tree": (8.0, 120), "Warrior": (2.5, 30)}),
+        _session("c1", "cat", "6a", MONDAY + 2 * WEEK, {"Warrior": (20.0, 300)}),
+        _session("d1", "", "", None, {}),
+    ])
+    # And one that arrives after it
+    _write(path, "timeline", [_timeline("a1", {"Tree": 9000, "Chair": 1500}),
+                              _timeline("b1", {"Tree": 2000})])
+    return path
+
+
+def test_summaries_match_a_full_rebuild(db):
+    conn = connect(db)
+    incremental = _summaries(conn)
+
+    rebuild_summaries(conn)
+
+    assert _summaries(conn) == incremental
+    conn.close()
+
+
+def test_summaries(db):
+    conn = reports.connect(db)
+
+    assert reports.students(conn, "5b") == [
+        {"student": "amy", "sessions": 2, "seconds": 25.0, "frames": 360,
+         "first_at": MONDAY + 3600, "last_at": MONDAY + WEEK + 60},
+        {"student": "ben", "sessions": 1, "seconds": 3.0, "frames": 45,
+         "first_at": MONDAY + 7200, "last_at": MONDAY + 7200},
+    ]
+    assert reports.poses(conn, "5b", "amy") == [
+        {"pose": "Chair", "sessions": 1, "seconds": 4.0, "frames": 60,
+         "best_session_seconds": 4.0, "best_streak_ms": 1500},
+        {"pose": "Tree", "sessions": 2, "seconds": 18.5, "frames": 270,
+         "best_session_seconds": 10.5, "best_streak_ms": 9000},
+        {"pose": "Warrior", "sessions": 1, "seconds": 2.5, "frames": 30,
+         "best_session_seconds": 2.5, "best_streak_ms": 0},
+    ]
+    assert [tuple(row) for row in conn.execute(
+        "SELECT week, sessions, seconds FROM weekly_totals WHERE student = 'amy' ORDER BY week"
+    )] == [("2023-11-20", 1, 14.5), ("2023-11-27", 1, 10.5)]
+    conn.close()
+
+
+@pytest.fixture
+def client(db, monkeypatch):
+    import app as app_module
+
+    writer = SessionWriter(db)
+    monkeypatch.setattr(app_module, "SESSION_WRITER", writer)
+    monkeypatch.setattr(app_module, "REPORT_TOKEN", None)
+    yield app_module.app.test_client()
+    writer.close()
+
+
+def test_csv_export(client):
+    response = client.get("/api/export/sessions.csv?class=5b")
+
+    assert response.status_code == 200
+    assert response.mimetype == "text/csv"
+    rows = list(csv.DictReader(io.StringIO(response.get_data(as_text=True))))
+    assert list(rows[0]) == list(reports.EXPORT_COLUMNS)
+    assert sorted((row["session_id"], row["pose"], row["pose_seconds"], row["pose_frames"])
+                  for row in rows) == [
+        ("a1", "Chair", "4.0", "60"), ("a1", "Tree", "10.5", "150"),
+        ("a2", "Tree", "8.0", "120"), ("a2", "Warrior", "2.5", "30"),
+        ("b1", "Tree", "3.0", "45"),
+    ]
+    assert {row["student"] for row in rows} == {"amy", "ben"}
+
+
+def test_json_export(client):
+    response = client.get("/api/export/sessions.json")
+
+    assert response.status_code == 200
+    sessions = {session["id"]: session for session in response.get_json()}
+    assert sorted(sessions) == ["a1", "a2", "b1", "c1", "d1"]
+    assert sessions["a1"]["poses"] == {"Tree": {"seconds": 10.5, "frames": 150},
+                                       "Chair": {"seconds": 4.0, "frames": 60}}
+    assert sessions["c1"]["classroom"] == "6a"
+    assert sessions["c1"]["started_at"] == MONDAY + 2 * WEEK
+    assert sessions["d1"]["poses"] == {}
+    assert set(sessions["d1"]) == {"id", "poses"} | set(reports.EXPORT_COLUMNS[1:11])
+
+
+def test_export_filters(client):
+    assert client.get("/api/export/sessions.json?class=6a").get_json()[0]["id"] == "c1"
+    assert client.get("/api/export/sessions.json?since=2999-01-01").get_json() == []
+    assert client.get("/api/export/sessions.json?since=yesterday").status_code == 400
+    assert client.get("/api/export/sessions.xml").status_code == 404
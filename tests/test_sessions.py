@@ -0,0 +1,73 @@
+import os
+import sqlite3
+
+import pytest
+
+import sessions
+from sessions import SessionWriter, connect, parse_session
+
+
+def _session(session_id):
+    return parse_session({"id": session_id, "student": "amy", "classroom": "5b",
+                          "total_seconds": 12.5, "poses": {"tree": {"seconds": 10, "frames": 150}}})
+
+
+def _stored(path):
+    conn = connect(path)
+    try:
+        return [row[0] for row in conn.execute("SELECT id FROM sessions ORDER BY id")]
+    finally:
+        conn.close()
+
+
+@pytest.fixture
+def failing_writes(monkeypatch):
+    """Make the next `failing_writes.left` session batches raise sqlite3.OperationalError."""
+    write = sessions.WRITERS["session"]
+
+    def flaky(conn, records):
+        if flaky.left:
+            flaky.left -= 1
+            raise sqlite3.OperationalError("database is locked")
+        write(conn, records)
+
+    flaky.left = 0
+    monkeypatch.setitem(sessions.WRITERS, "session", flaky)
+    return flaky
+
+
+def test_failed_batch_is_retried(tmp_path, failing_writes):
+    failing_writes.left = 2
+    writer = SessionWriter(str(tmp_path / "s.db"), flush_interval=0.01, retries=3, retry_delay=0.01)
+
+    writer.submit("session", [_session("a")])
+    writer.close()
+
+    assert _stored(writer.path) == ["a"]
+    assert writer.spilled == 0
+    assert not os.path.exists(writer.spill_path)
+
+
+def test_batch_is_spilled_and_replayed_on_start(tmp_path, failing_writes):
+    path = str(tmp_path / "s.db")
+    failing_writes.left = 2
+    writer = SessionWriter(path, flush_interval=0.01, retries=1, retry_delay=0.01)
+
+    writer.submit("session", [_session("a"), _session("b")])
+    writer.close()
+
+    assert _stored(path) == []
+    assert writer.spilled == 2
+    assert os.path.exists(writer.spill_path)
+
+    restarted = SessionWriter(path, flush_interval=0.01)
+    restarted.submit("session", [_session("c")])
+    restarted.close()
+
+    assert _stored(path) == ["a", "b", "c"]
+    assert not os.path.exists(restarted.spill_path)
+    conn = connect(path)
+    (sessions_counted,) = conn.execute(
+        "SELECT sessions FROM student_totals WHERE student = 'amy'").fetchone()
+    conn.close()
+    assert sessions_counted == 3
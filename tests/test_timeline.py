@@ -0,0 +1,133 @@
+import io
+import os
+
+import pytest
+
+from sessions import SessionWriter, connect
+from timeline import (Sample, Segment, TimelineError, TimelineReader, TimelineStore, best_streaks,
+                      encode_timeline)
+
+CLASSES = ["Tree", "Chair", "Warrior"]
+SEGMENTS = [
+    Segment(0, 1200, 18, "Tree", 1.0),
+    Segment(1200, 1500, 5, "Tree", 204 / 255),
+    Segment(1500, 2000, 8, "Chair", 51 / 255),  # Below the hold confidence
+    Segment(2000, 5000, 45, "Tree", 1.0),
+]
+# Values the format stores exactly: x and y in 1/65535ths, scores in 1/255ths
+SAMPLES = [
+    Sample(0, [(0.0, 1.0, 1.0), (32768 / 65535, 16384 / 65535, 0.0)]),
+    Sample(1000, [(1000 / 65535, 49151 / 65535, 128 / 255), (1.0, 0.0, 1.0)]),
+]
+
+
+def _timeline():
+    return encode_timeline(CLASSES, SEGMENTS, SAMPLES, keypoint_count=2)
+
+
+@pytest.mark.parametrize("chunk_records", [1, 2, 1024])
+def test_round_trip(chunk_records):
+    reader = TimelineReader(io.BytesIO(_timeline()), chunk_records=chunk_records)
+
+    assert reader.classes == CLASSES
+    assert (reader.segment_count, reader.sample_count, reader.keypoint_count) == (4, 2, 2)
+    assert list(reader.segments()) == SEGMENTS
+    assert list(reader.samples()) == SAMPLES
+    assert reader.at_end()
+
+
+def test_samples_skip_unread_segments():
+    reader = TimelineReader(io.BytesIO(_timeline()))
+
+    assert list(reader.samples()) == SAMPLES
+    assert list(reader.segments()) == []
+
+
+def test_empty_timeline():
+    reader = TimelineReader(io.BytesIO(encode_timeline([], [])))
+
+    assert reader.classes == []
+    assert list(reader.segments()) == []
+    assert list(reader.samples()) == []
+    assert reader.at_end()
+
+
+def test_best_streaks_follow_unbroken_holds():
+    assert best_streaks(SEGMENTS) == {"Tree": 3000}
+
+
+@pytest.mark.parametrize("data", [
+    b"",
+    b"PTL2" + _timeline()[4:],
+    _timeline()[:3],
+    _timeline()[:-1],  # Truncated inside the last sample
+    encode_timeline(CLASSES, SEGMENTS)[:-4],  # Truncated inside the last segment
+])
+def test_bad_files_are_rejected(data):
+    with pytest.raises(TimelineError):
+        reader = TimelineReader(io.BytesIO(data))
+        list(reader.segments())
+        list(reader.samples())
+
+
+def test_unknown_class_is_rejected():
+    data = bytearray(encode_timeline(CLASSES, [Segment(0, 10, 1, "Tree", 1.0)]))
+    data[-2] = len(CLASSES)  # The segment's class index
+    reader = TimelineReader(io.BytesIO(bytes(data)))
+
+    with pytest.raises(TimelineError, match="unknown class"):
+        list(reader.segments())
+
+
+def test_store_keeps_valid_uploads_only(tmp_path):
+    store = TimelineStore(str(tmp_path))
+
+    info = store.save("s1", io.BytesIO(_timeline()))
+
+    assert info == {"session_id": "s1", "bytes": len(_timeline()), "segments": 4, "samples": 2,
+                    "keypoints": 2, "streaks": {"Tree": 3000}}
+    with open(store.path("s1"), "rb") as f:
+        assert f.read() == _timeline()
+    with pytest.raises(TimelineError, match="after the timeline"):
+        store.save("s2", io.BytesIO(_timeline() + b"x"))
+    assert sorted(os.listdir(tmp_path)) == ["s1.ptl"]
+
+
+@pytest.fixture
+def app_client(tmp_path, monkeypatch):
+    import app as app_module
+
+    writer = SessionWriter(str(tmp_path / "sessions.db"), flush_interval=0.01)
+    monkeypatch.setattr(app_module, "SESSION_WRITER", writer)
+    monkeypatch.setattr(app_module, "TIMELINES", TimelineStore(str(tmp_path / "timelines")))
+    yield app_module.app.test_client(), writer
+    writer.close()
+
+
+def test_upload_and_download(app_client):
+    client, writer = app_client
+
+    response = client.post("/api/sessions/s1/timeline", data=_timeline(),
+                           content_type="application/x-pose-timeline")
+    assert response.status_code == 202
+    assert response.get_json()["streaks"] == {"Tree": 3000}
+
+    downloaded = client.get("/api/sessions/s1/timeline").get_json()
+    assert downloaded["classes"] == CLASSES
+    assert [segment["pose"] for segment in downloaded["segments"]] == ["Tree", "Tree", "Chair", "Tree"]
+    assert downloaded["samples"][1]["time_ms"] == 1000
+
+    writer.close()
+    conn = connect(writer.path)
+    assert conn.execute("SELECT segments, samples FROM timelines WHERE session_id = 's1'").fetchone() == (4, 2)
+    assert conn.execute("SELECT pose, best_ms FROM session_streaks").fetchall() == [("Tree", 3000)]
+    conn.close()
+
+
+def test_bad_upload_is_rejected(app_client):
+    client, _ = app_client
+
+    assert client.post("/api/sessions/s1/timeline", data=b"PTL2").status_code == 400
+    assert client.post("/api/sessions/s1/timeline", data=_timeline()[:-1]).status_code == 400
+    assert client.post("/api/sessions/bad%20id/timeline", data=_timeline()).status_code == 404
+    assert client.get("/api/sessions/s1/timeline").status_code == 404
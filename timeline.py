@@ -0,0 +1,190 @@
+import os
+import struct
+import tempfile
+from collections import namedtuple
+
+TIMELINE_DIR = os.environ.get(
+    "TIMELINE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "timelines")
+)
+
+# Pose timeline recorded by the page (little-endian):
+#   b"PTL1"
+#   u16 class count, then per class: u16 length + UTF-8 name
+#   u32 segment count
+#   u16 keypoints per sample (0 when keypoints were not recorded)
+#   u32 sample count
+#   segments: u32 start_ms, u32 end_ms, u16 frames, u8 class, u8 confidence (0-255)
+#   samples:  u32 time_ms, then per keypoint: u16 x, u16 y (0-65535 of the
+#             frame size), u8 score (0-255)
+# Times are milliseconds since the task started. A segment is a run of
+# frames with the same top class and confidence band.
+MAGIC = b"PTL1"
+MIMETYPE = "application/x-pose-timeline"
+_U16 = struct.Struct("<H")
+_U32 = struct.Struct("<I")
+_SEGMENT = struct.Struct("<IIHBB")
+_SAMPLE_TIME = _U32
+_KEYPOINT = struct.Struct("<HHB")
+
+Segment = namedtuple("Segment", "start_ms end_ms frames pose confidence")
+Sample = namedtuple("Sample", "time_ms keypoints")
+
+
+# Confidence a pose must keep to count as held, as on the page
+HOLD_CONFIDENCE = 0.8
+
+
+class TimelineError(ValueError):
+    pass
+
+
+def best_streaks(segments, min_confidence=HOLD_CONFIDENCE):
+    """Longest unbroken hold (ms) per pose over an iterable of segments."""
+    best = {}
+    run_pose = run_start = None
+    for segment in segments:
+        if segment.confidence < min_confidence:
+            run_pose = None
+            continue
+        if segment.pose != run_pose:
+            run_pose, run_start = segment.pose, segment.start_ms
+        best[run_pose] = max(best.get(run_pose, 0), segment.end_ms - run_start)
+    return best
+
+
+def encode_timeline(classes, segments, samples=(), keypoint_count=0):
+    """Encode Segment and Sample records the way the page does."""
+    index = {name: i for i, name in enumerate(classes)}
+    samples = list(samples)
+    segments = list(segments)
+    parts = [MAGIC, _U16.pack(len(classes))]
+    for name in classes:
+        encoded = name.encode("utf-8")
+        parts += [_U16.pack(len(encoded)), encoded]
+    parts += [_U32.pack(len(segments)), _U16.pack(keypoint_count), _U32.pack(len(samples))]
+    for segment in segments:
+        parts.append(_SEGMENT.pack(segment.start_ms, segment.end_ms, segment.frames,
+                                   index[segment.pose], round(segment.confidence * 255)))
+    for sample in samples:
+        if len(sample.keypoints) != keypoint_count:
+            raise TimelineError(f"expected {keypoint_count} keypoints per sample")
+        parts.append(_SAMPLE_TIME.pack(sample.time_ms))
+        for x, y, score in sample.keypoints:
+            parts.append(_KEYPOINT.pack(round(x * 65535), round(y * 65535), round(score * 255)))
+    return b"".join(parts)
+
+
+class TimelineReader:
+    """Decode a timeline from a binary file object without loading it whole.
+
+    The header is read on construction. segments() and then samples() yield
+    records in file order, reading `chunk_records` records at a time;
+    calling samples() first skips over any unread segments.
+    """
+
+    def __init__(self, stream, chunk_records=1024):
+        self._stream = stream
+        self._chunk_records = chunk_records
+        if self._read(4) != MAGIC:
+            raise TimelineError("not a pose timeline")
+        (class_count,) = _U16.unpack(self._read(2))
+        self.classes = []
+        for _ in range(class_count):
+            (length,) = _U16.unpack(self._read(2))
+            try:
+                self.classes.append(self._read(length).decode("utf-8"))
+            except UnicodeDecodeError:
+                raise TimelineError("class name is not UTF-8")
+        (self.segment_count,) = _U32.unpack(self._read(4))
+        (self.keypoint_count,) = _U16.unpack(self._read(2))
+        (self.sample_count,) = _U32.unpack(self._read(4))
+        self._segments_left = self.segment_count
+        self._sample_size = _SAMPLE_TIME.size + self.keypoint_count * _KEYPOINT.size
+
+    def _read(self, size):
+        data = b""
+        while len(data) < size:
+            chunk = self._stream.read(size - len(data))
+            if not chunk:
+                raise TimelineError("timeline is truncated")
+            data += chunk
+        return data
+
+    def segments(self):
+        while self._segments_left:
+            count = min(self._segments_left, self._chunk_records)
+            data = self._read(count * _SEGMENT.size)
+            self._segments_left -= count
+            for start_ms, end_ms, frames, pose, confidence in _SEGMENT.iter_unpack(data):
+                if pose >= len(self.classes):
+                    raise TimelineError(f"segment refers to unknown class {pose}")
+                yield Segment(start_ms, end_ms, frames, self.classes[pose], confidence / 255)
+
+    def samples(self):
+        for _ in self.segments():
+            pass
+        left = self.sample_count
+        while left:
+            count = min(left, self._chunk_records)
+            data = self._read(count * self._sample_size)
+            left -= count
+            for offset in range(0, len(data), self._sample_size):
+                (time_ms,) = _SAMPLE_TIME.unpack_from(data, offset)
+                keypoints = [
+                    (x / 65535, y / 65535, score / 255)
+                    for x, y, score in _KEYPOINT.iter_unpack(
+                        data[offset + _SAMPLE_TIME.size:offset + self._sample_size]
+                    )
+                ]
+                yield Sample(time_ms, keypoints)
+
+    def at_end(self):
+        return not self._stream.read(1)
+
+
+class _Tee:
+    # File object wrapper that copies everything read into `sink`.
+    def __init__(self, stream, sink):
+        self.stream = stream
+        self.sink = sink
+
+    def read(self, size=-1):
+        data = self.stream.read(size)
+        self.sink.write(data)
+        return data
+
+
+class TimelineStore:
+    """Uploaded timelines, one file per session under `directory`."""
+
+    def __init__(self, directory=TIMELINE_DIR):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, session_id):
+        return os.path.join(self.directory, session_id + ".ptl")
+
+    def save(self, session_id, stream):
+        """Validate the upload while copying it to disk; return a summary dict."""
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                reader = TimelineReader(_Tee(stream, f))
+                streaks = best_streaks(reader.segments())
+                for _ in reader.samples():
+                    pass
+                if not reader.at_end():
+                    raise TimelineError("unexpected data after the timeline")
+                size = f.tell()
+            os.replace(tmp, self.path(session_id))
+        except BaseException:
+            os.remove(tmp)
+            raise
+        return {
+            "session_id": session_id,
+            "bytes": size,
+            "segments": reader.segment_count,
+            "samples": reader.sample_count,
+            "keypoints": reader.keypoint_count,
+            "streaks": streaks,
+        }
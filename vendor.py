@@ -0,0 +1,150 @@
+import base64
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import urllib.request
+
+from markupsafe import Markup
+
+from assets import StaticAsset, brotli
+
+VENDOR_DIR = os.environ.get(
+    "VENDOR_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "vendor")
+)
+CDN_BASE = "https://cdn.jsdelivr.net/npm/"
+
+# name -> (package, pinned version, file inside the package)
+LIBRARIES = {
+    "chartjs": ("chart.js", "4.4.1", "dist/chart.umd.js"),
+    # 1.7.x is the newest line tmPose 0.8 supports (peer ^1.3.1) and the
+    # first with a usable WASM backend.
+    "tfjs": ("@tensorflow/tfjs", "1.7.4", "dist/tf.min.js"),
+    "tfjs-wasm": ("@tensorflow/tfjs-backend-wasm", "1.7.4", "dist/tf-backend-wasm.min.js"),
+    "tfjs-wasm-binary": ("@tensorflow/tfjs-backend-wasm", "1.7.4", "dist/tfjs-backend-wasm.wasm"),
+    "tmpose": ("@teachablemachine/pose", "0.8.6", "dist/teachablemachine-pose.min.js"),
+}
+
+# Content-hashed file names never change, so browsers may keep them forever.
+IMMUTABLE = "public, max-age=31536000, immutable"
+
+
+def cdn_url(name):
+    package, version, path = LIBRARIES[name]
+    return f"{CDN_BASE}{package}@{version}/{path}"
+
+
+def _hashed_name(name, data):
+    path = LIBRARIES[name][2]
+    stem, ext = os.path.splitext(os.path.basename(path))
+    return f"{stem}.{hashlib.sha256(data).hexdigest()[:12]}{ext}"
+
+
+def _integrity(data):
+    return "sha384-" + base64.b64encode(hashlib.sha384(data).digest()).decode("ascii")
+
+
+def fetch_all(directory=VENDOR_DIR, log=print):
+    """Download every pinned library into `directory` and write the manifest."""
+    os.makedirs(directory, exist_ok=True)
+    manifest = {}
+    for name in sorted(LIBRARIES):
+        url = cdn_url(name)
+        log(f"Fetching {url}")
+        with urllib.request.urlopen(url, timeout=60) as response:
+            data = response.read()
+
+        filename = _hashed_name(name, data)
+        target = os.path.join(directory, filename)
+        with open(target, "wb") as f:
+            f.write(data)
+        with open(target + ".gz", "wb") as f:
+            f.write(gzip.compress(data, compresslevel=9, mtime=0))
+        if brotli is not None:
+            with open(target + ".br", "wb") as f:
+                f.write(brotli.compress(data, quality=11))
+
+        package, version, _ = LIBRARIES[name]
+        manifest[name] = {
+            "package": package,
+            "version": version,
+            "source": url,
+            "file": filename,
+            "integrity": _integrity(data),
+        }
+        log(f"  -> {filename} ({len(data)} bytes)")
+
+    with open(os.path.join(directory, "manifest.json"), "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+
+    # Drop files left over from previously pinned versions.
+    keep = {entry["file"] for entry in manifest.values()}
+    for filename in os.listdir(directory):
+        base = filename[:-3] if filename.endswith((".gz", ".br")) else filename
+        if filename != "manifest.json" and base not in keep:
+            os.remove(os.path.join(directory, filename))
+    return manifest
+
+
+class VendorBundle:
+    """Pinned third-party scripts served from the local vendor directory.
+
+    Falls back to the pinned CDN URL for any library that has not been
+    fetched yet, so the app still works before `flask fetch-vendor` runs.
+    """
+
+    def __init__(self, directory=VENDOR_DIR):
+        self.directory = directory
+        self.manifest = {}
+        self._assets = {}
+        path = os.path.join(directory, "manifest.json")
+        if os.path.exists(path):
+            with open(path) as f:
+                manifest = json.load(f)
+            # Ignore entries whose pin no longer matches LIBRARIES.
+            self.manifest = {
+                name: entry for name, entry in manifest.items()
+                if name in LIBRARIES and entry.get("version") == LIBRARIES[name][1]
+                and os.path.exists(os.path.join(directory, entry["file"]))
+            }
+
+    def url(self, name):
+        entry = self.manifest.get(name)
+        if entry:
+            return "/vendor/" + entry["file"]
+        return cdn_url(name)
+
+    def script_tag(self, name):
+        entry = self.manifest.get(name)
+        if entry:
+            return Markup('<script src="{}" integrity="{}" crossorigin="anonymous"></script>').format(
+                self.url(name), entry["integrity"]
+            )
+        return Markup('<script src="{}"></script>').format(cdn_url(name))
+
+    def asset(self, filename):
+        """Return the StaticAsset for a vendored file, or None if unknown."""
+        if filename in self._assets:
+            return self._assets[filename]
+        if filename not in {entry["file"] for entry in self.manifest.values()}:
+            return None
+
+        path = os.path.join(self.directory, filename)
+        with open(path, "rb") as f:
+            body = f.read()
+        variants = {}
+        for encoding, suffix in (("gzip", ".gz"), ("br", ".br")):
+            if os.path.exists(path + suffix):
+                with open(path + suffix, "rb") as f:
+                    variants[encoding] = f.read()
+
+        asset = StaticAsset(
+            body,
+            mimetypes.guess_type(filename)[0] or "application/octet-stream",
+            cache_control=IMMUTABLE,
+            last_modified=os.path.getmtime(path),
+            variants=variants,
+        )
+        self._assets[filename] = asset
+        return asset